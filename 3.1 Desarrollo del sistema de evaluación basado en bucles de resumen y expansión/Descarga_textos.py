@@ -5,43 +5,155 @@
 #  Autor: Javier González Pérez
 #  Fecha: 20/11/2024
 #  Descripción: Este script descarga textos y resúmenes del dataset CNN/DailyMail usando la API de Hugging Face,
-#               y guarda los resultados en un archivo Excel.
+#               y guarda los resultados en un archivo Excel. La descarga se hace por páginas, con varias peticiones en
+#               paralelo sobre una sesión con reintentos, escribiendo las filas en un JSONL a medida que llegan y
+#               pudiendo retomarse donde se quedó.
 # ==========================================================
 import os
+import json
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import pandas as pd
+from corpus_local import build_corpus
 
 # Configuración de la clave Hugging Faces
 huggingface_token = ""  # Reemplaza con tu token de Hugging Face
 headers = {"Authorization": f"Bearer {huggingface_token}"}
 
+# Servidor y dataset (BASE_URL se puede cambiar por un servidor local para hacer pruebas)
+BASE_URL = "https://datasets-server.huggingface.co"
+DATASET_PARAMS = {
+    "dataset": "abisee/cnn_dailymail",  # Nombre del dataset
+    "config": "3.0.0",                  # Configuración del dataset
+    "split": "train",                   # Split del dataset
+}
+PAGE_LENGTH = 100  # Máximo de filas por petición que admite el endpoint /rows
+
+# Función para convertir una fila del dataset al formato de los scripts de bucle
+def row_to_text(row):
+    return {
+        "id": row.get('id', 'Sin ID'),
+        "original_text": row.get('article', 'Texto no disponible'),
+        "original_text_length": len(row.get('article', '').split()),
+        "original_summary": row.get('highlights', 'Resumen no disponible'),
+        "original_summary_length": len(row.get('highlights', '').split())
+    }
+
 # Función para obtener un texto desde el dataset CNN/DailyMail
 def fetch_single_text(offset):
-    url = "https://datasets-server.huggingface.co/rows"
-    params = {
-        "dataset": "abisee/cnn_dailymail",  # Nombre del dataset
-        "config": "3.0.0",                  # Configuración del dataset
-        "split": "train",                   # Split del dataset
-        "offset": offset,                   # Inicio (primer texto)
-        "length": 1                         # Solo un texto
-    }
+    url = f"{BASE_URL}/rows"
+    params = dict(DATASET_PARAMS, offset=offset, length=1)  # Solo un texto
     response = requests.get(url, headers=headers, params=params)
     if response.status_code == 200:
         data = response.json()
         if 'rows' in data and len(data['rows']) > 0:
-            row = data['rows'][0]['row']
-            return {
-                "id": row.get('id', 'Sin ID'),
-                "original_text": row.get('article', 'Texto no disponible'),
-                "original_text_length": len(row.get('article', '').split()),
-                "original_summary": row.get('highlights', 'Resumen no disponible'),
-                "original_summary_length": len(row.get('highlights', '').split())
-            }
+            return row_to_text(data['rows'][0]['row'])
         else:
             return None
     else:
         return None
 
+# Función para crear una sesión con conexiones reutilizables y reintentos con espera exponencial
+def create_session(token=None, pool_size=8, retries=5):
+    session = requests.Session()
+    retry = Retry(total=retries, backoff_factor=1, status_forcelist=(429, 500, 502, 503, 504),
+                  allowed_methods=("GET",), respect_retry_after_header=True)
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    if token:
+        session.headers["Authorization"] = f"Bearer {token}"
+    return session
+
+# Función para descargar una página de textos (hasta PAGE_LENGTH filas por petición)
+def fetch_page(session, offset, length=PAGE_LENGTH, base_url=BASE_URL):
+    params = dict(DATASET_PARAMS, offset=offset, length=length)
+    response = session.get(f"{base_url}/rows", params=params, timeout=60)
+    response.raise_for_status()
+    return [row_to_text(entry['row']) for entry in response.json().get('rows', [])]
+
+# Funciones para el registro de páginas ya descargadas, {offset: filas pedidas} (permite retomar la descarga)
+def load_progress(progress_path):
+    if not os.path.exists(progress_path):
+        return {}
+    with open(progress_path, "r", encoding="utf-8") as f:
+        return {int(offset): length for offset, length in json.load(f).items()}
+
+def save_progress(done_pages, progress_path):
+    tmp_path = progress_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({str(offset): length for offset, length in sorted(done_pages.items())}, f)
+    os.replace(tmp_path, progress_path)
+
+def download_texts(output_path, start_offset=0, total=1000, page_length=PAGE_LENGTH, max_workers=8,
+                   base_url=BASE_URL, token=None):
+    """
+    Descarga `total` textos a partir de `start_offset` por páginas, con varias peticiones en paralelo, y va
+    escribiendo las filas en un JSONL a medida que llegan. Las páginas completadas se registran en
+    `<output_path>.progreso.json`, por lo que al relanzar solo se piden las que faltan.
+
+    Args:
+        output_path (str): Archivo JSONL de salida (se añaden filas, no se sobrescribe).
+        page_length (int): Filas por petición (como máximo PAGE_LENGTH).
+        max_workers (int): Peticiones simultáneas.
+        base_url (str): Servidor del dataset (por defecto el de Hugging Face).
+
+    Returns:
+        int: Número de textos escritos en esta ejecución.
+    """
+    page_length = min(page_length, PAGE_LENGTH)
+    progress_path = output_path + ".progreso.json"
+    done_pages = load_progress(progress_path)
+    end = start_offset + total
+    # Una página se vuelve a pedir si la anterior ejecución pidió menos filas (p. ej. la última página de un total menor)
+    pending = [(offset, min(page_length, end - offset)) for offset in range(start_offset, end, page_length)]
+    pending = [(offset, length) for offset, length in pending if done_pages.get(offset, 0) < length]
+    print(f"Páginas pendientes: {len(pending)} ({len(done_pages)} ya descargadas).")
+
+    session = create_session(token, pool_size=max_workers)
+    written = 0
+
+    with open(output_path, "a", encoding="utf-8") as out, ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # Como mucho 2 × max_workers páginas en vuelo, para no acumular en memoria
+        in_flight = {}
+        queue = iter(pending)
+        while True:
+            while len(in_flight) < 2 * max_workers:
+                page = next(queue, None)
+                if page is None:
+                    break
+                in_flight[executor.submit(fetch_page, session, *page, base_url)] = page
+            if not in_flight:
+                break
+            finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in finished:
+                offset, length = in_flight.pop(future)
+                try:
+                    rows = future.result()
+                except requests.RequestException as e:
+                    print(f"Error al descargar la página {offset}: {e}. Se volverá a pedir en la siguiente ejecución.")
+                    continue
+                for text_data in rows:
+                    out.write(json.dumps(text_data, ensure_ascii=False) + "\n")
+                out.flush()
+                done_pages[offset] = length
+                save_progress(done_pages, progress_path)
+                written += len(rows)
+                print(f"Página {offset} descargada ({len(rows)} textos). Total en esta ejecución: {written}")
+    return written
+
+# Función para leer el JSONL descargado (sin duplicados si una página se escribió dos veces)
+def load_jsonl(path):
+    texts = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                text_data = json.loads(line)
+                texts.setdefault(text_data['id'], text_data)
+    return list(texts.values())
+
 # Guardar datos en un archivo Excel
 def save_to_excel(data, filename="Nombre_fichero_de_salida.xlsx"):
     df = pd.DataFrame(data)
@@ -50,23 +162,18 @@ def save_to_excel(data, filename="Nombre_fichero_de_salida.xlsx"):
 
 # Main
 if __name__ == "__main__":
-    texts = []
-    offset =  # Indica por el texto por el que se empieza 
-
-    while len(texts) < 1000:
-        text_data = fetch_single_text(offset)
-        offset += 1
-
-        if text_data:
-            texts.append(text_data)
-
-        # Añadir trazas para ver el progreso
-        if offset % 10 == 0:
-            print(f"Textos procesados: {offset}, Textos descargados: {len(texts)}")
+    start_offset = 0  # Indica el texto por el que se empieza
+    total_texts = 1000  # Número de textos a descargar
+    output_jsonl = "textos_cnn_dailymail.jsonl"
 
+    download_texts(output_jsonl, start_offset, total_texts, max_workers=8, token=huggingface_token)
+    texts = load_jsonl(output_jsonl) if os.path.exists(output_jsonl) else []
     print(f"Total de textos descargados: {len(texts)}")
 
     if texts:
         save_to_excel(texts)
+        # Copia local con acceso por id y por posición para el resto de scripts (corpus_local.py),
+        # con un solo texto por grupo de noticias casi duplicadas
+        build_corpus(output_jsonl, "corpus_cnn_dailymail.arrow", deduplicate_threshold=0.8)
     else:
-        print("No se pudieron descargar suficientes textos.")
\ No newline at end of file
+        print("No se pudieron descargar suficientes textos.")
@@ -0,0 +1,179 @@
+# ==========================================================
+#  Proyecto: IMPLEMENTACIÓN DE UN SISTEMA DE EVALUACIÓN DE CAPACIDADES DE GRANDES MODELOS DE LENGUAJE A TRAVÉS DE BUCLES DE RESUMEN Y EXTENSIÓN DE TEXTOS
+#  Apartado: 3. DESARROLLO DEL SISTEMA EXPERIMENTAL
+#            3.1 DESARROLLO DEL SISTEMA DE EVALUACIÓN BASADO EN BUCLES DE RESUMEN Y EXPANSIÓN
+#  Autor: Javier González Pérez
+#  Fecha: 18/10/2026
+#  Descripción: Almacén de resultados en Parquet particionado, pensado para añadir datos en tiempo proporcional al lote.
+#               Cada ejecución escribe un fichero nuevo por tabla (una tabla por modelo/hoja) y los textos originales se
+#               guardan una sola vez en la tabla "textos". Incluye la exportación a Excel para los informes y la función
+#               read_table, que leen los scripts de los apartados 3.2, 3.3 y 4.x tanto si la fuente es un Excel como un
+#               almacén.
+#
+#  Uso:  python almacen_resultados.py exportar <directorio_almacen> <fichero.xlsx> [--tablas tabla1 tabla2 ...]
+# ==========================================================
+
+import argparse
+import os
+import time
+import uuid
+
+import pandas as pd
+
+TEXTS_TABLE = "textos"
+TEXT_COLUMNS = ['original_text', 'original_text_length', 'original_summary', 'original_summary_length']
+EXCEL_SHEET_CHARS = 31  # Longitud máxima de un nombre de hoja de Excel
+INDEX_SHEET = "indice_tablas"
+
+
+# Función para generar un identificador de ejecución ordenable por fecha (con nanosegundos, para que dos
+# ejecuciones en el mismo segundo también queden en orden)
+def new_run_id():
+    now = time.time_ns()
+    return f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(now // 10**9))}-{now % 10**9:09d}-{uuid.uuid4().hex[:4]}"
+
+
+# Función para escribir un fichero Parquet de forma atómica (nunca queda un fichero a medias)
+def _write_part(df, table_dir, run_id):
+    os.makedirs(table_dir, exist_ok=True)
+    path = os.path.join(table_dir, f"part-{run_id}.parquet")
+    tmp_path = path + ".tmp"
+    df.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, path)
+    return path
+
+
+# Función para añadir los resultados de una ejecución al almacén
+def append_results(results_df, store_dir, table, run_id=None):
+    """
+    Añade un lote de resultados sin leer ni reescribir lo que ya hay en el almacén.
+
+    Args:
+        results_df (pd.DataFrame): Resultados con el formato de run_iterations_parallel (o cualquier tabla con columna 'id').
+        store_dir (str): Directorio raíz del almacén.
+        table (str): Nombre de la tabla (por ejemplo, el nombre de la hoja del modelo).
+        run_id (str): Identificador de la ejecución; por defecto se genera uno nuevo.
+
+    Returns:
+        str: Ruta del fichero escrito para la tabla.
+    """
+    run_id = run_id or new_run_id()
+    results_df = results_df.copy()
+    results_df['id'] = results_df['id'].astype(str)
+
+    # Los textos originales se guardan aparte para no repetirlos en cada tabla de resultados
+    text_columns = [col for col in TEXT_COLUMNS if col in results_df.columns]
+    if text_columns:
+        _write_part(results_df[['id'] + text_columns], os.path.join(store_dir, TEXTS_TABLE), run_id)
+        results_df = results_df.drop(columns=text_columns)
+
+    path = _write_part(results_df, os.path.join(store_dir, table), run_id)
+    print(f"{len(results_df)} filas añadidas a la tabla '{table}' del almacén {store_dir}.")
+    return path
+
+
+# Función para listar las tablas de un almacén
+def list_tables(store_dir):
+    if not os.path.isdir(store_dir):
+        return []
+    return sorted(name for name in os.listdir(store_dir)
+                  if name != TEXTS_TABLE and os.path.isdir(os.path.join(store_dir, name)))
+
+
+# Función para leer todas las particiones de una tabla (en orden de ejecución)
+def _read_parts(table_dir, columns=None):
+    if not os.path.isdir(table_dir):
+        return pd.DataFrame()
+    parts = sorted(name for name in os.listdir(table_dir) if name.endswith(".parquet"))
+    if not parts:
+        return pd.DataFrame()
+    frames = [pd.read_parquet(os.path.join(table_dir, name), columns=columns) for name in parts]
+    df = pd.concat(frames, ignore_index=True)
+    # Si un id se ha vuelto a ejecutar, prevalece la ejecución más reciente
+    return df.drop_duplicates(subset='id', keep='last').reset_index(drop=True)
+
+
+# Función para leer una tabla del almacén, unida con los textos originales
+def read_results(store_dir, table, columns=None, include_texts=True):
+    read_columns = None if columns is None else list(dict.fromkeys(['id'] + list(columns)))
+    df = _read_parts(os.path.join(store_dir, table), read_columns)
+    if df.empty or not include_texts:
+        return df
+    texts_df = _read_parts(os.path.join(store_dir, TEXTS_TABLE))
+    if texts_df.empty:
+        return df
+    df = texts_df.merge(df, on='id', how='right')
+    # Mismo orden de columnas que el Excel original: id, textos originales y después los resultados
+    ordered = ['id'] + [col for col in TEXT_COLUMNS if col in df.columns]
+    df = df[ordered + [col for col in df.columns if col not in ordered]]
+    if columns is not None:
+        df = df[[col for col in df.columns if col in read_columns or col in TEXT_COLUMNS]]
+    return df
+
+
+# Función para obtener los ids ya guardados en una tabla (solo se lee la columna 'id')
+def load_saved_ids(store_dir, table):
+    df = _read_parts(os.path.join(store_dir, table), columns=['id'])
+    return set(df['id']) if not df.empty else set()
+
+
+# Función de lectura común: acepta un Excel (como hasta ahora) o un directorio de almacén
+def read_table(source, table=None):
+    if os.path.isdir(source):
+        if table is None:
+            tables = list_tables(source)
+            if not tables:
+                raise ValueError(f"El almacén {source} no contiene ninguna tabla.")
+            table = tables[0]
+        return read_results(source, table)
+    if table is not None and len(table) > EXCEL_SHEET_CHARS:
+        # Excel exportado con export_to_excel: la hoja de una tabla de nombre largo se busca en la hoja índice
+        index = pd.read_excel(source, sheet_name=INDEX_SHEET)
+        table = index.loc[index['tabla'] == table, 'hoja'].iloc[0]
+    return pd.read_excel(source, sheet_name=table if table is not None else 0)
+
+
+# Función para asignar a cada tabla un nombre de hoja de Excel único (máximo 31 caracteres, sin distinguir mayúsculas).
+# Las tablas con nombres más largos se recortan y, si el recorte coincide con otra hoja, se numeran (~2, ~3...)
+def sheet_names(tables, reserved=()):
+    used = {name.lower() for name in reserved}
+    names = {}
+    for table in tables:
+        name, counter = table[:EXCEL_SHEET_CHARS], 1
+        while name.lower() in used:
+            counter += 1
+            suffix = f"~{counter}"
+            name = table[:EXCEL_SHEET_CHARS - len(suffix)] + suffix
+        used.add(name.lower())
+        names[table] = name
+    return names
+
+
+# Función para exportar el almacén a un Excel con una hoja por tabla
+def export_to_excel(store_dir, excel_path, tables=None):
+    tables = tables or list_tables(store_dir)
+    names = sheet_names(tables, reserved=[INDEX_SHEET])
+    with pd.ExcelWriter(excel_path, engine='openpyxl') as writer:
+        for table in tables:
+            df = read_results(store_dir, table)
+            df.to_excel(writer, sheet_name=names[table], index=False)
+            print(f"Tabla '{table}' exportada ({len(df)} filas) en la hoja '{names[table]}'.")
+        # Si alguna tabla no cabe en el nombre de hoja, una hoja índice relaciona cada hoja con su tabla
+        if any(name != table for table, name in names.items()):
+            pd.DataFrame({'hoja': list(names.values()), 'tabla': list(names.keys())}).to_excel(
+                writer, sheet_name=INDEX_SHEET, index=False)
+    print(f"Almacén exportado a {excel_path}.")
+
+
+# Main
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Utilidades del almacén de resultados.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    export_parser = subparsers.add_parser("exportar", help="Exportar el almacén a un archivo Excel")
+    export_parser.add_argument("store_dir")
+    export_parser.add_argument("excel_path")
+    export_parser.add_argument("--tablas", nargs="*", default=None)
+    args = parser.parse_args()
+
+    if args.command == "exportar":
+        export_to_excel(args.store_dir, args.excel_path, args.tablas)
@@ -0,0 +1,177 @@
+# ==========================================================
+#  Proyecto: IMPLEMENTACIÓN DE UN SISTEMA DE EVALUACIÓN DE CAPACIDADES DE GRANDES MODELOS DE LENGUAJE A TRAVÉS DE BUCLES DE RESUMEN Y EXTENSIÓN DE TEXTOS
+#  Apartado: 3. DESARROLLO DEL SISTEMA EXPERIMENTAL
+#            3.1 DESARROLLO DEL SISTEMA DE EVALUACIÓN BASADO EN BUCLES DE RESUMEN Y EXPANSIÓN
+#  Autor: Javier González Pérez
+#  Fecha: 18/10/2026
+#  Descripción: Barrido de una rejilla de celdas (proveedor, modelo, temperatura) en un único proceso. Todas las celdas
+#               se ejecutan a la vez: cada proveedor tiene su propio limitador de cuota y su propio pool de llamadas
+#               concurrentes, que se reparte por turnos entre las celdas que lo usan. Así la rejilla completa tarda
+#               aproximadamente lo que el proveedor más lento, en lugar de ejecutar cada celda por separado.
+#               Los resultados de cada celda se guardan como una tabla propia del almacén de resultados.
+# ==========================================================
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from motor_concurrente import Progress, run_text_chain
+from checkpoint_bucle import StepCheckpoint
+from almacen_resultados import append_results, load_saved_ids
+from proveedores import build_provider
+from corpus_local import LocalCorpus, is_corpus
+
+
+# Función para construir la rejilla a partir de los modelos de cada proveedor y las temperaturas
+def expand_grid(models_by_provider, temperatures):
+    return [(provider, model, temperature)
+            for provider, models in models_by_provider.items()
+            for model in models
+            for temperature in temperatures]
+
+
+# Nombre de la tabla del almacén para una celda
+def cell_table(provider, model, temperature):
+    return f"{provider}_{model}_temp_{temperature}"
+
+
+# Función para envolver una llamada síncrona del proveedor con el pool de concurrencia de ese proveedor.
+# El semáforo se pide en cada llamada (no por cadena completa) y atiende en orden de llegada, por lo que las
+# celdas que comparten proveedor se van turnando llamada a llamada.
+def _pooled(func, semaphore):
+    async def call(*args):
+        async with semaphore:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, func, *args)
+    return call
+
+
+# Función para intercalar las cadenas de las celdas (una de cada celda por turno); devuelve (celda, cadena)
+def _round_robin(chains_by_cell):
+    ordered = []
+    for position in range(max((len(chains) for chains in chains_by_cell), default=0)):
+        for cell_idx, chains in enumerate(chains_by_cell):
+            if position < len(chains):
+                ordered.append((cell_idx, chains[position]))
+    return ordered
+
+
+async def run_sweep_async(grid, texts, iterations, providers, provider_concurrency, store_dir=None,
+                          use_checkpoints=True, attempts=3, quota_wait=60):
+    """
+    Ejecuta todas las celdas de la rejilla a la vez.
+
+    Args:
+        grid (list): Celdas (proveedor, modelo, temperatura).
+        texts (list): Textos con el formato de read_texts_from_excel.
+        iterations (int): Iteraciones de resumen y expansión por texto.
+        providers (dict): Proveedor por nombre (ver proveedores.py); cada uno con su propio limitador de tasa.
+        provider_concurrency (dict): Número máximo de llamadas en vuelo por proveedor.
+        store_dir (str): Almacén de resultados; los textos ya guardados en la tabla de una celda se omiten.
+        use_checkpoints (bool): Registrar cada paso en checkpoint_<celda>.jsonl para poder retomar el barrido.
+
+    Returns:
+        dict: DataFrame de resultados por celda.
+    """
+    semaphores = {name: asyncio.Semaphore(provider_concurrency.get(name, 8)) for name in providers}
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(max_workers=sum(provider_concurrency.get(name, 8) for name in providers))
+    loop.set_default_executor(executor)
+
+    cells, chains_by_cell, checkpoints = [], [], []
+    for provider_name, model, temperature in grid:
+        provider = providers[provider_name]
+        table = cell_table(provider_name, model, temperature)
+        saved_ids = load_saved_ids(store_dir, table) if store_dir else set()
+        cell_texts = [text_data for text_data in texts if str(text_data['id']) not in saved_ids]
+        if not cell_texts:
+            print(f"Celda {table}: todos los textos ya están guardados.")
+            continue
+
+        summarize = _pooled(lambda text, length, temp, m=model, p=provider: p.summarize(m, text, length, temp),
+                            semaphores[provider_name])
+        expand = _pooled(lambda text, length, temp, m=model, p=provider: p.expand(m, text, length, temp),
+                         semaphores[provider_name])
+        checkpoint = StepCheckpoint(f"checkpoint_{table}.jsonl") if use_checkpoints else None
+        progress = Progress(len(cell_texts) * iterations)
+        # Sin límite por cadena: la concurrencia la controla el pool del proveedor en cada llamada
+        chain_semaphore = asyncio.Semaphore(len(cell_texts))
+        chains = [run_text_chain(text_idx, text_data, iterations, summarize, expand, chain_semaphore, progress,
+                                 temperature, checkpoint, attempts=attempts,
+                                 quota_errors=provider.quota_errors(), quota_wait=quota_wait)
+                  for text_idx, text_data in enumerate(cell_texts)]
+        cells.append((provider_name, model, temperature, table))
+        chains_by_cell.append(chains)
+        checkpoints.append(checkpoint)
+
+    # Las tareas se crean intercaladas para que las primeras llamadas también se repartan entre celdas
+    tasks_by_cell = [[] for _ in chains_by_cell]
+    for cell_idx, chain in _round_robin(chains_by_cell):
+        tasks_by_cell[cell_idx].append(asyncio.create_task(chain))
+    try:
+        cell_rows = [await asyncio.gather(*tasks) for tasks in tasks_by_cell]
+    finally:
+        executor.shutdown(wait=False)
+        for checkpoint in checkpoints:
+            if checkpoint:
+                checkpoint.close()
+
+    results = {}
+    for (provider_name, model, temperature, table), rows_of_cell in zip(cells, cell_rows):
+        df = pd.DataFrame(rows_of_cell)
+        # Etiquetas de la celda para poder combinar tablas en los análisis posteriores
+        df['provider'], df['model'], df['temperature'] = provider_name, model, temperature
+        results[table] = df
+        if store_dir:
+            append_results(df, store_dir, table)
+    return results
+
+
+# Función de entrada síncrona
+def run_sweep(grid, texts, iterations, providers=None, provider_concurrency=None, store_dir=None, **kwargs):
+    providers = providers or {name: build_provider(name) for name in sorted({cell[0] for cell in grid})}
+    provider_concurrency = provider_concurrency or {}
+    start_time = time.time()
+    results = asyncio.run(run_sweep_async(grid, texts, iterations, providers, provider_concurrency, store_dir,
+                                          **kwargs))
+    elapsed = time.time() - start_time
+    print(f"Barrido de {len(grid)} celdas completado en {elapsed:.2f} segundos.")
+    for name, provider in providers.items():
+        print(f"Limitador de {name}: {provider.rate_limiter.stats()}")
+    return results
+
+
+# Función para leer los textos de entrada de un Excel o del corpus local (mismo formato que read_texts_from_excel)
+def read_texts(filename, limit=None):
+    if is_corpus(filename):
+        return LocalCorpus(filename).texts(0, limit)
+    df = pd.read_excel(filename)
+    if limit is not None:
+        df = df.head(limit)
+    columns = ['id', 'original_text', 'original_text_length', 'original_summary', 'original_summary_length']
+    return df[columns].to_dict('records')
+
+
+# Main
+if __name__ == "__main__":
+    # Rejilla del barrido: modelos por proveedor × temperaturas
+    models_by_provider = {
+        "groq": ["llama-3.2-1b-preview"],
+        "openai": ["gpt-4o-mini-2024-07-18"],
+        "gemini": ["gemini-1.5-flash"],
+    }
+    temperatures = [0.0, 0.5, 1.0, 1.5]
+    grid = expand_grid(models_by_provider, temperatures)
+
+    # Llamadas en vuelo por proveedor (se reparten entre todas las celdas del proveedor)
+    provider_concurrency = {"groq": 4, "openai": 16, "gemini": 4}
+
+    iterations = 10
+    store_dir = 'resultados_barrido'  # Una tabla por celda en el mismo almacén
+    texts = read_texts('nombre_del_excel_fuente.xlsx', limit=30)
+    print(f"Se han cargado {len(texts)} textos y {len(grid)} celdas.")
+
+    run_sweep(grid, texts, iterations, provider_concurrency=provider_concurrency, store_dir=store_dir)
+    print("Proceso completado.")
@@ -0,0 +1,196 @@
+# ==========================================================
+#  Proyecto: IMPLEMENTACIÓN DE UN SISTEMA DE EVALUACIÓN DE CAPACIDADES DE GRANDES MODELOS DE LENGUAJE A TRAVÉS DE BUCLES DE RESUMEN Y EXTENSIÓN DE TEXTOS
+#  Apartado: 3. DESARROLLO DEL SISTEMA EXPERIMENTAL
+#            3.1 DESARROLLO DEL SISTEMA DE EVALUACIÓN BASADO EN BUCLES DE RESUMEN Y EXPANSIÓN
+#  Autor: Javier González Pérez
+#  Fecha: 18/10/2026
+#  Descripción: Pruebas de carga del bucle de resumen y expansión contra el servidor simulado (servidor_simulado.py).
+#               Ejecuta el motor en modo secuencial (una cadena cada vez), concurrente y planificado por tokens
+#               con distinto número de textos y de llamadas en paralelo, y mide peticiones por segundo, latencia p50/p99
+#               de las llamadas y reintentos desperdiciados (respuestas 429 y 5xx). Los resultados se guardan en Excel.
+# ==========================================================
+
+import contextlib
+import io
+import random
+import threading
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import requests
+
+from motor_concurrente import run_iterations_concurrent, SUMMARY_FALLBACK, TEXT_FALLBACK
+from planificador_tokens import run_iterations_packed
+from proveedores import OpenAIProvider
+from servidor_simulado import start_server
+
+
+# Excepciones equivalentes a los errores de API de los SDK (APIStatusError y su subclase RateLimitError), con la
+# respuesta en `response` como en los SDK
+class SimulatedAPIError(Exception):
+    def __init__(self, status, headers):
+        super().__init__(f"Error {status} del servidor simulado")
+        self.status = status
+        self.response = SimpleNamespace(status_code=status, headers=headers)
+
+
+class SimulatedRateLimitError(SimulatedAPIError):
+    pass
+
+
+# Respuesta con la misma interfaz que with_raw_response de los SDK de OpenAI y Groq
+class _RawResponse:
+    def __init__(self, response):
+        self.headers = response.headers
+        self._payload = response.json()
+
+    def parse(self):
+        choices = [SimpleNamespace(message=SimpleNamespace(content=choice["message"]["content"]))
+                   for choice in self._payload["choices"]]
+        return SimpleNamespace(choices=choices)
+
+
+# Cliente HTTP mínimo con la interfaz client.chat.completions.with_raw_response.create de los SDK
+class HTTPChatClient:
+    def __init__(self, base_url, recorder=None):
+        self.base_url = base_url.rstrip("/")
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=64)
+        self.session.mount("http://", adapter)
+        self.recorder = recorder
+        self.chat = self
+        self.completions = self
+        self.with_raw_response = self
+
+    def create(self, model, messages, temperature=1.0):
+        start = time.perf_counter()
+        response = self.session.post(f"{self.base_url}/chat/completions",
+                                     json={"model": model, "messages": messages, "temperature": temperature})
+        if self.recorder is not None:
+            self.recorder.record(response.status_code, time.perf_counter() - start)
+        if response.status_code == 429:
+            raise SimulatedRateLimitError(response.status_code, response.headers)
+        if response.status_code != 200:
+            raise SimulatedAPIError(response.status_code, response.headers)
+        return _RawResponse(response)
+
+
+# Proveedor de OpenAI con las excepciones del cliente simulado en lugar de las del SDK
+class SimulatedProvider(OpenAIProvider):
+    def quota_errors(self):
+        return (SimulatedRateLimitError,)
+
+    def api_errors(self):
+        return (SimulatedAPIError,)
+
+
+# Clase para acumular la latencia y el código de cada llamada
+class CallRecorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = []
+        self.failures = 0
+
+    def record(self, status, latency):
+        with self.lock:
+            if status == 200:
+                self.latencies.append(latency)
+            else:
+                self.failures += 1
+
+
+# Función para generar textos sintéticos con longitudes variadas (como las de CNN/DailyMail)
+def synthetic_texts(count, seed=0):
+    rng = random.Random(seed)
+    texts = []
+    for i in range(count):
+        length = rng.choice([200, 400, 600, 800, 1200])
+        words = " ".join(f"palabra{rng.randint(0, 999)}" for _ in range(length))
+        texts.append({'id': f"sim{i:05d}", 'original_text': words, 'original_text_length': length,
+                      'original_summary': " ".join(words.split()[:length // 10]),
+                      'original_summary_length': length // 10})
+    return texts
+
+
+def run_scenario(mode, texts, iterations, concurrency, server_config, client_limits=None):
+    """
+    Ejecuta un escenario contra un servidor simulado nuevo.
+
+    Args:
+        mode (str): "secuencial" (una cadena cada vez), "concurrente" o "tokens".
+        concurrency (int): Cadenas en vuelo (tope de hilos en el modo por tokens).
+        server_config (dict): Parámetros de SimulatedBackend (latencia, rpm, tpm, errores...).
+        client_limits (tuple): (RPM, TPM, RPD) del limitador del cliente; None para no limitar en el cliente.
+                               El modo por tokens usa su TPM como presupuesto, así que lo necesita.
+
+    Returns:
+        dict: Fila de resultados del escenario.
+    """
+    server = start_server(**server_config)
+    recorder = CallRecorder()
+    provider = SimulatedProvider(limits=client_limits or (None, None, None),
+                                 client_factory=lambda: HTTPChatClient(f"{server.url}/v1", recorder))
+    summarize = lambda text, length, temp: provider.summarize("simulado", text, length, temp)
+    expand = lambda text, length, temp: provider.expand("simulado", text, length, temp)
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        if mode == "tokens":
+            results_df, _ = run_iterations_packed(texts, iterations, summarize, expand, 1.0,
+                                                  client_limits[1], expected_latency=1.0,
+                                                  max_concurrency=concurrency, attempts=3,
+                                                  quota_errors=provider.quota_errors())
+        else:
+            results_df, _ = run_iterations_concurrent(texts, iterations, summarize, expand, 1.0,
+                                                      1 if mode == "secuencial" else concurrency, attempts=3,
+                                                      quota_errors=provider.quota_errors())
+    elapsed = time.perf_counter() - start
+    server.shutdown()
+    server.server_close()
+
+    step_columns = [col for col in results_df.columns if col.startswith(("summary_", "new_text_"))]
+    fallbacks = int(results_df[step_columns].isin([SUMMARY_FALLBACK, TEXT_FALLBACK]).sum().sum())
+    latencies = np.array(recorder.latencies) if recorder.latencies else np.array([0.0])
+    return {
+        'modo': mode,
+        'textos': len(texts),
+        'concurrencia': 1 if mode == "secuencial" else concurrency,
+        'limitador_cliente': client_limits is not None,
+        'segundos': round(elapsed, 2),
+        'peticiones_s': round(len(recorder.latencies) / elapsed, 2) if elapsed else 0.0,
+        'latencia_p50': round(float(np.percentile(latencies, 50)), 4),
+        'latencia_p99': round(float(np.percentile(latencies, 99)), 4),
+        'reintentos_desperdiciados': recorder.failures,
+        'pasos_sin_resultado': fallbacks,
+    }
+
+
+# Main
+if __name__ == "__main__":
+    iterations = 3
+    scales = [10, 40]
+    concurrencies = [4, 16]
+    # Servidor simulado: latencia lognormal, límites de un nivel de OpenAI a escala de 10 s y 1 % de errores
+    server_config = {"latency": "lognormal:0.05:0.5", "requests_per_minute": 200, "tokens_per_minute": 400_000,
+                     "error_rate": 0.01, "seed": 0, "window": 10.0}
+    # Limitador del cliente con los mismos límites (expresados por minuto real: ventana de 10 s → × 6)
+    client_limits = (200 * 6, 400_000 * 6, None)
+
+    rows = []
+    for scale in scales:
+        texts = synthetic_texts(scale)
+        scenarios = [("secuencial", 1, None)]
+        scenarios += [("concurrente", concurrency, limits) for concurrency in concurrencies
+                      for limits in (None, client_limits)]
+        scenarios += [("tokens", max(concurrencies), client_limits)]
+        for mode, concurrency, limits in scenarios:
+            row = run_scenario(mode, texts, iterations, concurrency, server_config, limits)
+            print(row)
+            rows.append(row)
+
+    results = pd.DataFrame(rows)
+    print(results.to_string(index=False))
+    results.to_excel('benchmark_bucle.xlsx', index=False)
+    print("Resultados guardados en benchmark_bucle.xlsx.")
@@ -9,10 +9,18 @@
 # ==========================================================
 
 import os
-import time
+from functools import partial
 import pandas as pd
 import google.generativeai as genai
 from google.api_core.exceptions import ResourceExhausted
+from motor_concurrente import run_iterations_concurrent
+from planificador_tokens import run_iterations_packed
+from limitador_tasa import RateLimiter, estimate_call_tokens
+from checkpoint_bucle import StepCheckpoint
+from almacen_resultados import append_results, load_saved_ids
+from cache_llm import ResponseCache, cached_call
+from corpus_local import LocalCorpus, is_corpus
+from indice_longitudes import read_stratified_texts
 
 # Configuración de la clave API de Google AI Studios
 genai.configure(api_key="tu_clave_api_google")  # Reemplaza con tu clave API de Google AI
@@ -23,96 +31,64 @@ model = genai.GenerativeModel(model_name)
 REQUESTS_PER_MINUTE = 15
 TOKENS_PER_MINUTE = 1_000_000
 REQUESTS_PER_DAY = 1_500
+rate_limiter = RateLimiter(REQUESTS_PER_MINUTE, TOKENS_PER_MINUTE, REQUESTS_PER_DAY)
+
+# Caché de respuestas (opcional): con RESPONSE_CACHE_PATH = "cache_llm.sqlite" las repeticiones de un mismo prompt no se pagan
+RESPONSE_CACHE_PATH = None
+response_cache = ResponseCache(RESPONSE_CACHE_PATH) if RESPONSE_CACHE_PATH else None
 
 # Función para resumir texto
 def summary_text(model, original_text, max_summary_length, temperature=1.0):
     print(f"Resumiendo texto con el modelo {model_name} a una longitud de {max_summary_length} palabras...")
-    response = model.generate_content(f"Summarize the following text to approximately {max_summary_length} words:\n\n{original_text}")
+    prompt = f"Summarize the following text to approximately {max_summary_length} words:\n\n{original_text}"
+
+    def request():
+        rate_limiter.acquire(estimate_call_tokens(original_text, max_summary_length))
+        return model.generate_content(prompt).text
+
+    summary = cached_call(response_cache, "gemini", model_name, prompt, temperature, request)
     print("Resumen generado.")
-    return response.text
+    return summary
 
 # Función para completar texto
 def complete_text(model, summary, original_text_length, temperature=1.0):
     print(f"Expandiendo resumen a un texto de {original_text_length} palabras con el modelo {model_name}...")
-    response = model.generate_content(f"Expand the following summary into a complete text of {original_text_length} words:\n\n{summary}")
+    prompt = f"Expand the following summary into a complete text of {original_text_length} words:\n\n{summary}"
+
+    def request():
+        rate_limiter.acquire(estimate_call_tokens(summary, original_text_length))
+        return model.generate_content(prompt).text
+
+    new_text = cached_call(response_cache, "gemini", model_name, prompt, temperature, request)
     print("Texto expandido generado.")
-    return response.text
-
-# Función para iterar con seguimiento de progreso
-def run_iterations(model, texts, iterations, temperature=1.0, total_steps=1, current_step=0):
-    results = []
-    requests_made = 0
-    start_time = time.time()
-
-    for text_idx, text_data in enumerate(texts):
-        print(f"Procesando texto {text_idx + 1}/{len(texts)}...")
-        row = {
-            'id': text_data['id'],
-            'original_text': text_data['original_text'],
-            'original_text_length': text_data['original_text_length'],
-            'original_summary': text_data['original_summary'],
-            'original_summary_length': text_data['original_summary_length']
-        }
-        
-        # Inicializar el texto actual con el texto original
-        current_text = text_data['original_text']
-
-        for i in range(iterations):
-            print(f"Iteración {i + 1}/{iterations} con temperatura {temperature}...")
-            original_text_length = text_data['original_text_length']
-            summary_length = text_data['original_summary_length']
-
-            # Implementar reintentos para las llamadas a la API
-            for attempt in range(3):  # Intentar hasta 3 veces
-                try:
-                    summary = summary_text(model, current_text, summary_length, temperature)
-                    new_text = complete_text(model, summary, original_text_length, temperature)
-                    break  # Salir del bucle si la llamada fue exitosa
-                except ResourceExhausted as e:
-                    print(f"Error de cuota alcanzada: {e}")
-                    print("Esperando 60 segundos antes de reintentar...")
-                    time.sleep(60)
-                except Exception as e:
-                    print(f"Error en la llamada a la API: {e}")
-                    if attempt == 2:  # Si es el último intento, asignar valores predeterminados
-                        summary = "Resumen no disponible"
-                        new_text = "Texto no disponible"
-                    else:
-                        print("Reintentando...")
-
-            row[f'summary_{i + 1}_temp_{temperature}'] = summary
-            row[f'new_text_{i + 1}_temp_{temperature}'] = new_text
-
-            # Actualizar el texto actual para la siguiente iteración
-            current_text = new_text
-
-            # Actualizar el progreso
-            current_step += 1
-            progress = (current_step / total_steps) * 100
-            print(f"Progreso: {progress:.2f}% (Texto {text_idx + 1}, Iteración {i + 1}, Temperatura {temperature})")
-
-            # Control de tasa
-            requests_made += 1
-            if requests_made >= REQUESTS_PER_MINUTE:
-                elapsed_time = time.time() - start_time
-                if elapsed_time < 60:
-                    time_to_wait = 60 - elapsed_time
-                    print(f"Esperando {time_to_wait:.2f} segundos para respetar el límite de solicitudes por minuto...")
-                    time.sleep(time_to_wait)
-                requests_made = 0
-                start_time = time.time()
-
-        results.append(row)
+    return new_text
+
+# Función para iterar sobre varios textos en paralelo (las iteraciones de cada texto siguen en orden)
+def run_iterations_parallel(model, texts, iterations, temperature=1.0, max_concurrency=8, total_steps=1, current_step=0, checkpoint=None, tokens_per_minute=None):
+    summarize, expand = partial(summary_text, model), partial(complete_text, model)
+    if tokens_per_minute:
+        # Planificación por tokens: textos largos y cortos intercalados y llamadas según el presupuesto de TPM
+        results_df, current_step = run_iterations_packed(texts, iterations, summarize, expand, temperature, tokens_per_minute,
+                                                         max_concurrency=max_concurrency, total_steps=total_steps, current_step=current_step,
+                                                         checkpoint=checkpoint, quota_errors=(ResourceExhausted,), quota_wait=60)
+    else:
+        results_df, current_step = run_iterations_concurrent(texts, iterations, summarize, expand,
+                                                             temperature, max_concurrency, total_steps, current_step, checkpoint, quota_errors=(ResourceExhausted,), quota_wait=60)
     print(f"Modelo {model_name} completado.")
-    return pd.DataFrame(results), current_step
+    return results_df, current_step
 
-# Leer textos desde el archivo Excel
-def read_texts_from_excel(filename, start_row, limit=35): # Leer 35 textos por defecto (lo que deja como máximo)
+# Leer textos desde el archivo Excel (o desde el corpus local si el fichero es .arrow)
+def read_texts_from_excel(filename, start_row, limit=35, skip_ids=None): # Leer 35 textos por defecto (lo que deja como máximo)
+    if is_corpus(filename):
+        # Corpus local (corpus_local.py): solo se leen las filas necesarias
+        return LocalCorpus(filename).texts(max(start_row - 1, 0), limit, skip_ids)
     df = pd.read_excel(filename, skiprows=range(1, start_row))
     texts = []
     for _, row in df.iterrows():
         if len(texts) >= limit:
             break
+        if skip_ids and str(row['id']) in skip_ids:
+            continue
         text_data = {
             'id': row['id'],
             'original_text': row['original_text'],
@@ -125,34 +101,51 @@ def read_texts_from_excel(filename, start_row, limit=35): # Leer 35 textos por d
 
 # Main
 if __name__ == "__main__":
-    # Leer textos desde el archivo Excel (adaptar a al número de textos que faltaban por hacer )
-    start_row = 290 # Empezar desde la fila 97
-    texts = read_texts_from_excel('textos_gemini.xlsx', start_row=start_row, limit=10) # Número de textos a procesar
+    store_dir = 'resultados_bucle_resumen_expansion_gemini'  # Almacén Parquet (exportable a Excel con almacen_resultados.py)
+    sheet_name = model_name[:31]  # Limitar a 31 caracteres
+    # Cuota diaria guardada junto al checkpoint: al reanudar el bucle se descuentan las peticiones ya hechas hoy
+    rate_limiter.persist_daily(f"cuota_diaria_{sheet_name}.json")
+
+    # Leer textos desde el archivo Excel, omitiendo los que ya están guardados en el almacén de resultados
+    # (ya no hace falta ajustar start_row a mano para retomar una ejecución)
+    start_row = 0
+    saved_ids = load_saved_ids(store_dir, sheet_name)
+    source_file = 'textos_gemini.xlsx'  # Excel o corpus local (.arrow)
+    per_length_decile = None  # Con el corpus local (.arrow): textos por decil de longitud (muestra estratificada de indice_longitudes.py)
+    if per_length_decile and is_corpus(source_file):
+        texts = read_stratified_texts(source_file, per_length_decile, skip_ids=saved_ids)
+    else:
+        texts = read_texts_from_excel(source_file, start_row=start_row, limit=10, skip_ids=saved_ids) # Número de textos a procesar
     print(f"Se han cargado {len(texts)} textos desde el archivo Excel.")
 
     # Configuración del modelo y parámetros
     iterations = 10
     temperature = 1.0
+    max_concurrency = 8  # Número de textos procesándose a la vez
+    token_packing = False  # True: repartir las llamadas según el presupuesto de TOKENS_PER_MINUTE (max_concurrency pasa a ser un tope)
 
     # Cálculo del número total de pasos
     if texts:
         total_steps = len(texts) * iterations
         current_step = 0
 
-        # Guardar resultados en Excel
+        # Cada paso se registra en el checkpoint en cuanto llega; al relanzar se retoma en el paso que falte
+        checkpoint = StepCheckpoint(f"checkpoint_{sheet_name}.jsonl")
+
+        # Guardar resultados en el almacén (un fichero nuevo por ejecución, sin releer lo anterior)
         try:
-            with pd.ExcelWriter('resultados_bucle_resumen_expansion_gemini.xlsx', mode='a', if_sheet_exists='overlay') as writer:
-                print(f"Iniciando procesamiento para el modelo {model_name}...")
-                sheet_name = model_name[:31]  # Limitar a 31 caracteres
-                results_df, current_step = run_iterations(model, texts, iterations, temperature, total_steps, current_step)
-                # Obtener la última fila ocupada en el archivo Excel
-                existing_df = pd.read_excel('resultados_bucle_resumen_expansion_gemini.xlsx', sheet_name=sheet_name)
-                startrow = len(existing_df) + 1
-                results_df.to_excel(writer, sheet_name=sheet_name, startrow=startrow, index=False)
-                print(f"Resultados guardados para el modelo {model_name}.")
+            print(f"Iniciando procesamiento para el modelo {model_name}...")
+            results_df, current_step = run_iterations_parallel(model, texts, iterations, temperature, max_concurrency, total_steps, current_step, checkpoint,
+                                                               TOKENS_PER_MINUTE if token_packing else None)
+            append_results(results_df, store_dir, sheet_name)
+            print(f"Resultados guardados para el modelo {model_name}.")
         except Exception as e:
-            print(f"Error al guardar el archivo Excel: {e}")
+            print(f"Error al guardar los resultados: {e}")
+        finally:
+            checkpoint.close()
     else:
         print("No se obtuvo texto para procesar.")
 
+    if response_cache is not None:
+        print(f"Estadísticas de la caché: {response_cache.stats()}")
     print("Proceso completado.")
\ No newline at end of file
@@ -9,104 +9,103 @@
 # ==========================================================
 
 import os
+from functools import partial
 import pandas as pd
-from openai import OpenAI
+from openai import OpenAI, APIStatusError, RateLimitError
+from motor_concurrente import run_iterations_concurrent
+from planificador_tokens import run_iterations_packed
+from limitador_tasa import RateLimiter, estimate_call_tokens, error_headers
+from checkpoint_bucle import StepCheckpoint
+from almacen_resultados import append_results, load_saved_ids
+from cache_llm import ResponseCache, cached_call
+from corpus_local import LocalCorpus, is_corpus
+from indice_longitudes import read_stratified_texts
+from modo_batch import OpenAIBatchBackend, run_iterations_batch
 
 # Configuración del cliente de OpenAI
 client = OpenAI(api_key="tu_clave_api_openai")  # Reemplaza con tu clave API de OpenAI
 
-# Función para crear el archivo Excel si no existe
-def ensure_excel_file_exists(filename):
-    if not os.path.exists(filename):
-        print(f"El archivo {filename} no existe. Creándolo...")
-        with pd.ExcelWriter(filename, engine='openpyxl') as writer:
-            # Crear un archivo vacío con una hoja inicial
-            pd.DataFrame().to_excel(writer, sheet_name="Hoja1", index=False)
-        print(f"Archivo {filename} creado exitosamente.")
+# Límites de frecuencia (ajustar al nivel de la cuenta; se reajustan con las cabeceras x-ratelimit-* de OpenAI)
+REQUESTS_PER_MINUTE = 500
+TOKENS_PER_MINUTE = 200_000
+REQUESTS_PER_DAY = 10_000
+rate_limiter = RateLimiter(REQUESTS_PER_MINUTE, TOKENS_PER_MINUTE, REQUESTS_PER_DAY)
+
+# Caché de respuestas (opcional): con RESPONSE_CACHE_PATH = "cache_llm.sqlite" las repeticiones de un mismo prompt no se pagan
+RESPONSE_CACHE_PATH = None
+response_cache = ResponseCache(RESPONSE_CACHE_PATH) if RESPONSE_CACHE_PATH else None
 
 # Función para resumir texto
 def summary_text(client, model, original_text, max_summary_length, temperature=1.0):
     print(f"Resumiendo texto con el modelo {model} a una longitud de {max_summary_length} palabras...")
-    completion = client.chat.completions.create(
-        model=model,
-        messages=[
-            {"role": "system", "content": f"Summarize the following text to approximately {max_summary_length} words:"},
-            {"role": "user", "content": original_text},
-        ],
-        temperature=temperature,
-    )
+    messages = [
+        {"role": "system", "content": f"Summarize the following text to approximately {max_summary_length} words:"},
+        {"role": "user", "content": original_text},
+    ]
+
+    def request():
+        rate_limiter.acquire(estimate_call_tokens(original_text, max_summary_length))
+        try:
+            response = client.chat.completions.with_raw_response.create(model=model, messages=messages, temperature=temperature)
+        except APIStatusError as e:
+            # Los 429 y 5xx llegan como excepción: su retry-after y sus x-ratelimit-* también reajustan el limitador
+            rate_limiter.update_from_headers(error_headers(e))
+            raise
+        rate_limiter.update_from_headers(response.headers)
+        return response.parse().choices[0].message.content
+
+    summary = cached_call(response_cache, "openai", model, messages, temperature, request)
     print("Resumen generado.")
-    return completion.choices[0].message.content
+    return summary
 
 # Función para completar texto
 def complete_text(client, model, summary, original_text_length, temperature=1.0):
     print(f"Expandiendo resumen a un texto de {original_text_length} palabras con el modelo {model}...")
-    completion = client.chat.completions.create(
-        model=model,
-        messages=[
-            {"role": "system", "content": f"Expand the following summary into a complete text of {original_text_length} words:"},
-            {"role": "user", "content": summary},
-        ],
-        temperature=temperature,
-    )
+    messages = [
+        {"role": "system", "content": f"Expand the following summary into a complete text of {original_text_length} words:"},
+        {"role": "user", "content": summary},
+    ]
+
+    def request():
+        rate_limiter.acquire(estimate_call_tokens(summary, original_text_length))
+        try:
+            response = client.chat.completions.with_raw_response.create(model=model, messages=messages, temperature=temperature)
+        except APIStatusError as e:
+            # Los 429 y 5xx llegan como excepción: su retry-after y sus x-ratelimit-* también reajustan el limitador
+            rate_limiter.update_from_headers(error_headers(e))
+            raise
+        rate_limiter.update_from_headers(response.headers)
+        return response.parse().choices[0].message.content
+
+    new_text = cached_call(response_cache, "openai", model, messages, temperature, request)
     print("Texto expandido generado.")
-    return completion.choices[0].message.content
-
-# Función para iterar con seguimiento de progreso
-def run_iterations(client, model, texts, iterations, temperature=1.0, total_steps=1, current_step=0):
-    results = []
-    for text_idx, text_data in enumerate(texts):
-        print(f"Procesando texto {text_idx + 1}/{len(texts)}...")
-        row = {
-            'id': text_data['id'],
-            'original_text': text_data['original_text'],
-            'original_text_length': text_data['original_text_length'],
-            'original_summary': text_data['original_summary'],
-            'original_summary_length': text_data['original_summary_length']
-        }
-        
-        # Inicializar el texto actual con el texto original
-        current_text = text_data['original_text']
-
-        for i in range(iterations):
-            print(f"Iteración {i + 1}/{iterations} con temperatura {temperature}...")
-            original_text_length = text_data['original_text_length']
-            summary_length = text_data['original_summary_length']
-
-            # Implementar reintentos para las llamadas a la API
-            for attempt in range(3):  # Intentar hasta 3 veces
-                try:
-                    summary = summary_text(client, model, current_text, summary_length, temperature)
-                    new_text = complete_text(client, model, summary, original_text_length, temperature)
-                    break  # Salir del bucle si la llamada fue exitosa
-                except Exception as e:
-                    print(f"Error en la llamada a la API: {e}")
-                    if attempt == 2:  # Si es el último intento, asignar valores predeterminados
-                        summary = "Resumen no disponible"
-                        new_text = "Texto no disponible"
-                    else:
-                        print("Reintentando...")
-
-            row[f'summary_{i + 1}_temp_{temperature}'] = summary
-            row[f'new_text_{i + 1}_temp_{temperature}'] = new_text
-
-            # Actualizar el texto actual para la siguiente iteración
-            current_text = new_text
-
-            # Actualizar el progreso
-            current_step += 1
-            progress = (current_step / total_steps) * 100
-            print(f"Progreso: {progress:.2f}% (Texto {text_idx + 1}, Iteración {i + 1}, Temperatura {temperature})")
-
-        results.append(row)
+    return new_text
+
+# Función para iterar sobre varios textos en paralelo (las iteraciones de cada texto siguen en orden)
+def run_iterations_parallel(client, model, texts, iterations, temperature=1.0, max_concurrency=8, total_steps=1, current_step=0, checkpoint=None, tokens_per_minute=None):
+    summarize, expand = partial(summary_text, client, model), partial(complete_text, client, model)
+    if tokens_per_minute:
+        # Planificación por tokens: textos largos y cortos intercalados y llamadas según el presupuesto de TPM
+        results_df, current_step = run_iterations_packed(texts, iterations, summarize, expand, temperature, tokens_per_minute,
+                                                         max_concurrency=max_concurrency, total_steps=total_steps, current_step=current_step,
+                                                         checkpoint=checkpoint, quota_errors=(RateLimitError,), quota_wait=60)
+    else:
+        results_df, current_step = run_iterations_concurrent(texts, iterations, summarize, expand,
+                                                             temperature, max_concurrency, total_steps, current_step, checkpoint,
+                                                             quota_errors=(RateLimitError,), quota_wait=60)
     print(f"Modelo {model} completado.")
-    return pd.DataFrame(results), current_step
+    return results_df, current_step
 
-# Leer textos desde el archivo Excel
-def read_texts_from_excel(filename, start_row):
+# Leer textos desde el archivo Excel (o desde el corpus local si el fichero es .arrow)
+def read_texts_from_excel(filename, start_row, skip_ids=None):
+    if is_corpus(filename):
+        # Corpus local (corpus_local.py): solo se leen las filas necesarias
+        return LocalCorpus(filename).texts(max(start_row - 1, 0), None, skip_ids)
     df = pd.read_excel(filename, skiprows=range(1, start_row))
     texts = []
     for _, row in df.iterrows():
+        if skip_ids and str(row['id']) in skip_ids:
+            continue
         text_data = {
             'id': row['id'],
             'original_text': row['original_text'],
@@ -119,41 +118,55 @@ def read_texts_from_excel(filename, start_row):
 
 # Main
 if __name__ == "__main__":
-    # Leer textos desde el archivo Excel (todos los textos a partir de la fila especificada)
-    start_row = 0  # Empezar desde la primera fila
-    texts = read_texts_from_excel('textos_gpt4.xlsx', start_row=start_row)
-    print(f"Se han cargado {len(texts)} textos desde el archivo Excel.")
-
     # Configuración del modelo y parámetros
     iterations = 10
     temperature = 1.0
     model = "gpt-4o-mini-2024-07-18"
-
-    # Nombre del archivo de salida
-    output_file = 'resultados_bucle_resumen_expansion_gpt4.xlsx'
-
-    # Asegurarse de que el archivo Excel exista
-    ensure_excel_file_exists(output_file)
+    max_concurrency = 8  # Número de textos procesándose a la vez
+    token_packing = False  # True: repartir las llamadas según el presupuesto de TOKENS_PER_MINUTE (max_concurrency pasa a ser un tope)
+    execution_mode = "sync"  # "sync" (llamadas directas) o "batch" (Batch API por oleadas, mitad de coste)
+
+    # Almacén de salida (Parquet, un fichero por ejecución; exportable a Excel con almacen_resultados.py)
+    store_dir = 'resultados_bucle_resumen_expansion_gpt4'
+    sheet_name = model[:31]  # Limitar a 31 caracteres
+    # Cuota diaria guardada junto al checkpoint: al reanudar el bucle se descuentan las peticiones ya hechas hoy
+    rate_limiter.persist_daily(f"cuota_diaria_{sheet_name}.json")
+
+    # Leer textos desde el archivo Excel (todos los textos a partir de la fila especificada),
+    # omitiendo los que ya están guardados en el almacén de resultados
+    start_row = 0  # Empezar desde la primera fila
+    saved_ids = load_saved_ids(store_dir, sheet_name)
+    source_file = 'textos_gpt4.xlsx'  # Excel o corpus local (.arrow)
+    per_length_decile = None  # Con el corpus local (.arrow): textos por decil de longitud (muestra estratificada de indice_longitudes.py)
+    if per_length_decile and is_corpus(source_file):
+        texts = read_stratified_texts(source_file, per_length_decile, iterations=iterations, skip_ids=saved_ids)
+    else:
+        texts = read_texts_from_excel(source_file, start_row=start_row, skip_ids=saved_ids)
+    print(f"Se han cargado {len(texts)} textos desde el archivo Excel.")
 
     # Cálculo del número total de pasos
     if texts:
         total_steps = len(texts) * iterations
         current_step = 0
 
-        # Guardar resultados en Excel
-        with pd.ExcelWriter(output_file, mode='a', if_sheet_exists='overlay', engine='openpyxl') as writer:
-            print(f"Iniciando procesamiento para el modelo {model}...")
-            sheet_name = model[:31]  # Limitar a 31 caracteres
-            results_df, current_step = run_iterations(client, model, texts, iterations, temperature, total_steps, current_step)
-            # Obtener la última fila ocupada en el archivo Excel
+        print(f"Iniciando procesamiento para el modelo {model}...")
+        if execution_mode == "batch":
+            backend = OpenAIBatchBackend(client)
+            results_df, current_step = run_iterations_batch(backend, model, texts, iterations, temperature, work_dir="batch_bucle_gpt4")
+        else:
+            # Cada paso se registra en el checkpoint en cuanto llega; al relanzar se retoma en el paso que falte
+            checkpoint = StepCheckpoint(f"checkpoint_{sheet_name}.jsonl")
             try:
-                existing_df = pd.read_excel(output_file, sheet_name=sheet_name)
-                startrow = len(existing_df) + 1
-            except ValueError:
-                startrow = 0
-            results_df.to_excel(writer, sheet_name=sheet_name, startrow=startrow, index=False)
-            print(f"Resultados guardados para el modelo {model}.")
+                results_df, current_step = run_iterations_parallel(client, model, texts, iterations, temperature, max_concurrency, total_steps, current_step, checkpoint,
+                                                                   TOKENS_PER_MINUTE if token_packing else None)
+            finally:
+                checkpoint.close()
+        # Guardar resultados en el almacén (un fichero nuevo por ejecución, sin releer lo anterior)
+        append_results(results_df, store_dir, sheet_name)
+        print(f"Resultados guardados para el modelo {model}.")
     else:
         print("No se obtuvo texto para procesar.")
 
+    if response_cache is not None:
+        print(f"Estadísticas de la caché: {response_cache.stats()}")
     print("Proceso completado.")
@@ -0,0 +1,129 @@
+# ==========================================================
+#  Proyecto: IMPLEMENTACIÓN DE UN SISTEMA DE EVALUACIÓN DE CAPACIDADES DE GRANDES MODELOS DE LENGUAJE A TRAVÉS DE BUCLES DE RESUMEN Y EXTENSIÓN DE TEXTOS
+#  Apartado: 3. DESARROLLO DEL SISTEMA EXPERIMENTAL
+#            3.1 DESARROLLO DEL SISTEMA DE EVALUACIÓN BASADO EN BUCLES DE RESUMEN Y EXPANSIÓN
+#  Autor: Javier González Pérez
+#  Fecha: 18/10/2026
+#  Descripción: Caché en disco de respuestas de los LLM, direccionada por contenido: la clave es un hash de
+#               (proveedor, modelo, prompt, temperatura, semilla). Tiene expiración por antigüedad (TTL), límite de tamaño
+#               con expulsión de las entradas menos usadas recientemente y contadores de aciertos y fallos. Cualquier
+#               llamada a un proveedor puede usarla de forma opcional a través de cached_call.
+# ==========================================================
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+
+# Función para calcular la clave de una petición
+def make_key(provider, model, prompt, temperature=None, seed=None):
+    # El prompt puede ser un texto o una lista de mensajes; se serializa de forma canónica
+    payload = json.dumps([provider, model, prompt, temperature, seed], ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# Clase que implementa la caché de respuestas sobre SQLite
+class ResponseCache:
+    def __init__(self, path="cache_llm.sqlite", max_bytes=500 * 1024 * 1024, ttl=None):
+        """
+        Args:
+            path (str): Fichero SQLite de la caché.
+            max_bytes (int): Tamaño máximo de las respuestas guardadas; al superarlo se expulsan las menos usadas.
+            ttl (float): Segundos que una respuesta sigue siendo válida (None para que no caduque).
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, provider TEXT, model TEXT, response TEXT, "
+            "size INTEGER, created REAL, last_access REAL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON responses(last_access)")
+        self.conn.commit()
+
+    def get(self, key):
+        with self.lock:
+            row = self.conn.execute("SELECT response, created FROM responses WHERE key = ?", (key,)).fetchone()
+            now = time.time()
+            if row is not None and self.ttl is not None and now - row[1] > self.ttl:
+                self.conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self.conn.commit()
+                self.evictions += 1
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self.conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            self.conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key, response, provider=None, model=None):
+        if not isinstance(response, str):
+            return
+        now = time.time()
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, provider, model, response, len(response.encode("utf-8")), now, now),
+            )
+            self._evict()
+            self.conn.commit()
+
+    def _evict(self):
+        # Expulsar primero lo caducado y después lo menos usado hasta volver al tamaño máximo
+        if self.ttl is not None:
+            cursor = self.conn.execute("DELETE FROM responses WHERE created < ?", (time.time() - self.ttl,))
+            self.evictions += cursor.rowcount
+        total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        freed = 0
+        victims = []
+        for key, size in self.conn.execute("SELECT key, size FROM responses ORDER BY last_access"):
+            if total - freed <= self.max_bytes:
+                break
+            victims.append((key,))
+            freed += size
+        self.conn.executemany("DELETE FROM responses WHERE key = ?", victims)
+        self.evictions += len(victims)
+
+    def stats(self):
+        with self.lock:
+            entries, size = self.conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0, "entries": entries, "bytes": size}
+
+    def close(self):
+        self.conn.close()
+
+
+# Función para envolver una llamada al proveedor con la caché (si cache es None se llama siempre)
+def cached_call(cache, provider, model, prompt, temperature, request, seed=None):
+    """
+    Args:
+        cache (ResponseCache): Caché a usar, o None para desactivarla.
+        prompt (str | list): Prompt o lista de mensajes exactamente como se envían al proveedor.
+        request (callable): Función sin argumentos que hace la llamada real y devuelve el texto de la respuesta.
+
+    Returns:
+        str: Respuesta guardada en la caché o la nueva respuesta del proveedor.
+    """
+    if cache is None:
+        return request()
+    key = make_key(provider, model, prompt, temperature, seed)
+    response = cache.get(key)
+    if response is None:
+        response = request()
+        cache.put(key, response, provider, model)
+    return response
@@ -0,0 +1,61 @@
+# ==========================================================
+#  Proyecto: IMPLEMENTACIÓN DE UN SISTEMA DE EVALUACIÓN DE CAPACIDADES DE GRANDES MODELOS DE LENGUAJE A TRAVÉS DE BUCLES DE RESUMEN Y EXTENSIÓN DE TEXTOS
+#  Apartado: 3. DESARROLLO DEL SISTEMA EXPERIMENTAL
+#            3.1 DESARROLLO DEL SISTEMA DE EVALUACIÓN BASADO EN BUCLES DE RESUMEN Y EXPANSIÓN
+#  Autor: Javier González Pérez
+#  Fecha: 18/10/2026
+#  Descripción: Registro de pasos (checkpoint) a prueba de fallos para los bucles de resumen y expansión. Cada resultado
+#               (id de texto, iteración, summary/new_text) se añade a un JSONL y se fuerza a disco en cuanto llega, de
+#               modo que al relanzar un trabajo parcial se retoma exactamente en el paso que falta, sin llamadas repetidas.
+# ==========================================================
+
+import json
+import os
+import threading
+
+
+# Clase que mantiene el registro de pasos completados de una ejecución
+class StepCheckpoint:
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.steps = self._load(path)
+        self.file = open(path, "a", encoding="utf-8")
+        if self.steps:
+            print(f"Checkpoint {path}: {len(self.steps)} pasos ya completados, se retoma desde ahí.")
+
+    @staticmethod
+    def _key(text_id, iteration, kind, temperature):
+        return (str(text_id), int(iteration), kind, float(temperature))
+
+    def _load(self, path):
+        steps = {}
+        if not os.path.exists(path):
+            return steps
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # Última línea cortada por una interrupción a mitad de escritura
+                    continue
+                key = self._key(entry["id"], entry["iteration"], entry["kind"], entry["temperature"])
+                steps[key] = entry["text"]
+        return steps
+
+    def get(self, text_id, iteration, kind, temperature):
+        return self.steps.get(self._key(text_id, iteration, kind, temperature))
+
+    def record(self, text_id, iteration, kind, temperature, text):
+        # Añadir el paso y forzarlo a disco antes de seguir
+        entry = {"id": str(text_id), "iteration": int(iteration), "kind": kind,
+                 "temperature": float(temperature), "text": text}
+        with self.lock:
+            self.file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.steps[self._key(text_id, iteration, kind, temperature)] = text
+
+    def close(self):
+        self.file.close()
+
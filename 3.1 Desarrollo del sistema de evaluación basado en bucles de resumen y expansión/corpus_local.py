@@ -0,0 +1,154 @@
+# ==========================================================
+#  Proyecto: IMPLEMENTACIÓN DE UN SISTEMA DE EVALUACIÓN DE CAPACIDADES DE GRANDES MODELOS DE LENGUAJE A TRAVÉS DE BUCLES DE RESUMEN Y EXTENSIÓN DE TEXTOS
+#  Apartado: 3. DESARROLLO DEL SISTEMA EXPERIMENTAL
+#            3.1 DESARROLLO DEL SISTEMA DE EVALUACIÓN BASADO EN BUCLES DE RESUMEN Y EXPANSIÓN
+#  Autor: Javier González Pérez
+#  Fecha: 18/10/2026
+#  Descripción: Copia local del corpus CNN/DailyMail en un fichero Arrow IPC sin comprimir, que se abre con memory map.
+#               Se importa una sola vez desde el JSONL de Descarga_textos.py (o desde un Excel) y después permite acceder
+#               a un texto por id o por posición sin leer el resto, seleccionar columnas y obtener rangos de filas sin
+#               copiarlos. Los scripts de bucle, el barrido y la generación de preguntas cargan sus textos desde aquí
+#               cuando el fichero de entrada es un corpus (.arrow) en lugar de un Excel. Opcionalmente, la importación
+#               descarta los textos casi duplicados (deduplicacion.py).
+#
+#  Uso:  python corpus_local.py importar textos_cnn_dailymail.jsonl corpus_cnn_dailymail.arrow [--deduplicar 0.8]
+# ==========================================================
+
+import argparse
+import json
+import os
+
+import pandas as pd
+import pyarrow as pa
+
+from deduplicacion import deduplicate
+
+CORPUS_COLUMNS = ['id', 'original_text', 'original_text_length', 'original_summary', 'original_summary_length']
+CORPUS_EXTENSION = ".arrow"
+
+
+# Función para leer la fuente del corpus (JSONL de Descarga_textos.py, Excel o DataFrame)
+def _read_source(source):
+    if isinstance(source, pd.DataFrame):
+        return source
+    if source.endswith(".jsonl"):
+        with open(source, "r", encoding="utf-8") as f:
+            return pd.DataFrame([json.loads(line) for line in f if line.strip()])
+    return pd.read_excel(source)
+
+
+def build_corpus(source, corpus_path, deduplicate_threshold=None):
+    """
+    Importa los textos al fichero del corpus (se sobrescribe si ya existe).
+
+    Args:
+        source (str | pd.DataFrame): JSONL de Descarga_textos.py, Excel con las columnas de los textos o DataFrame.
+        corpus_path (str): Fichero Arrow de salida.
+        deduplicate_threshold (float): Si se indica, se deja un solo texto por grupo de casi duplicados con esa
+                                       similitud (deduplicacion.py) y el informe se guarda en
+                                       `<corpus_path>.duplicados.xlsx`.
+
+    Returns:
+        int: Número de textos importados.
+    """
+    df = _read_source(source)
+    df = df[CORPUS_COLUMNS].copy()
+    df['id'] = df['id'].astype(str)
+    df = df.drop_duplicates('id', keep='first').reset_index(drop=True)
+    if deduplicate_threshold is not None:
+        df, _ = deduplicate(df, threshold=deduplicate_threshold, report_path=corpus_path + ".duplicados.xlsx")
+    table = pa.Table.from_pandas(df, preserve_index=False)
+
+    # Sin compresión, para que los buffers del fichero se puedan usar directamente desde el memory map
+    tmp_path = corpus_path + ".tmp"
+    with pa.OSFile(tmp_path, "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, corpus_path)
+    print(f"Corpus creado en {corpus_path} con {len(df)} textos.")
+    return len(df)
+
+
+# Función para saber si un fichero de entrada es un corpus local
+def is_corpus(path):
+    return isinstance(path, str) and path.endswith(CORPUS_EXTENSION)
+
+
+# Clase de acceso al corpus local
+class LocalCorpus:
+    def __init__(self, corpus_path):
+        # Abrir el fichero con memory map: leer la tabla no copia los datos, solo los mapea
+        self.path = corpus_path
+        self._source = pa.memory_map(corpus_path, "r")
+        self.table = pa.ipc.open_file(self._source).read_all()
+        self._index = None
+
+    def __len__(self):
+        return self.table.num_rows
+
+    @property
+    def index(self):
+        # Índice id → fila, construido la primera vez que se busca por id
+        if self._index is None:
+            self._index = {text_id: row for row, text_id in enumerate(self.table.column('id').to_pylist())}
+        return self._index
+
+    def slice(self, offset=0, length=None, columns=None):
+        """
+        Devuelve las filas [offset, offset + length) como tabla Arrow, sin copiar los datos.
+        """
+        table = self.table.select(columns) if columns is not None else self.table
+        return table.slice(offset, length)
+
+    def get(self, text_id, columns=None):
+        """
+        Devuelve el texto con ese id como diccionario (None si no está en el corpus).
+        """
+        row = self.index.get(str(text_id))
+        if row is None:
+            return None
+        return self.slice(row, 1, columns).to_pylist()[0]
+
+    def take_ids(self, ids, columns=None):
+        """
+        Devuelve los textos de la lista de ids (en ese orden) como tabla Arrow; los ids desconocidos se omiten.
+        """
+        rows = [self.index[str(text_id)] for text_id in ids if str(text_id) in self.index]
+        table = self.table.select(columns) if columns is not None else self.table
+        return table.take(rows)
+
+    def texts(self, offset=0, limit=None, skip_ids=None, columns=CORPUS_COLUMNS):
+        """
+        Devuelve hasta `limit` textos a partir de la posición `offset`, con el formato de read_texts_from_excel,
+        omitiendo los ids de `skip_ids`.
+        """
+        skip_ids = skip_ids or set()
+        texts = []
+        batch_size = max(limit or 0, 64)
+        while offset < len(self) and (limit is None or len(texts) < limit):
+            for text_data in self.slice(offset, batch_size, columns).to_pylist():
+                if limit is not None and len(texts) >= limit:
+                    break
+                if text_data['id'] not in skip_ids:
+                    texts.append(text_data)
+            offset += batch_size
+        return texts
+
+    def close(self):
+        self.table = None
+        self._source.close()
+
+
+# Main
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Utilidades del corpus local.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    import_parser = subparsers.add_parser("importar", help="Importar un JSONL o un Excel de textos al corpus local")
+    import_parser.add_argument("source")
+    import_parser.add_argument("corpus_path")
+    import_parser.add_argument("--deduplicar", type=float, default=None, metavar="UMBRAL",
+                               help="Descartar casi duplicados con similitud de Jaccard >= UMBRAL (p. ej. 0.8)")
+    args = parser.parse_args()
+
+    if args.command == "importar":
+        build_corpus(args.source, args.corpus_path, args.deduplicar)
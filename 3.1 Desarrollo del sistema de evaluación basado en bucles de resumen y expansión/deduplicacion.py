@@ -0,0 +1,182 @@
+# ==========================================================
+#  Proyecto: IMPLEMENTACIÓN DE UN SISTEMA DE EVALUACIÓN DE CAPACIDADES DE GRANDES MODELOS DE LENGUAJE A TRAVÉS DE BUCLES DE RESUMEN Y EXTENSIÓN DE TEXTOS
+#  Apartado: 3. DESARROLLO DEL SISTEMA EXPERIMENTAL
+#            3.1 DESARROLLO DEL SISTEMA DE EVALUACIÓN BASADO EN BUCLES DE RESUMEN Y EXPANSIÓN
+#  Autor: Javier González Pérez
+#  Fecha: 18/10/2026
+#  Descripción: Detección de textos casi duplicados del corpus (noticias sindicadas o casi idénticas) con MinHash y LSH
+#               por bandas. Cada texto se reduce a una firma MinHash de sus n-gramas de palabras; solo se comparan los
+#               textos que coinciden en alguna banda de la firma, por lo que el coste crece casi linealmente con el
+#               número de textos. Los pares con similitud de Jaccard estimada por encima del umbral se agrupan con
+#               union-find y de cada grupo se conserva un único representante (el primero en el orden del corpus).
+#               La usa la importación del corpus local (corpus_local.py) para no gastar llamadas en duplicados.
+# ==========================================================
+
+import re
+import zlib
+
+import numpy as np
+import pandas as pd
+
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+MAX_HASH = np.uint64((1 << 32) - 1)
+SHINGLE_BASE = np.uint64(1_000_003)
+WORD_PATTERN = re.compile(r"\w+")
+
+
+# Función para obtener los hashes de los n-gramas de palabras (shingles) de un texto
+def shingle_hashes(text, k=5, word_cache=None):
+    words = WORD_PATTERN.findall(text.lower()) if isinstance(text, str) else []
+    if not words:
+        return np.empty(0, dtype=np.uint64)
+    cache = word_cache if word_cache is not None else {}
+    word_hashes = np.fromiter((cache[word] if word in cache else cache.setdefault(word, zlib.crc32(word.encode()))
+                               for word in words), dtype=np.uint64, count=len(words))
+    if len(words) < k:
+        k = len(words)
+    # Hash polinómico de cada ventana de k palabras (el desbordamiento de uint64 es intencionado)
+    shingles = np.zeros(len(words) - k + 1, dtype=np.uint64)
+    with np.errstate(over='ignore'):
+        for offset in range(k):
+            shingles = shingles * SHINGLE_BASE + word_hashes[offset:len(words) - k + 1 + offset]
+    return np.unique(shingles)
+
+
+# Clase que calcula las firmas MinHash con una familia de permutaciones (a·x + b) mod p
+class MinHasher:
+    def __init__(self, num_perm=128, k=5, seed=1):
+        rng = np.random.RandomState(seed)
+        self.num_perm = num_perm
+        self.k = k
+        self.a = rng.randint(1, int(MERSENNE_PRIME), size=num_perm, dtype=np.uint64)
+        self.b = rng.randint(0, int(MERSENNE_PRIME), size=num_perm, dtype=np.uint64)
+        self.word_cache = {}
+
+    def signature(self, text):
+        hashes = shingle_hashes(text, self.k, self.word_cache) & MAX_HASH
+        if hashes.size == 0:
+            return None
+        with np.errstate(over='ignore'):
+            permuted = (np.outer(self.a, hashes) + self.b[:, None]) % MERSENNE_PRIME & MAX_HASH
+        return permuted.min(axis=1).astype(np.uint32)
+
+    def signatures(self, texts):
+        """
+        Devuelve (matriz de firmas n × num_perm, máscara de textos con firma). Los textos vacíos no tienen firma y
+        nunca se marcan como duplicados.
+        """
+        matrix = np.zeros((len(texts), self.num_perm), dtype=np.uint32)
+        valid = np.zeros(len(texts), dtype=bool)
+        for row, text in enumerate(texts):
+            signature = self.signature(text)
+            if signature is not None:
+                matrix[row] = signature
+                valid[row] = True
+        return matrix, valid
+
+
+# Función para elegir bandas × filas de forma que el umbral aproximado de LSH, (1/b)^(1/r), quede justo por debajo del
+# umbral pedido (se prima no perder duplicados; los falsos candidatos se descartan al verificar)
+def choose_bands(num_perm, threshold):
+    options = [(num_perm // rows, rows) for rows in range(1, num_perm + 1) if num_perm % rows == 0]
+    below = [(bands, rows) for bands, rows in options if (1 / bands) ** (1 / rows) <= threshold]
+    return max(below, key=lambda option: (1 / option[0]) ** (1 / option[1])) if below else options[0]
+
+
+# Union-find con compresión de caminos; la raíz de cada grupo es siempre su índice más bajo
+class UnionFind:
+    def __init__(self, size):
+        self.parent = np.arange(size)
+
+    def find(self, item):
+        root = item
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[item] != root:
+            self.parent[item], item = root, self.parent[item]
+        return root
+
+    def union(self, first, second):
+        first, second = self.find(first), self.find(second)
+        if first != second:
+            self.parent[max(first, second)] = min(first, second)
+
+
+def find_near_duplicates(texts, threshold=0.8, num_perm=128, k=5, seed=1, max_group_pairs=20):
+    """
+    Agrupa los textos casi duplicados.
+
+    Args:
+        texts (list): Textos en el orden del corpus.
+        threshold (float): Similitud de Jaccard (estimada con MinHash) a partir de la cual dos textos son duplicados.
+        num_perm (int): Tamaño de la firma MinHash.
+        k (int): Palabras por shingle.
+        max_group_pairs (int): En una cubeta con más textos que este valor, cada texto se compara solo con el primero
+                               de la cubeta en lugar de con todos (evita el coste cuadrático en cubetas grandes).
+
+    Returns:
+        tuple: (representante de cada texto como array de índices, similitud estimada con su representante)
+    """
+    signatures, valid = MinHasher(num_perm, k, seed).signatures(texts)
+    bands, rows = choose_bands(num_perm, threshold)
+    union_find = UnionFind(len(texts))
+    candidates = np.flatnonzero(valid)
+
+    def similar(first, second):
+        return np.mean(signatures[first] == signatures[second]) >= threshold
+
+    for band in range(bands):
+        # Cubetas: textos con la misma porción de firma en esta banda
+        band_view = np.ascontiguousarray(signatures[candidates, band * rows:(band + 1) * rows])
+        keys = band_view.view(np.dtype((np.void, band_view.dtype.itemsize * rows))).ravel()
+        _, inverse, counts = np.unique(keys, return_inverse=True, return_counts=True)
+        order = np.argsort(inverse.ravel(), kind='stable')
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        for bucket in np.flatnonzero(counts > 1):
+            members = candidates[order[starts[bucket]:starts[bucket] + counts[bucket]]]
+            if len(members) <= max_group_pairs:
+                pairs = ((members[i], members[j]) for i in range(len(members)) for j in range(i + 1, len(members)))
+            else:
+                pairs = ((members[0], member) for member in members[1:])
+            for first, second in pairs:
+                if union_find.find(first) != union_find.find(second) and similar(first, second):
+                    union_find.union(first, second)
+
+    representatives = np.array([union_find.find(row) for row in range(len(texts))])
+    similarity = (signatures == signatures[representatives]).mean(axis=1)
+    similarity[~valid] = 1.0
+    return representatives, similarity
+
+
+def deduplicate(df, text_column='original_text', threshold=0.8, report_path=None, **minhash_kwargs):
+    """
+    Deja un único representante por grupo de textos casi duplicados.
+
+    Args:
+        df (pd.DataFrame): Textos con columna 'id' y la columna de texto.
+        report_path (str): Excel donde guardar el informe de grupos (None para no guardarlo).
+
+    Returns:
+        tuple: (DataFrame sin duplicados, informe con una fila por texto de cada grupo con más de un miembro:
+                'cluster', 'id', 'representative_id', 'similarity', 'kept')
+    """
+    df = df.reset_index(drop=True)
+    representatives, similarity = find_near_duplicates(df[text_column].tolist(), threshold, **minhash_kwargs)
+    kept = representatives == np.arange(len(df))
+
+    sizes = np.bincount(representatives, minlength=len(df))
+    in_cluster = sizes[representatives] > 1
+    report = pd.DataFrame({
+        'cluster': representatives[in_cluster],
+        'id': df['id'].to_numpy()[in_cluster],
+        'representative_id': df['id'].to_numpy()[representatives[in_cluster]],
+        'similarity': similarity[in_cluster].round(3),
+        'kept': kept[in_cluster],
+    }).sort_values(['cluster', 'kept'], ascending=[True, False]).reset_index(drop=True)
+
+    print(f"Deduplicación: {len(df)} textos, {int((~kept).sum())} casi duplicados descartados "
+          f"en {report['cluster'].nunique()} grupos (umbral {threshold}).")
+    if report_path is not None:
+        report.to_excel(report_path, index=False)
+        print(f"Informe de duplicados guardado en {report_path}.")
+    return df[kept].reset_index(drop=True), report
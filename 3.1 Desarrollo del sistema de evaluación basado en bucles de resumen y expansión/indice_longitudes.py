@@ -0,0 +1,141 @@
+# ==========================================================
+#  Proyecto: IMPLEMENTACIÓN DE UN SISTEMA DE EVALUACIÓN DE CAPACIDADES DE GRANDES MODELOS DE LENGUAJE A TRAVÉS DE BUCLES DE RESUMEN Y EXTENSIÓN DE TEXTOS
+#  Apartado: 3. DESARROLLO DEL SISTEMA EXPERIMENTAL
+#            3.1 DESARROLLO DEL SISTEMA DE EVALUACIÓN BASADO EN BUCLES DE RESUMEN Y EXPANSIÓN
+#  Autor: Javier González Pérez
+#  Fecha: 18/10/2026
+#  Descripción: Índice de longitudes del corpus local (corpus_local.py). Asigna a cada texto su decil de longitud del
+#               texto original y del resumen original y permite extraer una muestra estratificada reproducible (N textos
+#               por decil, o tantos como quepan en un presupuesto de tokens) en lugar de tomar los textos en el orden de
+#               descarga, en el que los artículos largos están sobrerrepresentados respecto al coste que suponen.
+#
+#  Uso:  python indice_longitudes.py muestra corpus_cnn_dailymail.arrow --por-estrato 3 --salida textos_muestra.xlsx
+# ==========================================================
+
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from corpus_local import LocalCorpus
+from planificador_tokens import estimate_chain_tokens
+
+DECILES = 10
+
+
+# Función para asignar a cada valor su cuantil (0..buckets-1)
+def _quantile_bucket(values, buckets=DECILES):
+    edges = np.quantile(values, np.linspace(0, 1, buckets + 1)[1:-1])
+    return np.searchsorted(edges, values, side='right')
+
+
+def build_length_index(corpus, index_path=None):
+    """
+    Construye el índice de longitudes de un corpus y, opcionalmente, lo guarda en Parquet.
+
+    Args:
+        corpus (LocalCorpus): Corpus local abierto.
+        index_path (str): Fichero Parquet donde guardar el índice (None para no guardarlo).
+
+    Returns:
+        pd.DataFrame: Una fila por texto con 'id', 'row', las longitudes y 'text_decile' / 'summary_decile'.
+    """
+    columns = ['id', 'original_text_length', 'original_summary_length']
+    index = corpus.slice(columns=columns).to_pandas()
+    index.insert(1, 'row', np.arange(len(index)))
+    index['text_decile'] = _quantile_bucket(index['original_text_length'].to_numpy())
+    index['summary_decile'] = _quantile_bucket(index['original_summary_length'].to_numpy())
+    if index_path is not None:
+        index.to_parquet(index_path, index=False)
+    return index
+
+
+# Función para cargar el índice guardado junto al corpus (se reconstruye si el corpus es más reciente)
+def load_length_index(corpus_path):
+    index_path = corpus_path + ".longitudes.parquet"
+    if os.path.exists(index_path) and os.path.getmtime(index_path) >= os.path.getmtime(corpus_path):
+        return pd.read_parquet(index_path)
+    return build_length_index(LocalCorpus(corpus_path), index_path)
+
+
+def stratified_sample(index, per_stratum=None, token_budget=None, iterations=10, by=('text_decile',), seed=0):
+    """
+    Extrae una muestra estratificada reproducible del índice de longitudes.
+
+    Dentro de cada estrato el orden lo fija la semilla; la muestra se forma por rondas (un texto de cada estrato por
+    ronda), de modo que con cualquier presupuesto queda equilibrada entre estratos y una muestra más pequeña es
+    siempre un subconjunto de otra más grande con la misma semilla.
+
+    Args:
+        index (pd.DataFrame): Índice de build_length_index / load_length_index.
+        per_stratum (int): Textos por estrato (None para no limitar).
+        token_budget (int): Tokens estimados máximos de la muestra completa (None para no limitar).
+        iterations (int): Iteraciones del bucle, para estimar el coste de cada texto.
+        by (tuple): Columnas que definen los estratos ('text_decile' y/o 'summary_decile').
+        seed (int): Semilla del muestreo.
+
+    Returns:
+        pd.DataFrame: Filas del índice seleccionadas, con las columnas 'stratum_rank' y 'chain_tokens'.
+    """
+    if per_stratum is None and token_budget is None:
+        raise ValueError("Hay que indicar per_stratum, token_budget o ambos.")
+    rng = np.random.default_rng(seed)
+    shuffled = index.iloc[rng.permutation(len(index))].copy()
+    shuffled['stratum_rank'] = shuffled.groupby(list(by)).cumcount()
+    if per_stratum is not None:
+        shuffled = shuffled[shuffled['stratum_rank'] < per_stratum]
+    shuffled = shuffled.sort_values(['stratum_rank'] + list(by), kind='stable')
+
+    shuffled['chain_tokens'] = [estimate_chain_tokens(text_data, iterations)
+                                for text_data in shuffled[['original_text_length', 'original_summary_length']]
+                                .to_dict('records')]
+    if token_budget is not None:
+        # Se corta en el primer texto que ya no cabe, para no romper el equilibrio entre estratos
+        fits = shuffled['chain_tokens'].cumsum() <= token_budget
+        shuffled = shuffled[fits.cummin()]
+    return shuffled.reset_index(drop=True)
+
+
+# Función para cargar los textos de una muestra estratificada con el formato de read_texts_from_excel
+def read_stratified_texts(corpus_path, per_stratum=None, token_budget=None, iterations=10, by=('text_decile',),
+                          seed=0, skip_ids=None):
+    sample = stratified_sample(load_length_index(corpus_path), per_stratum, token_budget, iterations, by, seed)
+    # Los ids ya procesados se quitan después de muestrear, para que al retomar se complete la misma muestra
+    ids = [text_id for text_id in sample['id'] if not skip_ids or text_id not in skip_ids]
+    return LocalCorpus(corpus_path).take_ids(ids).to_pylist()
+
+
+# Función para resumir una muestra por estrato
+def describe_sample(sample, by=('text_decile',)):
+    return sample.groupby(list(by)).agg(textos=('id', 'size'),
+                                        palabras_min=('original_text_length', 'min'),
+                                        palabras_max=('original_text_length', 'max'),
+                                        tokens=('chain_tokens', 'sum'))
+
+
+# Main
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Muestras estratificadas por longitud del corpus local.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    sample_parser = subparsers.add_parser("muestra", help="Extraer una muestra estratificada del corpus")
+    sample_parser.add_argument("corpus_path")
+    sample_parser.add_argument("--por-estrato", type=int, default=None)
+    sample_parser.add_argument("--presupuesto-tokens", type=int, default=None)
+    sample_parser.add_argument("--iteraciones", type=int, default=10)
+    sample_parser.add_argument("--estratos", nargs="+", default=['text_decile'],
+                               choices=['text_decile', 'summary_decile'])
+    sample_parser.add_argument("--semilla", type=int, default=0)
+    sample_parser.add_argument("--salida", default=None, help="Excel con los textos de la muestra (formato de los bucles)")
+    args = parser.parse_args()
+
+    if args.command == "muestra":
+        by = tuple(args.estratos)
+        sample = stratified_sample(load_length_index(args.corpus_path), args.por_estrato, args.presupuesto_tokens,
+                                   args.iteraciones, by, args.semilla)
+        print(describe_sample(sample, by).to_string())
+        print(f"Muestra: {len(sample)} textos, {sample['chain_tokens'].sum()} tokens estimados.")
+        if args.salida:
+            texts = LocalCorpus(args.corpus_path).take_ids(sample['id']).to_pandas()
+            texts.to_excel(args.salida, index=False)
+            print(f"Textos de la muestra guardados en {args.salida}.")
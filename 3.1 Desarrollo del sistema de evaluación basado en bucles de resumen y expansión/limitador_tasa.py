@@ -0,0 +1,237 @@
+# ==========================================================
+#  Proyecto: IMPLEMENTACIÓN DE UN SISTEMA DE EVALUACIÓN DE CAPACIDADES DE GRANDES MODELOS DE LENGUAJE A TRAVÉS DE BUCLES DE RESUMEN Y EXTENSIÓN DE TEXTOS
+#  Apartado: 3. DESARROLLO DEL SISTEMA EXPERIMENTAL
+#            3.1 DESARROLLO DEL SISTEMA DE EVALUACIÓN BASADO EN BUCLES DE RESUMEN Y EXPANSIÓN
+#  Autor: Javier González Pérez
+#  Fecha: 18/10/2026
+#  Descripción: Limitador de tasa reutilizable basado en cubos de tokens (token buckets) para peticiones por minuto (RPM),
+#               tokens estimados por minuto (TPM) y peticiones por día (RPD). Se puede usar desde código síncrono (hilos)
+#               y asíncrono, y se reajusta con las cabeceras de límite de tasa de los proveedores cuando están presentes.
+#               El cubo diario puede guardarse en un JSON (persist_daily) para que la cuota RPD se respete también entre
+#               ejecuciones reanudadas; sin fichero, solo se aplica dentro de un mismo proceso.
+# ==========================================================
+
+import asyncio
+import json
+import os
+import re
+import threading
+import time
+
+# Palabras → tokens: aproximación habitual para textos en inglés (~0.75 palabras por token)
+TOKENS_PER_WORD = 4 / 3
+# Caracteres → tokens cuando no se conoce el número de palabras
+CHARS_PER_TOKEN = 4
+
+
+# Función para estimar los tokens de un texto sin depender de un tokenizador concreto
+def estimate_tokens(text):
+    if not isinstance(text, str) or not text:
+        return 0
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+# Función para estimar los tokens de una llamada (entrada + salida esperada en palabras)
+def estimate_call_tokens(prompt, expected_output_words=0):
+    return estimate_tokens(prompt) + int(expected_output_words * TOKENS_PER_WORD)
+
+
+# Función para convertir los tiempos de reinicio de las cabeceras ("1s", "6m0s", "20ms", "0.5") a segundos
+def parse_reset_seconds(value):
+    if value is None:
+        return None
+    value = str(value).strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    total = 0.0
+    matched = False
+    for amount, unit in re.findall(r"(\d+(?:\.\d+)?)(ms|h|m|s)", value):
+        matched = True
+        amount = float(amount)
+        total += {"ms": amount / 1000, "s": amount, "m": amount * 60, "h": amount * 3600}[unit]
+    return total if matched else None
+
+
+# Función para obtener las cabeceras HTTP de una excepción de API: las de los SDK de OpenAI y Groq (RateLimitError,
+# APIStatusError) guardan la respuesta en `response`; otras pueden traer directamente `headers`
+def error_headers(error):
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    return headers if headers is not None else getattr(error, "headers", None)
+
+
+# Clase que implementa un cubo de tokens con recarga continua
+class TokenBucket:
+    def __init__(self, capacity, period):
+        """
+        Args:
+            capacity (float): Número máximo de unidades disponibles (por ejemplo, 15 peticiones).
+            period (float): Segundos que tarda el cubo en recargarse por completo (60 para RPM/TPM, 86400 para RPD).
+        """
+        self.capacity = float(capacity)
+        self.rate = self.capacity / period
+        self.available = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.available = min(self.capacity, self.available + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount, now):
+        self._refill(now)
+        amount = min(amount, self.capacity)  # Una petición mayor que el cubo nunca podría pasar
+        if self.available >= amount:
+            return 0.0
+        return (amount - self.available) / self.rate
+
+    def consume(self, amount, now):
+        self._refill(now)
+        self.available -= min(amount, self.capacity)
+
+    def set_available(self, remaining, now):
+        # Sincronizar el cubo con el estado que informa el proveedor
+        self._refill(now)
+        self.available = min(self.capacity, float(remaining))
+
+
+# Clase que combina los límites RPM, TPM y RPD de un proveedor
+class RateLimiter:
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None, requests_per_day=None,
+                 daily_request_headers=False):
+        """
+        Args:
+            requests_per_minute (int): RPM; None para no limitarlas (o aprender el límite de las cabeceras).
+            tokens_per_minute (int): TPM estimados.
+            requests_per_day (int): RPD.
+            daily_request_headers (bool): True si las cabeceras x-ratelimit-*-requests del proveedor informan de las
+                                          peticiones por día (Groq) y no de las peticiones por minuto (OpenAI).
+        """
+        self.requests = TokenBucket(requests_per_minute, 60) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute, 60) if tokens_per_minute else None
+        self.daily = TokenBucket(requests_per_day, 86_400) if requests_per_day else None
+        self.blocked_until = 0.0  # Pausa global impuesta por un Retry-After
+        self.daily_state_path = None  # JSON en el que se guarda el cubo diario (persist_daily)
+        self.daily_request_headers = daily_request_headers
+        self.lock = threading.Lock()
+        self.requests_made = 0
+        self.time_waited = 0.0
+
+    def _buckets(self, tokens):
+        return [(bucket, amount) for bucket, amount in ((self.requests, 1), (self.tokens, tokens), (self.daily, 1))
+                if bucket is not None]
+
+    def _try_acquire(self, tokens):
+        # Devuelve 0 si se han consumido las unidades, o los segundos que hay que esperar
+        with self.lock:
+            now = time.monotonic()
+            wait = max(self.blocked_until - now, 0.0)
+            for bucket, amount in self._buckets(tokens):
+                wait = max(wait, bucket.wait_time(amount, now))
+            if wait > 0:
+                return wait
+            for bucket, amount in self._buckets(tokens):
+                bucket.consume(amount, now)
+            self.requests_made += 1
+            self._save_daily()
+            return 0.0
+
+    def persist_daily(self, path):
+        """
+        Guarda el cubo de peticiones por día en `path` tras cada petición y, si el fichero ya existe (de una ejecución
+        anterior con el mismo límite), retoma la cuota que quedaba, recargada con el tiempo transcurrido desde entonces.
+
+        Args:
+            path (str): Fichero JSON (por ejemplo, junto al checkpoint del bucle).
+
+        Returns:
+            RateLimiter: El propio limitador.
+        """
+        self.daily_state_path = path
+        if self.daily is None or not os.path.exists(path):
+            return self
+        with open(path, encoding="utf-8") as f:
+            state = json.load(f)
+        if float(state.get("capacity", -1)) != self.daily.capacity:
+            print(f"Cuota diaria de {path} guardada con otro límite; se empieza con la cuota completa.")
+            return self
+        with self.lock:
+            elapsed = max(time.time() - float(state["saved_at"]), 0.0)
+            self.daily.available = min(self.daily.capacity, float(state["available"]) + elapsed * self.daily.rate)
+            self.daily.updated = time.monotonic()
+        print(f"Cuota diaria retomada de {path}: {self.daily.available:.0f}/{self.daily.capacity:.0f} peticiones.")
+        return self
+
+    def _save_daily(self):
+        # Escritura atómica del estado del cubo diario, con la hora de reloj para recargarlo al retomarlo
+        if self.daily_state_path is None or self.daily is None:
+            return
+        state = {"capacity": self.daily.capacity, "available": self.daily.available, "saved_at": time.time()}
+        tmp_path = self.daily_state_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.daily_state_path)
+
+    def acquire(self, tokens=0):
+        """Bloquea el hilo actual hasta que haya cuota para una petición de `tokens` tokens estimados."""
+        while True:
+            wait = self._try_acquire(tokens)
+            if wait == 0:
+                return
+            self.time_waited += wait
+            time.sleep(wait)
+
+    async def acquire_async(self, tokens=0):
+        """Igual que acquire, pero cediendo el control al bucle de eventos mientras espera."""
+        while True:
+            wait = self._try_acquire(tokens)
+            if wait == 0:
+                return
+            self.time_waited += wait
+            await asyncio.sleep(wait)
+
+    def update_from_headers(self, headers):
+        """
+        Reajusta los cubos con las cabeceras de límite de tasa (formato de OpenAI y Groq). Se llama tanto con las
+        respuestas correctas como con los errores 429/5xx (error_headers), que son los que traen retry-after y
+        x-ratelimit-remaining-* a 0. Las cabeceras *-requests van al cubo diario si daily_request_headers (Groq) y al
+        de peticiones por minuto en otro caso (OpenAI).
+
+        Args:
+            headers (Mapping): Cabeceras HTTP de la respuesta. Se ignoran las que no estén presentes.
+        """
+        if not headers:
+            return
+        headers = {str(k).lower(): v for k, v in dict(headers).items()}
+        with self.lock:
+            now = time.monotonic()
+            for kind in ("requests", "tokens"):
+                remaining = headers.get(f"x-ratelimit-remaining-{kind}")
+                if remaining is None:
+                    continue
+                reset = parse_reset_seconds(headers.get(f"x-ratelimit-reset-{kind}"))
+                # El reinicio es el tiempo que tarda en recargarse lo consumido, de donde sale el periodo del límite
+                limit = headers.get(f"x-ratelimit-limit-{kind}")
+                period = None
+                if limit is not None and reset and float(limit) > float(remaining):
+                    period = reset * float(limit) / (float(limit) - float(remaining))
+                name = "daily" if kind == "requests" and self.daily_request_headers else kind
+                bucket = getattr(self, name)
+                if bucket is None:
+                    # Límite sin configurar: se crea con el que informa el proveedor
+                    if period is None:
+                        continue
+                    bucket = TokenBucket(float(limit), 86_400 if name == "daily" else period)
+                    setattr(self, name, bucket)
+                bucket.set_available(remaining, now)
+                if name == "daily":
+                    self._save_daily()
+                # Con la cuota agotada, no se vuelve a intentar hasta el reinicio que indica el proveedor
+                if float(remaining) <= 0 and reset:
+                    self.blocked_until = max(self.blocked_until, now + reset)
+            retry_after = parse_reset_seconds(headers.get("retry-after"))
+            if retry_after:
+                self.blocked_until = max(self.blocked_until, now + retry_after)
+
+    def stats(self):
+        return {"requests_made": self.requests_made, "time_waited": round(self.time_waited, 2)}
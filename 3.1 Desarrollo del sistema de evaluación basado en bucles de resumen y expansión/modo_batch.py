@@ -0,0 +1,293 @@
+# ==========================================================
+#  Proyecto: IMPLEMENTACIÓN DE UN SISTEMA DE EVALUACIÓN DE CAPACIDADES DE GRANDES MODELOS DE LENGUAJE A TRAVÉS DE BUCLES DE RESUMEN Y EXTENSIÓN DE TEXTOS
+#  Apartado: 3. DESARROLLO DEL SISTEMA EXPERIMENTAL
+#            3.1 DESARROLLO DEL SISTEMA DE EVALUACIÓN BASADO EN BUCLES DE RESUMEN Y EXPANSIÓN
+#  Autor: Javier González Pérez
+#  Fecha: 18/10/2026
+#  Descripción: Modo de ejecución por lotes (Batch API de OpenAI) para el bucle de resumen y expansión. El bucle avanza
+#               por oleadas: primero se envía el resumen de la iteración 1 de todos los textos en un único lote, después
+#               la expansión, luego la iteración 2, etc. Cada oleada construye su JSONL (formato custom_id, method, url,
+#               body) a partir de las salidas de la anterior. Incluye un endpoint de lotes local para probar la máquina
+#               de estados sin conexión.
+# ==========================================================
+
+import json
+import os
+import re
+import time
+import uuid
+
+import pandas as pd
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+STEP_KINDS = ("summary", "new_text")
+SUMMARY_FALLBACK = "Resumen no disponible"
+TEXT_FALLBACK = "Texto no disponible"
+
+
+# Función para construir una línea JSONL con el mismo prompt que summary_text / complete_text
+def build_request(custom_id, model, kind, text, target_length, temperature=1.0):
+    if kind == "summary":
+        instruction = f"Summarize the following text to approximately {target_length} words:"
+    else:
+        instruction = f"Expand the following summary into a complete text of {target_length} words:"
+    return {
+        "custom_id": custom_id,
+        "method": "POST",
+        "url": BATCH_ENDPOINT,
+        "body": {
+            "model": model,
+            "messages": [
+                {"role": "system", "content": instruction},
+                {"role": "user", "content": text},
+            ],
+            "temperature": temperature,
+        },
+    }
+
+
+# Función para extraer el texto generado de una línea de salida de la Batch API
+def parse_output_line(entry):
+    response = entry.get("response") or {}
+    if entry.get("error") or response.get("status_code", 200) != 200:
+        return None
+    choices = response.get("body", {}).get("choices", [])
+    if not choices:
+        return None
+    return choices[0].get("message", {}).get("content")
+
+
+# Clase que envía los lotes a la Batch API de OpenAI
+class OpenAIBatchBackend:
+    def __init__(self, client, completion_window="24h", poll_interval=60):
+        self.client = client
+        self.completion_window = completion_window
+        self.poll_interval = poll_interval
+
+    def submit(self, input_path):
+        with open(input_path, "rb") as f:
+            batch_file = self.client.files.create(file=f, purpose="batch")
+        batch = self.client.batches.create(input_file_id=batch_file.id, endpoint=BATCH_ENDPOINT,
+                                           completion_window=self.completion_window)
+        return batch.id
+
+    def wait(self, batch_id, output_path):
+        while True:
+            batch = self.client.batches.retrieve(batch_id)
+            counts = batch.request_counts
+            if counts is not None:
+                print(f"Lote {batch_id}: {batch.status} ({counts.completed}/{counts.total} completadas)")
+            if batch.status in ("completed", "failed", "expired", "cancelled"):
+                break
+            time.sleep(self.poll_interval)
+
+        # Las peticiones que fallan van al fichero de errores; se juntan con las correctas
+        with open(output_path, "w", encoding="utf-8") as out:
+            for file_id in (batch.output_file_id, batch.error_file_id):
+                if file_id:
+                    out.write(self.client.files.content(file_id).text)
+        return output_path
+
+
+# Clase que simula la Batch API en local (transformaciones deterministas, sin coste)
+class LocalBatchBackend:
+    def __init__(self, handler=None, work_dir="batch_local", fail_ids=()):
+        """
+        Args:
+            handler (callable): handler(body) -> str con la respuesta para el cuerpo de una petición. Por defecto
+                                resume recortando palabras y expande repitiendo el resumen.
+            fail_ids (iterable): custom_id que deben fallar la primera vez (para probar los reintentos).
+        """
+        self.handler = handler or deterministic_handler
+        self.pending_failures = set(fail_ids)
+        os.makedirs(work_dir, exist_ok=True)
+        # Los lotes enviados se guardan en disco para poder retomarlos igual que los de OpenAI
+        self.jobs_path = os.path.join(work_dir, "lotes_locales.json")
+        self.jobs = {}
+        if os.path.exists(self.jobs_path):
+            with open(self.jobs_path, "r", encoding="utf-8") as f:
+                self.jobs = json.load(f)
+
+    def submit(self, input_path):
+        batch_id = f"batch_local_{uuid.uuid4().hex[:12]}"
+        self.jobs[batch_id] = input_path
+        with open(self.jobs_path, "w", encoding="utf-8") as f:
+            json.dump(self.jobs, f)
+        return batch_id
+
+    def wait(self, batch_id, output_path):
+        with open(self.jobs[batch_id], "r", encoding="utf-8") as infile, \
+                open(output_path, "w", encoding="utf-8") as outfile:
+            for line in infile:
+                request = json.loads(line)
+                custom_id = request["custom_id"]
+                if custom_id in self.pending_failures:
+                    self.pending_failures.discard(custom_id)
+                    entry = {"id": f"req_{uuid.uuid4().hex[:8]}", "custom_id": custom_id, "response": None,
+                             "error": {"code": "server_error", "message": "Fallo simulado"}}
+                else:
+                    content = self.handler(request["body"])
+                    entry = {
+                        "id": f"req_{uuid.uuid4().hex[:8]}",
+                        "custom_id": custom_id,
+                        "response": {
+                            "status_code": 200,
+                            "body": {"model": request["body"]["model"], "object": "chat.completion",
+                                     "choices": [{"index": 0, "message": {"role": "assistant", "content": content},
+                                                  "finish_reason": "stop"}]},
+                        },
+                        "error": None,
+                    }
+                outfile.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        return output_path
+
+
+# Función de respuesta determinista para el endpoint local
+def deterministic_handler(body):
+    instruction = body["messages"][0]["content"]
+    words = str(body["messages"][1]["content"]).split()
+    match = re.search(r"(\d+) words", instruction)
+    target = int(match.group(1)) if match else len(words)
+    if instruction.startswith("Summarize"):
+        return " ".join(words[:target])
+    # Expansión: repetir el resumen hasta alcanzar la longitud pedida
+    expanded = (words * (target // max(len(words), 1) + 1))[:target] if words else []
+    return " ".join(expanded)
+
+
+# Función para cargar (o crear) el estado de las oleadas
+def load_state(state_path, texts, model, iterations, temperature):
+    if os.path.exists(state_path):
+        with open(state_path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+        # Una ejecución a medias solo se retoma con los mismos parámetros: con otra temperatura o con otros textos las
+        # respuestas se guardarían en columnas o filas que no les corresponden
+        expected = {"model": model, "iterations": iterations, "temperature": float(temperature)}
+        found = {"model": state["model"], "iterations": state["iterations"], "temperature": float(state["temperature"])}
+        if found != expected:
+            raise ValueError(f"El estado {state_path} es de otra ejecución ({found}) y no de la pedida ({expected}). "
+                             f"Termínala con sus parámetros o archiva el fichero de estado.")
+        ids = {str(text_data['id']) for text_data in texts}
+        if ids != set(state["texts"]):
+            raise ValueError(f"El estado {state_path} tiene {len(state['texts'])} textos y la llamada {len(ids)}, "
+                             f"con {len(ids ^ set(state['texts']))} ids distintos. Termínala con sus textos o archiva "
+                             f"el fichero de estado.")
+        return state
+    rows = {}
+    for text_data in texts:
+        rows[str(text_data['id'])] = {
+            'row': {
+                'id': text_data['id'],
+                'original_text': text_data['original_text'],
+                'original_text_length': int(text_data['original_text_length']),
+                'original_summary': text_data['original_summary'],
+                'original_summary_length': int(text_data['original_summary_length'])
+            },
+            'current_text': text_data['original_text'],
+        }
+    return {"model": model, "iterations": iterations, "temperature": temperature,
+            "wave": 0, "attempt": 0, "batch_id": None, "texts": rows}
+
+
+def save_state(state, state_path):
+    tmp_path = state_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False)
+    os.replace(tmp_path, state_path)
+
+
+# Función para escribir el JSONL de una oleada a partir del estado actual
+def build_wave(state, wave, pending_ids, input_path):
+    iteration, kind = wave // 2 + 1, STEP_KINDS[wave % 2]
+    with open(input_path, "w", encoding="utf-8") as f:
+        for text_id in pending_ids:
+            entry = state["texts"][text_id]
+            row = entry['row']
+            if kind == "summary":
+                text, target = entry['current_text'], row['original_summary_length']
+            else:
+                text, target = row[f"summary_{iteration}_temp_{state['temperature']}"], row['original_text_length']
+            request = build_request(f"{text_id}--{iteration}--{kind}", state["model"], kind, text, target,
+                                    state["temperature"])
+            f.write(json.dumps(request, ensure_ascii=False) + "\n")
+
+
+# Función para volcar las salidas de una oleada en el estado; devuelve los ids que han fallado
+def apply_wave_output(state, wave, pending_ids, output_path):
+    iteration, kind = wave // 2 + 1, STEP_KINDS[wave % 2]
+    outputs = {}
+    with open(output_path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                outputs[entry["custom_id"]] = parse_output_line(entry)
+
+    failed = []
+    for text_id in pending_ids:
+        content = outputs.get(f"{text_id}--{iteration}--{kind}")
+        if content is None:
+            failed.append(text_id)
+            continue
+        entry = state["texts"][text_id]
+        entry['row'][f"{kind}_{iteration}_temp_{state['temperature']}"] = content
+        if kind == "new_text":
+            entry['current_text'] = content
+    return failed
+
+
+def run_iterations_batch(backend, model, texts, iterations, temperature=1.0, work_dir="batch_bucle", attempts=3):
+    """
+    Ejecuta el bucle de resumen y expansión por oleadas de lotes. El estado se guarda en `work_dir` tras cada paso,
+    por lo que si el proceso se interrumpe se retoma en la misma oleada (incluido un lote ya enviado).
+
+    Args:
+        backend: OpenAIBatchBackend o LocalBatchBackend.
+        attempts (int): Número de lotes que se envían como máximo para una misma oleada (reintento de fallidas).
+
+    Returns:
+        tuple: (pd.DataFrame con el mismo formato que run_iterations_parallel, número de pasos completados)
+    """
+    os.makedirs(work_dir, exist_ok=True)
+    state_path = os.path.join(work_dir, "estado_oleadas.json")
+    state = load_state(state_path, texts, model, iterations, temperature)
+    total_waves = 2 * iterations
+
+    while state["wave"] < total_waves:
+        wave = state["wave"]
+        iteration, kind = wave // 2 + 1, STEP_KINDS[wave % 2]
+        column = f"{kind}_{iteration}_temp_{state['temperature']}"
+        pending_ids = [text_id for text_id, entry in state["texts"].items() if column not in entry['row']]
+        input_path = os.path.join(work_dir, f"oleada_{wave + 1:02d}_{kind}_{iteration}_intento_{state['attempt']}.jsonl")
+        output_path = input_path.replace(".jsonl", "_output.jsonl")
+
+        if state["batch_id"] is None:
+            build_wave(state, wave, pending_ids, input_path)
+            state["batch_id"] = backend.submit(input_path)
+            save_state(state, state_path)
+            print(f"Oleada {wave + 1}/{total_waves} ({kind}, iteración {iteration}): "
+                  f"lote {state['batch_id']} con {len(pending_ids)} peticiones enviado.")
+
+        backend.wait(state["batch_id"], output_path)
+        failed = apply_wave_output(state, wave, pending_ids, output_path)
+        state["batch_id"] = None
+
+        if failed and state["attempt"] < attempts - 1:
+            print(f"{len(failed)} peticiones fallidas en la oleada {wave + 1}. Reintentando en un nuevo lote...")
+            state["attempt"] += 1
+        else:
+            # Sin más intentos: valores por defecto, igual que en run_iterations_parallel
+            for text_id in failed:
+                entry = state["texts"][text_id]
+                fallback = SUMMARY_FALLBACK if kind == "summary" else TEXT_FALLBACK
+                entry['row'][column] = fallback
+                if kind == "new_text":
+                    entry['current_text'] = fallback
+            state["wave"] += 1
+            state["attempt"] = 0
+        save_state(state, state_path)
+
+    # El estado terminado se archiva para que la siguiente ejecución empiece con sus propios textos
+    os.replace(state_path, os.path.join(work_dir, f"estado_oleadas_completado_{int(time.time())}.json"))
+    rows = [entry['row'] for entry in state["texts"].values()]
+    print(f"Modelo {model} completado en modo batch.")
+    return pd.DataFrame(rows), len(rows) * iterations
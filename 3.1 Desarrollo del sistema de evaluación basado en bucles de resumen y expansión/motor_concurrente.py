@@ -0,0 +1,205 @@
+# ==========================================================
+#  Proyecto: IMPLEMENTACIÓN DE UN SISTEMA DE EVALUACIÓN DE CAPACIDADES DE GRANDES MODELOS DE LENGUAJE A TRAVÉS DE BUCLES DE RESUMEN Y EXTENSIÓN DE TEXTOS
+#  Apartado: 3. DESARROLLO DEL SISTEMA EXPERIMENTAL
+#            3.1 DESARROLLO DEL SISTEMA DE EVALUACIÓN BASADO EN BUCLES DE RESUMEN Y EXPANSIÓN
+#  Autor: Javier González Pérez
+#  Fecha: 18/10/2026
+#  Descripción: Motor asíncrono para los bucles de resumen y expansión. Mantiene varias cadenas de texto en vuelo a la
+#               vez (las iteraciones de un mismo texto siguen siendo secuenciales, pero textos distintos no dependen entre
+#               sí), con un límite de concurrencia configurable. Lo usan los tres scripts de bucle (Groq, OpenAI y Gemini).
+# ==========================================================
+
+import asyncio
+import inspect
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from limitador_tasa import error_headers, parse_reset_seconds
+
+# Valores por defecto cuando fallan todos los intentos (columnas que ya usaban los scripts de bucle)
+SUMMARY_FALLBACK = "Resumen no disponible"
+TEXT_FALLBACK = "Texto no disponible"
+
+
+# Función para ejecutar una llamada síncrona o asíncrona sin bloquear el bucle de eventos
+async def _call(func, *args):
+    if inspect.iscoroutinefunction(func):
+        return await func(*args)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, func, *args)
+
+
+# Función para obtener el Retry-After (en segundos) de una excepción de los SDK, si la trae
+def retry_after_seconds(error):
+    headers = error_headers(error)
+    if not headers:
+        return None
+    headers = {str(name).lower(): value for name, value in dict(headers).items()}
+    return parse_reset_seconds(headers.get("retry-after"))
+
+
+# Función para ejecutar una llamada al proveedor con reintentos; devuelve None si fallan todos los intentos. Entre
+# intentos se espera un tiempo exponencial con jitter (aleatorio entre 0 y backoff_base * 2^intento, hasta
+# backoff_max), para que las cadenas en vuelo no vuelvan a llamar a la API todas a la vez, salvo que el error traiga
+# un Retry-After
+async def call_with_retries(func, *args, attempts=3, quota_errors=(), quota_wait=60, backoff_base=1.0,
+                            backoff_max=30.0):
+    for attempt in range(attempts):
+        try:
+            return await _call(func, *args)
+        except quota_errors as e:
+            print(f"Error de cuota alcanzada: {e}")
+            if attempt < attempts - 1:
+                wait = retry_after_seconds(e) or quota_wait
+                print(f"Esperando {wait:.1f} segundos antes de reintentar...")
+                await asyncio.sleep(wait)
+        except Exception as e:
+            print(f"Error en la llamada a la API: {e}")
+            if attempt < attempts - 1:
+                wait = retry_after_seconds(e)
+                if wait is None:
+                    wait = random.uniform(0, min(backoff_max, backoff_base * 2 ** attempt))
+                print(f"Reintentando en {wait:.1f} segundos...")
+                await asyncio.sleep(wait)
+    return None
+
+
+# Función para ejecutar una iteración (resumen + expansión) con reintentos
+async def run_step(summarize, expand, current_text, summary_length, original_text_length, temperature=1.0,
+                   checkpoint=None, text_id=None, iteration=None, **retry_kwargs):
+    """
+    Ejecuta el par de llamadas resumen/expansión de una iteración: hasta `attempts` intentos por llamada y valores
+    por defecto si todos fallan.
+
+    Args:
+        summarize (callable): summarize(text, max_summary_length, temperature) -> str (síncrona o asíncrona).
+        expand (callable): expand(summary, original_text_length, temperature) -> str (síncrona o asíncrona).
+        checkpoint (StepCheckpoint): Registro de pasos. Si el paso ya está registrado no se vuelve a llamar a la API,
+                                     y cada resultado nuevo se registra en cuanto llega.
+        retry_kwargs: attempts, quota_errors (excepciones de cuota tras las que se espera), quota_wait (segundos) y
+                      backoff_base/backoff_max (espera exponencial entre reintentos de otros errores).
+
+    Returns:
+        tuple: (summary, new_text)
+    """
+    steps = ((summarize, summary_length, "summary", SUMMARY_FALLBACK),
+             (expand, original_text_length, "new_text", TEXT_FALLBACK))
+    outputs = []
+    text = current_text
+    for func, length, kind, fallback in steps:
+        result = checkpoint.get(text_id, iteration, kind, temperature) if checkpoint else None
+        if result is None:
+            result = await call_with_retries(func, text, length, temperature, **retry_kwargs)
+            if result is None:
+                # Sin resultado no se puede seguir con la expansión; los fallos no se registran para reintentarlos
+                outputs.append(fallback)
+                if kind == "summary":
+                    outputs.append(TEXT_FALLBACK)
+                break
+            if checkpoint:
+                checkpoint.record(text_id, iteration, kind, temperature, result)
+        outputs.append(result)
+        text = result
+    return tuple(outputs)
+
+
+# Clase para llevar el progreso global compartido entre todas las cadenas
+class Progress:
+    def __init__(self, total_steps, current_step=0):
+        self.total_steps = max(total_steps, 1)
+        self.current_step = current_step
+
+    def advance(self, text_idx, iteration, temperature):
+        self.current_step += 1
+        progress = (self.current_step / self.total_steps) * 100
+        print(f"Progreso: {progress:.2f}% (Texto {text_idx + 1}, Iteración {iteration}, Temperatura {temperature})")
+
+
+# Función para procesar la cadena completa de iteraciones de un texto
+async def run_text_chain(text_idx, text_data, iterations, summarize, expand, semaphore, progress,
+                         temperature=1.0, checkpoint=None, **retry_kwargs):
+    row = {
+        'id': text_data['id'],
+        'original_text': text_data['original_text'],
+        'original_text_length': text_data['original_text_length'],
+        'original_summary': text_data['original_summary'],
+        'original_summary_length': text_data['original_summary_length']
+    }
+
+    # Inicializar el texto actual con el texto original. Las ramas de trayectorias.py parten de una iteración ya
+    # guardada: traen las columnas previas ('prefix') y el texto de esa iteración ('seed_text')
+    row.update(text_data.get('prefix', {}))
+    start_iteration = text_data.get('start_iteration', 0)
+    current_text = text_data.get('seed_text', text_data['original_text'])
+    original_text_length = text_data['original_text_length']
+    summary_length = text_data['original_summary_length']
+
+    # El semáforo limita el número de cadenas en vuelo; dentro de una cadena las iteraciones son secuenciales
+    async with semaphore:
+        print(f"Procesando texto {text_idx + 1}...")
+        for i in range(start_iteration, iterations):
+            summary, new_text = await run_step(summarize, expand, current_text, summary_length,
+                                               original_text_length, temperature, checkpoint=checkpoint,
+                                               text_id=text_data['id'], iteration=i + 1, **retry_kwargs)
+            row[f'summary_{i + 1}_temp_{temperature}'] = summary
+            row[f'new_text_{i + 1}_temp_{temperature}'] = new_text
+
+            # Actualizar el texto actual para la siguiente iteración
+            current_text = new_text
+            progress.advance(text_idx, i + 1, temperature)
+
+    return row
+
+
+async def run_iterations_async(texts, iterations, summarize, expand, temperature=1.0, max_concurrency=8,
+                               total_steps=None, current_step=0, checkpoint=None, **retry_kwargs):
+    """
+    Bucle de resumen y expansión asíncrono: lanza una cadena por texto y deja como mucho `max_concurrency` en vuelo.
+
+    Args:
+        texts (list): Textos leídos con read_texts_from_excel.
+        iterations (int): Número de iteraciones de resumen y expansión por texto.
+        summarize (callable): Función de resumen del proveedor.
+        expand (callable): Función de expansión del proveedor.
+        temperature (float): Temperatura usada en los nombres de columna y en las llamadas.
+        max_concurrency (int): Número máximo de textos procesándose a la vez.
+        checkpoint (StepCheckpoint): Registro de pasos para retomar ejecuciones interrumpidas (opcional).
+
+    Returns:
+        tuple: (pd.DataFrame con una fila por texto en el mismo orden de entrada, current_step)
+    """
+    if total_steps is None:
+        total_steps = sum(iterations - text_data.get('start_iteration', 0) for text_data in texts)
+    progress = Progress(total_steps, current_step)
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    # Las funciones síncronas de los SDK se ejecutan en un pool de hilos del mismo tamaño que la concurrencia
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(max_workers=max_concurrency)
+    loop.set_default_executor(executor)
+    try:
+        rows = await asyncio.gather(*(
+            run_text_chain(text_idx, text_data, iterations, summarize, expand, semaphore, progress,
+                           temperature, checkpoint, **retry_kwargs)
+            for text_idx, text_data in enumerate(texts)
+        ))
+    finally:
+        executor.shutdown(wait=False)
+
+    return pd.DataFrame(rows), progress.current_step
+
+
+# Función de entrada síncrona para los scripts de bucle
+def run_iterations_concurrent(texts, iterations, summarize, expand, temperature=1.0, max_concurrency=8,
+                              total_steps=None, current_step=0, checkpoint=None, **retry_kwargs):
+    start_time = time.time()
+    results_df, current_step = asyncio.run(run_iterations_async(
+        texts, iterations, summarize, expand, temperature, max_concurrency, total_steps, current_step, checkpoint,
+        **retry_kwargs
+    ))
+    elapsed = time.time() - start_time
+    print(f"{len(texts)} textos procesados en {elapsed:.2f} segundos con concurrencia {max_concurrency}.")
+    return results_df, current_step
@@ -0,0 +1,186 @@
+# ==========================================================
+#  Proyecto: IMPLEMENTACIÓN DE UN SISTEMA DE EVALUACIÓN DE CAPACIDADES DE GRANDES MODELOS DE LENGUAJE A TRAVÉS DE BUCLES DE RESUMEN Y EXTENSIÓN DE TEXTOS
+#  Apartado: 3. DESARROLLO DEL SISTEMA EXPERIMENTAL
+#            3.1 DESARROLLO DEL SISTEMA DE EVALUACIÓN BASADO EN BUCLES DE RESUMEN Y EXPANSIÓN
+#  Autor: Javier González Pérez
+#  Fecha: 18/10/2026
+#  Descripción: Planificador por tokens para el motor concurrente. Estima los tokens de entrada y salida de cada paso
+#               (con tiktoken si está instalado, o con la aproximación de limitador_tasa.py), ordena los textos
+#               alternando largos y cortos y deja pasar las llamadas según un presupuesto de tokens en vuelo derivado
+#               del límite de tokens por minuto (TPM). Así el TPM se mantiene ocupado sin pasarse, en lugar de depender
+#               de un número fijo de textos en paralelo.
+# ==========================================================
+
+import asyncio
+import time
+
+from limitador_tasa import estimate_tokens, TOKENS_PER_WORD
+from motor_concurrente import run_iterations_async
+
+# Tokenizador opcional: si tiktoken no está disponible se usa la estimación por caracteres
+try:
+    import tiktoken
+    _ENCODING = tiktoken.get_encoding("cl100k_base")
+except Exception:
+    _ENCODING = None
+
+
+# Función para contar los tokens de un texto
+def count_tokens(text):
+    if not isinstance(text, str) or not text:
+        return 0
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text))
+    return estimate_tokens(text)
+
+
+# Función para convertir una longitud en palabras a tokens
+def words_to_tokens(words):
+    return int(words * TOKENS_PER_WORD)
+
+
+# Función para estimar los tokens de un paso a partir de las columnas de longitud
+def estimate_step_tokens(text_data, kind):
+    text_tokens = words_to_tokens(text_data['original_text_length'])
+    summary_tokens = words_to_tokens(text_data['original_summary_length'])
+    if kind == "summary":
+        # Entrada: el texto actual (≈ longitud del original); salida: el resumen
+        return text_tokens + summary_tokens
+    # Entrada: el resumen; salida: un texto de la longitud del original
+    return summary_tokens + text_tokens
+
+
+# Función para estimar los tokens de la cadena completa de un texto
+def estimate_chain_tokens(text_data, iterations):
+    steps = iterations - text_data.get('start_iteration', 0)
+    return steps * (estimate_step_tokens(text_data, "summary") + estimate_step_tokens(text_data, "new_text"))
+
+
+# Función para ordenar los textos alternando el más largo y el más corto pendientes
+def mix_long_short(texts, iterations):
+    by_cost = sorted(texts, key=lambda text_data: estimate_chain_tokens(text_data, iterations), reverse=True)
+    ordered = []
+    low, high = 0, len(by_cost) - 1
+    while low <= high:
+        ordered.append(by_cost[low])
+        if low != high:
+            ordered.append(by_cost[high])
+        low += 1
+        high -= 1
+    return ordered
+
+
+# Clase que reparte un presupuesto de tokens en vuelo entre las llamadas
+class TokenBudget:
+    def __init__(self, capacity, max_skips=8):
+        """
+        Args:
+            capacity (int): Tokens que pueden estar en vuelo a la vez.
+            max_skips (int): Veces que una llamada pequeña puede adelantar a la primera en espera antes de que esta
+                             tenga prioridad absoluta (evita que las llamadas largas esperen indefinidamente).
+        """
+        self.capacity = capacity
+        self.in_use = 0
+        self.max_skips = max_skips
+        self.waiters = []  # [cantidad, future, adelantamientos]
+        self.peak = 0
+
+    async def acquire(self, amount):
+        # Una llamada mayor que todo el presupuesto se trata como si lo ocupara entero
+        amount = min(amount, self.capacity)
+        if not self.waiters and self.in_use + amount <= self.capacity:
+            self._take(amount)
+            return amount
+        future = asyncio.get_running_loop().create_future()
+        self.waiters.append([amount, future, 0])
+        await future
+        return amount
+
+    def release(self, amount):
+        self.in_use -= amount
+        self._wake()
+
+    def _take(self, amount):
+        self.in_use += amount
+        self.peak = max(self.peak, self.in_use)
+
+    def _wake(self):
+        # Se atiende en orden; si la primera no cabe, pueden adelantarla otras más pequeñas que sí quepan
+        index = 0
+        while index < len(self.waiters):
+            amount, future, _ = self.waiters[index]
+            if future.cancelled():
+                self.waiters.pop(index)
+                continue
+            if self.in_use + amount <= self.capacity:
+                self.waiters.pop(index)
+                self._take(amount)
+                future.set_result(None)
+                if index > 0:
+                    self.waiters[0][2] += 1
+                continue
+            if index == 0 and self.waiters[0][2] >= self.max_skips:
+                break
+            index += 1
+
+
+# Función para envolver una llamada del proveedor con el presupuesto de tokens
+def _budgeted(func, budget, stats):
+    async def call(text, length, temperature):
+        tokens = count_tokens(text) + words_to_tokens(length)
+        granted = await budget.acquire(tokens)
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, func, text, length, temperature)
+        finally:
+            budget.release(granted)
+            stats['calls'] += 1
+            stats['tokens'] += tokens
+    return call
+
+
+def run_iterations_packed(texts, iterations, summarize, expand, temperature=1.0, tokens_per_minute=None,
+                          expected_latency=10.0, max_concurrency=32, total_steps=None, current_step=0,
+                          checkpoint=None, **retry_kwargs):
+    """
+    Igual que run_iterations_concurrent, pero el número de llamadas en vuelo lo decide el presupuesto de tokens.
+
+    Args:
+        tokens_per_minute (int): Límite TPM del proveedor. El presupuesto en vuelo es TPM * expected_latency / 60,
+                                 es decir, los tokens que caben en el tiempo que tarda una llamada.
+        expected_latency (float): Duración típica de una llamada en segundos.
+        max_concurrency (int): Tope de textos en vuelo (y de hilos); con el presupuesto de tokens puede ser alto.
+
+    Returns:
+        tuple: (pd.DataFrame en el mismo orden que `texts`, current_step)
+    """
+    # El presupuesto debe admitir al menos la llamada más grande prevista
+    largest_step = max((max(estimate_step_tokens(t, "summary"), estimate_step_tokens(t, "new_text")) for t in texts),
+                       default=1)
+    capacity = max(int(tokens_per_minute * expected_latency / 60), largest_step) if tokens_per_minute else None
+    ordered = mix_long_short(texts, iterations)
+    stats = {'calls': 0, 'tokens': 0}
+
+    async def run():
+        if capacity is None:
+            return await run_iterations_async(ordered, iterations, summarize, expand, temperature, max_concurrency,
+                                              total_steps, current_step, checkpoint, **retry_kwargs), None
+        budget = TokenBudget(capacity)
+        result = await run_iterations_async(ordered, iterations, _budgeted(summarize, budget, stats),
+                                            _budgeted(expand, budget, stats), temperature, max_concurrency,
+                                            total_steps, current_step, checkpoint, **retry_kwargs)
+        return result, budget
+
+    start_time = time.time()
+    (results_df, current_step), budget = asyncio.run(run())
+    elapsed = time.time() - start_time
+
+    # Devolver las filas en el orden de entrada, como run_iterations_concurrent
+    order = {str(text_data['id']): position for position, text_data in enumerate(texts)}
+    results_df = results_df.sort_values('id', key=lambda ids: ids.astype(str).map(order)).reset_index(drop=True)
+
+    if budget is not None:
+        rate = stats['tokens'] / elapsed * 60 if elapsed > 0 else 0
+        print(f"{stats['calls']} llamadas, {stats['tokens']} tokens estimados en {elapsed:.2f} segundos "
+              f"({rate:.0f} tokens/min de {tokens_per_minute}); pico en vuelo {budget.peak}/{capacity} tokens.")
+    return results_df, current_step
@@ -0,0 +1,189 @@
+# ==========================================================
+#  Proyecto: IMPLEMENTACIÓN DE UN SISTEMA DE EVALUACIÓN DE CAPACIDADES DE GRANDES MODELOS DE LENGUAJE A TRAVÉS DE BUCLES DE RESUMEN Y EXTENSIÓN DE TEXTOS
+#  Apartado: 3. DESARROLLO DEL SISTEMA EXPERIMENTAL
+#            3.1 DESARROLLO DEL SISTEMA DE EVALUACIÓN BASADO EN BUCLES DE RESUMEN Y EXPANSIÓN
+#  Autor: Javier González Pérez
+#  Fecha: 18/10/2026
+#  Descripción: Proveedores (Groq, OpenAI y Gemini) con los mismos prompts de resumen y expansión que los scripts de
+#               bucle, pero con el modelo y la temperatura como parámetros. Cada proveedor tiene su propio limitador de
+#               tasa y crea su cliente la primera vez que se usa, de modo que solo hace falta instalar los SDK de los
+#               proveedores que se vayan a utilizar. Los usa el barrido de modelos y temperaturas (barrido.py).
+# ==========================================================
+
+import threading
+
+from limitador_tasa import RateLimiter, estimate_call_tokens, error_headers
+from cache_llm import cached_call
+
+# Límites de frecuencia por proveedor: (RPM, TPM, RPD), los mismos que en los scripts de bucle
+PROVIDER_LIMITS = {
+    "groq": (30, 7_000, 7_000),
+    "openai": (500, 200_000, 10_000),
+    "gemini": (15, 1_000_000, 1_500),
+}
+
+# Claves API por proveedor
+API_KEYS = {
+    "groq": "tu_clave_api_groq",  # Reemplaza con tu clave API de Groq
+    "openai": "tu_clave_api_openai",  # Reemplaza con tu clave API de OpenAI
+    "gemini": "tu_clave_api_google",  # Reemplaza con tu clave API de Google AI
+}
+
+
+# Funciones para construir el prompt (mismo texto que en summary_text / complete_text)
+def summary_instruction(max_summary_length):
+    return f"Summarize the following text to approximately {max_summary_length} words:"
+
+
+def expansion_instruction(original_text_length):
+    return f"Expand the following summary into a complete text of {original_text_length} words:"
+
+
+# Clase base de proveedor: comparte el limitador, la caché y la creación perezosa del cliente
+class Provider:
+    name = None
+    daily_request_headers = False  # Las cabeceras x-ratelimit-*-requests son por día (ver RateLimiter)
+
+    def __init__(self, api_key=None, limits=None, cache=None, client_factory=None):
+        """
+        Args:
+            api_key (str): Clave API; por defecto la de API_KEYS.
+            limits (tuple): (RPM, TPM, RPD); por defecto los de PROVIDER_LIMITS.
+            cache (ResponseCache): Caché de respuestas opcional.
+            client_factory (callable): Función sin argumentos que devuelve el cliente (para usar otro endpoint).
+        """
+        self.api_key = api_key or API_KEYS.get(self.name)
+        self.rate_limiter = RateLimiter(*(limits or PROVIDER_LIMITS[self.name]),
+                                        daily_request_headers=self.daily_request_headers)
+        self.cache = cache
+        self.client_factory = client_factory
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        # El cliente (y el SDK) solo se cargan la primera vez que se hace una llamada
+        with self._lock:
+            if self._client is None:
+                self._client = self.client_factory() if self.client_factory else self._create_client()
+            return self._client
+
+    def _create_client(self):
+        raise NotImplementedError
+
+    def quota_errors(self):
+        return ()
+
+    def api_errors(self):
+        # Excepciones del SDK con la respuesta HTTP (429 y 5xx), de las que se leen las cabeceras de límite de tasa
+        return ()
+
+    def summarize(self, model, text, max_summary_length, temperature=1.0):
+        return self._generate(model, summary_instruction(max_summary_length), text, max_summary_length, temperature)
+
+    def expand(self, model, summary, original_text_length, temperature=1.0):
+        return self._generate(model, expansion_instruction(original_text_length), summary, original_text_length,
+                              temperature)
+
+    def _generate(self, model, instruction, text, expected_words, temperature):
+        raise NotImplementedError
+
+
+# Proveedores con API de chat completions (OpenAI y Groq)
+class ChatCompletionsProvider(Provider):
+    def _generate(self, model, instruction, text, expected_words, temperature):
+        messages = [
+            {"role": "system", "content": instruction},
+            {"role": "user", "content": text},
+        ]
+
+        def request():
+            self.rate_limiter.acquire(estimate_call_tokens(text, expected_words))
+            try:
+                response = self.client.chat.completions.with_raw_response.create(model=model, messages=messages,
+                                                                                 temperature=temperature)
+            except self.api_errors() as e:
+                # Los 429 y 5xx llegan como excepción: su retry-after y sus x-ratelimit-* también reajustan el limitador
+                self.rate_limiter.update_from_headers(error_headers(e))
+                raise
+            self.rate_limiter.update_from_headers(response.headers)
+            return response.parse().choices[0].message.content
+
+        return cached_call(self.cache, self.name, model, messages, temperature, request)
+
+
+class GroqProvider(ChatCompletionsProvider):
+    name = "groq"
+    daily_request_headers = True  # Groq informa en x-ratelimit-*-requests de las peticiones por día
+
+    def _create_client(self):
+        from groq import Groq
+        return Groq(api_key=self.api_key)
+
+    def quota_errors(self):
+        from groq import RateLimitError
+        return (RateLimitError,)
+
+    def api_errors(self):
+        from groq import APIStatusError
+        return (APIStatusError,)
+
+
+class OpenAIProvider(ChatCompletionsProvider):
+    name = "openai"
+
+    def _create_client(self):
+        from openai import OpenAI
+        return OpenAI(api_key=self.api_key)
+
+    def quota_errors(self):
+        from openai import RateLimitError
+        return (RateLimitError,)
+
+    def api_errors(self):
+        from openai import APIStatusError
+        return (APIStatusError,)
+
+
+class GeminiProvider(Provider):
+    name = "gemini"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.models = {}
+
+    def _create_client(self):
+        import google.generativeai as genai
+        genai.configure(api_key=self.api_key)
+        return genai
+
+    def quota_errors(self):
+        from google.api_core.exceptions import ResourceExhausted
+        return (ResourceExhausted,)
+
+    def _model(self, model):
+        client = self.client
+        with self._lock:
+            if model not in self.models:
+                self.models[model] = client.GenerativeModel(model)
+            return self.models[model]
+
+    def _generate(self, model, instruction, text, expected_words, temperature):
+        prompt = f"{instruction}\n\n{text}"
+
+        def request():
+            self.rate_limiter.acquire(estimate_call_tokens(text, expected_words))
+            response = self._model(model).generate_content(prompt, generation_config={"temperature": temperature})
+            return response.text
+
+        return cached_call(self.cache, self.name, model, prompt, temperature, request)
+
+
+PROVIDERS = {"groq": GroqProvider, "openai": OpenAIProvider, "gemini": GeminiProvider}
+
+
+# Función para crear un proveedor por nombre
+def build_provider(name, **kwargs):
+    if name not in PROVIDERS:
+        raise ValueError(f"Proveedor desconocido: {name}. Disponibles: {', '.join(PROVIDERS)}")
+    return PROVIDERS[name](**kwargs)
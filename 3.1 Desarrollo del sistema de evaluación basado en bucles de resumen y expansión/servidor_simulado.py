@@ -0,0 +1,229 @@
+# ==========================================================
+#  Proyecto: IMPLEMENTACIÓN DE UN SISTEMA DE EVALUACIÓN DE CAPACIDADES DE GRANDES MODELOS DE LENGUAJE A TRAVÉS DE BUCLES DE RESUMEN Y EXTENSIÓN DE TEXTOS
+#  Apartado: 3. DESARROLLO DEL SISTEMA EXPERIMENTAL
+#            3.1 DESARROLLO DEL SISTEMA DE EVALUACIÓN BASADO EN BUCLES DE RESUMEN Y EXPANSIÓN
+#  Autor: Javier González Pérez
+#  Fecha: 18/10/2026
+#  Descripción: Servidor local que simula las APIs de los proveedores para hacer pruebas de carga sin gastar cuota.
+#               Responde con el formato de chat completions de OpenAI (/v1/chat/completions) y de Groq
+#               (/openai/v1/chat/completions), y con el de generateContent de Gemini
+#               (/v1beta/models/<modelo>:generateContent). Las respuestas son transformaciones deterministas del texto
+#               (las mismas que el endpoint de lotes local) y se pueden configurar la latencia, los límites RPM/TPM
+#               (con respuestas 429 y cabeceras x-ratelimit-*) y la inyección de errores 5xx. GET /stats devuelve los
+#               contadores del servidor.
+#
+#  Uso:  python servidor_simulado.py --puerto 8000 --latencia lognormal:0.8:0.5 --rpm 500 --tpm 200000 --errores 0.02
+#        (clientes: OpenAI(base_url="http://127.0.0.1:8000/v1"), Groq(base_url="http://127.0.0.1:8000"))
+# ==========================================================
+
+import argparse
+import json
+import math
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from limitador_tasa import TokenBucket, estimate_tokens
+from modo_batch import deterministic_handler
+
+CHAT_PATHS = ("/v1/chat/completions", "/openai/v1/chat/completions")
+GEMINI_PATH = re.compile(r"^/v1(beta)?/models/(?P<model>[^:/]+):generateContent")
+
+
+# Función para interpretar la distribución de latencia: "fixed:0.5", "uniform:0.2:1.0" o "lognormal:0.8:0.5"
+def parse_latency(spec):
+    if isinstance(spec, (int, float)):
+        return ("fixed", float(spec))
+    name, *params = str(spec).split(":")
+    params = [float(value) for value in params]
+    expected = {"fixed": 1, "uniform": 2, "lognormal": 2}
+    if name not in expected or len(params) != expected[name]:
+        raise ValueError(f"Distribución de latencia no válida: {spec}")
+    return (name, *params)
+
+
+# Clase con la configuración y el estado compartido del servidor simulado
+class SimulatedBackend:
+    def __init__(self, latency="fixed:0", per_token_latency=0.0, requests_per_minute=None, tokens_per_minute=None,
+                 error_rate=0.0, seed=0, window=60.0):
+        """
+        Args:
+            latency (str): Distribución de la latencia base de cada respuesta (ver parse_latency). En lognormal los
+                           parámetros son la mediana y sigma.
+            per_token_latency (float): Segundos adicionales por token generado.
+            requests_per_minute (int): Límite de peticiones por ventana; al superarlo se responde 429.
+            tokens_per_minute (int): Límite de tokens (entrada + salida estimada) por ventana.
+            error_rate (float): Probabilidad de responder con un error 500/503.
+            seed (int): Semilla de la latencia y de los errores, para que las pruebas sean reproducibles.
+            window (float): Duración en segundos de la ventana de los límites (60 para RPM/TPM reales).
+        """
+        self.latency = parse_latency(latency)
+        self.per_token_latency = per_token_latency
+        self.requests = TokenBucket(requests_per_minute, window) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute, window) if tokens_per_minute else None
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.counters = {"requests": 0, "ok": 0, "rate_limited": 0, "errors": 0, "tokens": 0}
+
+    def _sample_latency(self):
+        name, *params = self.latency
+        if name == "fixed":
+            return params[0]
+        if name == "uniform":
+            return self.rng.uniform(params[0], params[1])
+        return math.exp(self.rng.gauss(math.log(params[0]), params[1]))
+
+    def admit(self, tokens):
+        """
+        Decide si se atiende una petición. Devuelve (código HTTP, cabeceras de límite, latencia).
+        """
+        with self.lock:
+            now = time.monotonic()
+            self.counters["requests"] += 1
+            waits = [bucket.wait_time(amount, now)
+                     for bucket, amount in ((self.requests, 1), (self.tokens, tokens)) if bucket is not None]
+            if any(waits):
+                self.counters["rate_limited"] += 1
+                return 429, self._headers(now, max(waits)), 0.0
+            for bucket, amount in ((self.requests, 1), (self.tokens, tokens)):
+                if bucket is not None:
+                    bucket.consume(amount, now)
+            if self.error_rate and self.rng.random() < self.error_rate:
+                self.counters["errors"] += 1
+                return self.rng.choice((500, 503)), self._headers(now), self._sample_latency()
+            self.counters["ok"] += 1
+            self.counters["tokens"] += tokens
+            return 200, self._headers(now), self._sample_latency()
+
+    def _headers(self, now, retry_after=None):
+        headers = {}
+        for bucket, kind in ((self.requests, "requests"), (self.tokens, "tokens")):
+            if bucket is None:
+                continue
+            bucket._refill(now)
+            headers[f"x-ratelimit-limit-{kind}"] = str(int(bucket.capacity))
+            headers[f"x-ratelimit-remaining-{kind}"] = str(max(int(bucket.available), 0))
+            reset = (bucket.capacity - bucket.available) / bucket.rate
+            headers[f"x-ratelimit-reset-{kind}"] = f"{reset:.3f}s"
+        if retry_after is not None:
+            headers["retry-after"] = f"{retry_after:.3f}"
+        return headers
+
+    def stats(self):
+        with self.lock:
+            return dict(self.counters)
+
+
+# Manejador HTTP con los formatos de OpenAI/Groq y Gemini
+class SimulatedHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass  # Sin una línea de log por petición
+
+    def _send(self, status, payload, headers=None):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/stats":
+            self._send(200, self.server.backend.stats())
+        else:
+            self._send(404, {"error": {"message": f"Ruta desconocida: {self.path}"}})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            request = json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError:
+            self._send(400, {"error": {"message": "JSON no válido"}})
+            return
+
+        path = self.path.split("?")[0]
+        gemini_match = GEMINI_PATH.match(path)
+        if path in CHAT_PATHS:
+            body = {"model": request.get("model"), "messages": request.get("messages", [])}
+        elif gemini_match:
+            # El prompt de Gemini es "instrucción\n\ntexto"; se separa para reutilizar la misma transformación
+            prompt = "".join(part.get("text", "") for content in request.get("contents", [])
+                             for part in content.get("parts", []))
+            instruction, _, text = prompt.partition("\n\n")
+            body = {"model": gemini_match.group("model"),
+                    "messages": [{"role": "system", "content": instruction}, {"role": "user", "content": text}]}
+        else:
+            self._send(404, {"error": {"message": f"Ruta desconocida: {self.path}"}})
+            return
+
+        content = deterministic_handler(body) if len(body["messages"]) >= 2 else ""
+        prompt_tokens = sum(estimate_tokens(str(message.get("content", ""))) for message in body["messages"])
+        completion_tokens = estimate_tokens(content)
+        status, headers, latency = self.server.backend.admit(prompt_tokens + completion_tokens)
+        time.sleep(latency + completion_tokens * self.server.backend.per_token_latency)
+
+        if status == 429:
+            self._send(429, {"error": {"message": "Rate limit reached", "type": "rate_limit_exceeded",
+                                       "code": 429 if gemini_match else "rate_limit_exceeded"}}, headers)
+        elif status != 200:
+            self._send(status, {"error": {"message": "Error simulado del servidor", "type": "server_error"}},
+                       headers)
+        elif gemini_match:
+            self._send(200, {
+                "candidates": [{"content": {"parts": [{"text": content}], "role": "model"},
+                                "finishReason": "STOP", "index": 0}],
+                "usageMetadata": {"promptTokenCount": prompt_tokens, "candidatesTokenCount": completion_tokens,
+                                  "totalTokenCount": prompt_tokens + completion_tokens},
+            }, headers)
+        else:
+            self._send(200, {
+                "id": f"chatcmpl-sim-{self.server.backend.stats()['requests']}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body["model"],
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content},
+                             "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                          "total_tokens": prompt_tokens + completion_tokens},
+            }, headers)
+
+
+# Función para arrancar el servidor en un hilo (para las pruebas y el benchmark)
+def start_server(host="127.0.0.1", port=0, **backend_kwargs):
+    server = ThreadingHTTPServer((host, port), SimulatedHandler)
+    server.daemon_threads = True
+    server.backend = SimulatedBackend(**backend_kwargs)
+    server.url = f"http://{host}:{server.server_address[1]}"
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+# Main
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servidor simulado de APIs de LLM (OpenAI, Groq y Gemini).")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--puerto", type=int, default=8000)
+    parser.add_argument("--latencia", default="fixed:0.5", help="fixed:s | uniform:min:max | lognormal:mediana:sigma")
+    parser.add_argument("--latencia-token", type=float, default=0.0, help="Segundos adicionales por token generado")
+    parser.add_argument("--rpm", type=int, default=None)
+    parser.add_argument("--tpm", type=int, default=None)
+    parser.add_argument("--errores", type=float, default=0.0, help="Probabilidad de error 5xx")
+    parser.add_argument("--semilla", type=int, default=0)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer((args.host, args.puerto), SimulatedHandler)
+    server.backend = SimulatedBackend(args.latencia, args.latencia_token, args.rpm, args.tpm, args.errores,
+                                      args.semilla)
+    print(f"Servidor simulado escuchando en http://{args.host}:{args.puerto}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"Servidor detenido. Estadísticas: {server.backend.stats()}")
@@ -0,0 +1,145 @@
+# ==========================================================
+#  Proyecto: IMPLEMENTACIÓN DE UN SISTEMA DE EVALUACIÓN DE CAPACIDADES DE GRANDES MODELOS DE LENGUAJE A TRAVÉS DE BUCLES DE RESUMEN Y EXTENSIÓN DE TEXTOS
+#  Apartado: 3. DESARROLLO DEL SISTEMA EXPERIMENTAL
+#            3.1 DESARROLLO DEL SISTEMA DE EVALUACIÓN BASADO EN BUCLES DE RESUMEN Y EXPANSIÓN
+#  Autor: Javier González Pérez
+#  Fecha: 18/10/2026
+#  Descripción: Trayectorias con bifurcación. Cualquier estado guardado (id de texto, iteración k) del almacén de
+#               resultados puede ser un punto de bifurcación: la rama nueva copia las iteraciones 1..k de la tabla de
+#               origen y continúa desde new_text_k, en lugar de volver a generar el prefijo desde el texto original.
+#               Sirve para continuar una ejecución de 10 iteraciones hasta 20 o para cambiar la temperatura a partir de
+#               la iteración k. Cada fila de la rama guarda su linaje (tabla de origen, iteración y temperatura).
+# ==========================================================
+
+import re
+
+from motor_concurrente import run_iterations_concurrent, TEXT_FALLBACK
+from checkpoint_bucle import StepCheckpoint
+from almacen_resultados import append_results, read_results, load_saved_ids
+from proveedores import build_provider
+
+TEXT_COLUMNS = ['id', 'original_text', 'original_text_length', 'original_summary', 'original_summary_length']
+
+
+# Función para obtener las columnas de las iteraciones 1..k de una tabla (de cualquier temperatura)
+def prefix_columns(columns, fork_iteration):
+    pattern = re.compile(r"^(summary|new_text)_(\d+)_temp_")
+    return [col for col in columns
+            if pattern.match(col) and int(pattern.match(col).group(2)) <= fork_iteration]
+
+
+# Función para construir los puntos de bifurcación a partir de una tabla del almacén
+def fork_texts(source_df, fork_iteration, source_temperature, source_table=None):
+    """
+    Convierte las filas guardadas en textos de entrada que empiezan en la iteración `fork_iteration`.
+
+    Args:
+        source_df (pd.DataFrame): Tabla de origen leída con read_results.
+        fork_iteration (int): Iteración k desde la que se bifurca (0 equivale a empezar desde el texto original).
+        source_temperature (float): Temperatura con la que se generó el prefijo en la tabla de origen.
+        source_table (str): Nombre de la tabla de origen, para el linaje.
+
+    Returns:
+        list: Textos con el formato de read_texts_from_excel más 'start_iteration', 'seed_text' y 'prefix'.
+    """
+    seed_column = f"new_text_{fork_iteration}_temp_{source_temperature}"
+    if fork_iteration > 0 and seed_column not in source_df.columns:
+        raise ValueError(f"La tabla de origen no tiene la columna {seed_column}.")
+
+    prefix_cols = prefix_columns(source_df.columns, fork_iteration)
+    texts = []
+    for _, row in source_df.iterrows():
+        if fork_iteration > 0 and (not isinstance(row[seed_column], str) or row[seed_column] == TEXT_FALLBACK):
+            # Sin texto válido en la iteración k no hay estado del que partir
+            print(f"Texto {row['id']}: sin new_text_{fork_iteration} válido, se omite.")
+            continue
+        text_data = {col: row[col] for col in TEXT_COLUMNS}
+        text_data['start_iteration'] = fork_iteration
+        if fork_iteration > 0:
+            text_data['seed_text'] = row[seed_column]
+        text_data['prefix'] = {col: row[col] for col in prefix_cols}
+        text_data['prefix'].update({
+            'parent_table': source_table,
+            'fork_iteration': fork_iteration,
+            'parent_temperature': source_temperature,
+        })
+        texts.append(text_data)
+    return texts
+
+
+# Función para obtener el checkpoint propio de una rama. Incluye el modelo y el punto de bifurcación, porque las claves
+# del checkpoint (id, iteración, paso, temperatura) no los distinguen: así una ampliación en su sitio no comparte el
+# fichero con el bucle principal (checkpoint_<hoja>.jsonl) ni con ramas de otro modelo o de otra iteración de origen
+def branch_checkpoint_path(branch_table, provider_name, model, fork_iteration, source_temperature):
+    name = f"{branch_table}_{provider_name}_{model}_desde_{fork_iteration}_temp_{source_temperature}"
+    return f"checkpoint_rama_{re.sub(r'[^A-Za-z0-9._-]', '_', name)}.jsonl"
+
+
+def run_branch(store_dir, source_table, provider_name, model, fork_iteration, iterations, temperature,
+               branch_table=None, source_temperature=None, max_concurrency=8, limit=None):
+    """
+    Crea una rama a partir de la iteración `fork_iteration` de una tabla del almacén y la guarda en `branch_table`.
+
+    Args:
+        store_dir (str): Almacén de resultados.
+        source_table (str): Tabla con la ejecución de origen.
+        provider_name (str): Proveedor con el que se generan las iteraciones nuevas ("groq", "openai" o "gemini").
+        model (str): Modelo del proveedor.
+        fork_iteration (int): Última iteración que se reutiliza de la tabla de origen.
+        iterations (int): Iteración final de la rama (por ejemplo, 20 para continuar una ejecución de 10).
+        temperature (float): Temperatura de las iteraciones nuevas.
+        branch_table (str): Tabla de destino; si es la misma que la de origen, la ejecución se amplía en su sitio.
+        source_temperature (float): Temperatura del prefijo; por defecto la misma que la de la rama.
+
+    Returns:
+        pd.DataFrame: Filas de la rama, con el prefijo copiado y las columnas de linaje.
+    """
+    source_temperature = temperature if source_temperature is None else source_temperature
+    branch_table = branch_table or f"{source_table}_rama_{fork_iteration}_temp_{temperature}"
+
+    source_df = read_results(store_dir, source_table)
+    if limit is not None:
+        source_df = source_df.head(limit)
+    texts = fork_texts(source_df, fork_iteration, source_temperature, source_table)
+
+    # Al ampliar en su sitio, los textos ya guardados en la tabla de origen no cuentan como hechos
+    if branch_table != source_table:
+        saved_ids = load_saved_ids(store_dir, branch_table)
+        texts = [text_data for text_data in texts if str(text_data['id']) not in saved_ids]
+    if not texts:
+        print("No hay textos pendientes para esta rama.")
+        return None
+
+    reused_steps = len(texts) * fork_iteration
+    print(f"Rama {branch_table}: {len(texts)} textos, se reutilizan {reused_steps} iteraciones de {source_table}.")
+
+    provider = build_provider(provider_name)
+    checkpoint = StepCheckpoint(branch_checkpoint_path(branch_table, provider_name, model, fork_iteration,
+                                                       source_temperature))
+    try:
+        results_df, _ = run_iterations_concurrent(
+            texts, iterations,
+            lambda text, length, temp: provider.summarize(model, text, length, temp),
+            lambda text, length, temp: provider.expand(model, text, length, temp),
+            temperature, max_concurrency, checkpoint=checkpoint, quota_errors=provider.quota_errors()
+        )
+    finally:
+        checkpoint.close()
+
+    append_results(results_df, store_dir, branch_table)
+    return results_df
+
+
+# Main
+if __name__ == "__main__":
+    store_dir = 'resultados_bucle_resumen_expansion_gpt4'
+    source_table = 'gpt-4o-mini-2024-07-18'
+
+    # Continuar la ejecución de 10 iteraciones hasta 20 (se amplía la misma tabla)
+    run_branch(store_dir, source_table, "openai", "gpt-4o-mini-2024-07-18",
+               fork_iteration=10, iterations=20, temperature=1.0, branch_table=source_table)
+
+    # Cambiar la temperatura a 0.5 a partir de la iteración 5 (tabla nueva con el linaje de la rama)
+    run_branch(store_dir, source_table, "openai", "gpt-4o-mini-2024-07-18",
+               fork_iteration=5, iterations=10, temperature=0.5, source_temperature=1.0)
+    print("Proceso completado.")
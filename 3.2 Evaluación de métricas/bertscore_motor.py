@@ -0,0 +1,303 @@
+# ==========================================================
+#  Proyecto: IMPLEMENTACIÓN DE UN SISTEMA DE EVALUACIÓN DE CAPACIDADES DE GRANDES MODELOS DE LENGUAJE A TRAVÉS DE BUCLES DE RESUMEN Y EXTENSIÓN DE TEXTOS
+#  Apartado: 3. DESARROLLO DEL SISTEMA EXPERIMENTAL
+#            3.2 EVALUACIÓN DE MÉTRICAS
+#  Autor: Javier González Pérez
+#  Fecha: 18/10/2026
+#  Descripción: Motor de BERTScore con caché de embeddings de las referencias. En calculo_metricas.py el texto original
+#               es la referencia de 20 hipótesis y el resumen original de otras 10, y bert_score vuelve a pasar la
+#               referencia por el transformer en cada comparación. Aquí los embeddings contextuales de cada referencia
+#               se calculan una sola vez, se guardan en una caché limitada en memoria (y opcionalmente en disco) con el
+#               hash del texto como clave, y se reutilizan para todas sus hipótesis. El emparejamiento voraz por coseno
+#               es el mismo que el de bert_score (roberta-large, capa 17, sin idf ni reescalado), por lo que las
+#               puntuaciones coinciden con las de bert_score.score(lang="en"). Los lotes se forman por longitud con un
+#               presupuesto de tokens (mínimo relleno al mezclar resúmenes y textos completos) y, opcionalmente, los
+#               textos de más de 512 tokens se codifican en ventanas solapadas cuyos embeddings se unen antes del
+#               emparejamiento, en lugar de truncarse.
+#
+#  Uso:  python bertscore_motor.py   (comprueba la paridad con bert_score en unos pares de ejemplo)
+# ==========================================================
+
+import hashlib
+import os
+from collections import OrderedDict
+
+import numpy as np
+import torch
+from transformers import AutoModel, AutoTokenizer
+
+DEFAULT_MODEL = "roberta-large"
+DEFAULT_LAYERS = 17  # Capa que usa bert_score para roberta-large
+DEFAULT_BATCH_TOKENS = 16384  # Tokens por pasada del transformer (filas × longitud del lote, relleno incluido)
+
+
+# Función para cargar el modelo recortado a la capa que usa bert_score (sus embeddings son la salida de esa capa)
+def load_truncated_model(model_type=DEFAULT_MODEL, num_layers=DEFAULT_LAYERS):
+    model = AutoModel.from_pretrained(model_type)
+    model.encoder.layer = torch.nn.ModuleList(model.encoder.layer[:num_layers])
+    model.eval()
+    return model
+
+
+# Clase de caché de embeddings: LRU en memoria limitada por bytes y, opcionalmente, copia en disco (.npz)
+class EmbeddingCache:
+    def __init__(self, max_bytes=2 * 1024 ** 3, cache_dir=None):
+        self.max_bytes = max_bytes
+        self.cache_dir = cache_dir
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.counters = {"hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def _disk_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.npz")
+
+    def get(self, key):
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.counters["hits"] += 1
+            return self.entries[key]
+        if self.cache_dir and os.path.exists(self._disk_path(key)):
+            with np.load(self._disk_path(key)) as data:
+                entry = (data["embeddings"], data["weights"])
+            self.counters["disk_hits"] += 1
+            self._store(key, entry)
+            return entry
+        self.counters["misses"] += 1
+        return None
+
+    def put(self, key, entry):
+        if self.cache_dir and not os.path.exists(self._disk_path(key)):
+            tmp_path = self._disk_path(key) + ".tmp.npz"
+            np.savez(tmp_path, embeddings=entry[0], weights=entry[1])
+            os.replace(tmp_path, self._disk_path(key))
+        self._store(key, entry)
+
+    def _store(self, key, entry):
+        size = entry[0].nbytes + entry[1].nbytes
+        if key in self.entries:
+            return
+        self.entries[key] = entry
+        self.bytes += size
+        # Expulsar las entradas menos usadas hasta volver al límite
+        while self.bytes > self.max_bytes and len(self.entries) > 1:
+            _, (embeddings, weights) = self.entries.popitem(last=False)
+            self.bytes -= embeddings.nbytes + weights.nbytes
+            self.counters["evictions"] += 1
+
+    def stats(self):
+        return dict(self.counters, entries=len(self.entries), bytes=self.bytes)
+
+
+# Clase con el modelo cargado y el cálculo de BERTScore
+class BERTScoreEngine:
+    def __init__(self, model_type=DEFAULT_MODEL, num_layers=DEFAULT_LAYERS, batch_size=64, device=None, cache=None,
+                 batch_tokens=DEFAULT_BATCH_TOKENS, window_overlap=None, max_length=None):
+        """
+        Args:
+            model_type (str): Modelo de Hugging Face (el mismo que usaría bert_score).
+            num_layers (int): Capa cuyos embeddings se usan (el modelo se recorta a esas capas, como en bert_score).
+            batch_size (int): Máximo de secuencias por pasada del transformer.
+            device (str): "cuda" o "cpu"; por defecto, cuda si está disponible.
+            cache (EmbeddingCache): Caché de embeddings de las referencias (por defecto, una en memoria).
+            batch_tokens (int): Máximo de tokens por pasada (filas × longitud, relleno incluido): los lotes de textos
+                                cortos llevan más filas que los de textos largos.
+            window_overlap (int): Si se indica, los textos más largos que el modelo se dividen en ventanas solapadas
+                                  con ese número de tokens en común y sus embeddings se unen; con None se truncan,
+                                  como en bert_score.
+            max_length (int): Longitud máxima de secuencia del modelo (por defecto, la del tokenizador).
+        """
+        self.model_type = model_type
+        self.num_layers = num_layers
+        self.batch_size = batch_size
+        self.batch_tokens = batch_tokens
+        self.window_overlap = window_overlap
+        self.device = device or ("cuda" if torch.cuda.is_available() else "cpu")
+        self.cache = cache if cache is not None else EmbeddingCache()
+        self.tokenizer = AutoTokenizer.from_pretrained(model_type)
+        self.max_length = max_length or self.tokenizer.model_max_length
+        if window_overlap is not None and not 0 <= window_overlap < self.max_length - 2:
+            raise ValueError(f"Solapamiento de ventanas no válido: {window_overlap}")
+        self._load_model()
+        self.special_ids = {self.tokenizer.cls_token_id, self.tokenizer.sep_token_id}
+
+    def _load_model(self):
+        self.model = load_truncated_model(self.model_type, self.num_layers)
+        self.model.to(self.device)
+
+    def _forward(self, input_ids, attention_mask):
+        """
+        Pasa un lote por el modelo (arrays int64 lote × longitud) y devuelve los embeddings normalizados (float32).
+        """
+        with torch.no_grad():
+            output = self.model(torch.from_numpy(input_ids).to(self.device),
+                                attention_mask=torch.from_numpy(attention_mask).to(self.device))[0]
+        output = output / output.norm(dim=-1, keepdim=True)
+        return output.cpu().numpy()
+
+    # Tokenización igual que sent_encode de bert_score (sin truncar si los textos largos van por ventanas)
+    def _tokenize(self, text):
+        truncate = self.window_overlap is None
+        return self.tokenizer.encode(text.strip(), add_special_tokens=True, add_prefix_space=True,
+                                     max_length=self.max_length if truncate else None, truncation=truncate)
+
+    def _cache_key(self, text):
+        # Con ventanas, los embeddings de los textos largos cambian: se guardan con otra clave
+        windows = "" if self.window_overlap is None else f"w{self.window_overlap}\x1f"
+        key = f"{self.model_type}\x1f{self.num_layers}\x1f{windows}{text}"
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+    def _windows(self, token_ids):
+        """
+        Divide una secuencia demasiado larga en ventanas solapadas, cada una con sus tokens <s> y </s>.
+
+        Returns:
+            list: [(posición de inicio en los tokens de contenido, secuencia de la ventana)].
+        """
+        if len(token_ids) <= self.max_length:
+            return [(0, token_ids)]
+        content = token_ids[1:-1]
+        width = self.max_length - 2
+        step = width - self.window_overlap
+        starts = [0]
+        while starts[-1] + width < len(content):
+            starts.append(starts[-1] + step)
+        return [(start, [token_ids[0]] + content[start:start + width] + [token_ids[-1]]) for start in starts]
+
+    @staticmethod
+    def _stitch(windows):
+        """
+        Une los embeddings de las ventanas de un texto: cada token toma el de la ventana en la que está más centrado
+        (el solapamiento se reparte por la mitad), <s> el de la primera ventana y </s> el de la última.
+        """
+        if len(windows) == 1:
+            return windows[0][1]
+        ends = [start + len(embeddings) - 2 for start, embeddings in windows]
+        bounds = [0] + [(next_start + end) // 2 for (next_start, _), end in zip(windows[1:], ends[:-1])] + [ends[-1]]
+        rows = [windows[0][1][:1]]
+        for (start, embeddings), own_start, own_end in zip(windows, bounds[:-1], bounds[1:]):
+            rows.append(embeddings[1 + own_start - start:1 + own_end - start])
+        rows.append(windows[-1][1][-1:])
+        return np.concatenate(rows)
+
+    def _batches(self, lengths):
+        # Lotes con el mínimo relleno: secuencias de más larga a más corta, cortando el lote cuando llega a
+        # batch_size filas o cuando (filas + 1) × longitud de la primera superaría batch_tokens
+        order = sorted(range(len(lengths)), key=lambda k: lengths[k], reverse=True)
+        batches, batch = [], []
+        for k in order:
+            if batch and (len(batch) >= self.batch_size or (len(batch) + 1) * lengths[batch[0]] > self.batch_tokens):
+                batches.append(batch)
+                batch = []
+            batch.append(k)
+        if batch:
+            batches.append(batch)
+        return batches
+
+    def encode(self, texts):
+        """
+        Calcula los embeddings normalizados de cada texto, junto con el peso de cada token (0 en <s> y </s>, 1 en el
+        resto, que es la ponderación de bert_score sin idf). Los textos más largos que el modelo se codifican por
+        ventanas (si window_overlap no es None) y se devuelven con todos sus tokens.
+
+        Returns:
+            list: [(np.ndarray tokens × dimensión, np.ndarray de pesos)] en el orden de `texts`.
+        """
+        token_ids = [self._tokenize(text) for text in texts]
+        # Secuencias que pasan por el modelo: (texto, inicio de la ventana, tokens)
+        pieces = [(i, start, sequence) for i, ids in enumerate(token_ids) for start, sequence in self._windows(ids)]
+        windows = [[] for _ in texts]
+        for batch in self._batches([len(sequence) for _, _, sequence in pieces]):
+            max_len = len(pieces[batch[0]][2])
+            input_ids = np.full((len(batch), max_len), self.tokenizer.pad_token_id, dtype=np.int64)
+            attention_mask = np.zeros((len(batch), max_len), dtype=np.int64)
+            for row, k in enumerate(batch):
+                input_ids[row, :len(pieces[k][2])] = pieces[k][2]
+                attention_mask[row, :len(pieces[k][2])] = 1
+            output = self._forward(input_ids, attention_mask)
+            for row, k in enumerate(batch):
+                i, start, sequence = pieces[k]
+                windows[i].append((start, output[row, :len(sequence)].astype(np.float32)))
+
+        encoded = []
+        for ids, text_windows in zip(token_ids, windows):
+            weights = np.array([0.0 if token in self.special_ids else 1.0 for token in ids], dtype=np.float32)
+            encoded.append((self._stitch(sorted(text_windows, key=lambda window: window[0])), weights))
+        return encoded
+
+    def encode_references(self, texts):
+        """
+        Igual que encode, pero pasando por la caché: cada referencia distinta se codifica una sola vez.
+        """
+        keys = [self._cache_key(text) for text in texts]
+        entries = {key: self.cache.get(key) for key in dict.fromkeys(keys)}
+        missing = [key for key, entry in entries.items() if entry is None]
+        if missing:
+            text_by_key = dict(zip(keys, texts))
+            for key, entry in zip(missing, self.encode([text_by_key[key] for key in missing])):
+                self.cache.put(key, entry)
+                entries[key] = entry
+        return [entries[key] for key in keys]
+
+    def score(self, references, hypotheses):
+        """
+        Calcula BERTScore de cada par (referencia, hipótesis).
+
+        Los pares se agrupan por referencia y se procesan por bloques de `batch_size` referencias, para que cada
+        referencia se codifique una vez y en memoria solo estén los embeddings del bloque en curso.
+
+        Returns:
+            list: [{"precision", "recall", "f1"}] en el orden de los pares.
+        """
+        pairs_by_reference = {}
+        for index, reference in enumerate(references):
+            pairs_by_reference.setdefault(reference, []).append(index)
+        unique_references = list(pairs_by_reference)
+
+        results = [None] * len(references)
+        for start in range(0, len(unique_references), self.batch_size):
+            block = unique_references[start:start + self.batch_size]
+            reference_embeddings = dict(zip(block, self.encode_references(block)))
+            indices = [index for reference in block for index in pairs_by_reference[reference]]
+            hypothesis_embeddings = self.encode([hypotheses[index] for index in indices])
+            for index, hypothesis in zip(indices, hypothesis_embeddings):
+                results[index] = greedy_match(reference_embeddings[references[index]], hypothesis)
+        return results
+
+
+# Emparejamiento voraz de bert_score (greedy_cos_idf): cada token se empareja con el más parecido del otro texto
+def greedy_match(reference, hypothesis):
+    reference_embeddings, reference_weights = reference
+    hypothesis_embeddings, hypothesis_weights = hypothesis
+    # Un texto vacío solo tiene tokens especiales (peso 0): como bert_score, sus puntuaciones son 0
+    if hypothesis_weights.sum() == 0 or reference_weights.sum() == 0:
+        return {"precision": 0.0, "recall": 0.0, "f1": 0.0}
+    similarity = hypothesis_embeddings @ reference_embeddings.T
+    precision = float((similarity.max(axis=1) * hypothesis_weights).sum() / hypothesis_weights.sum())
+    recall = float((similarity.max(axis=0) * reference_weights).sum() / reference_weights.sum())
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall > 0 else 0.0
+    return {"precision": precision, "recall": recall, "f1": f1}
+
+
+# Main: comprobación de paridad con bert_score
+if __name__ == "__main__":
+    import bert_score
+
+    references = ["The cat sat on the mat while the dog slept by the door.",
+                  "Stocks fell sharply on Monday after the central bank raised interest rates."]
+    hypotheses = ["A cat was sitting on a mat.", "The dog slept.",
+                  "Markets dropped on Monday following a rate increase by the central bank."]
+    # Incluye una hipótesis y una referencia vacías, que bert_score puntúa con 0
+    pairs = [(references[0], hypotheses[0]), (references[0], hypotheses[1]), (references[1], hypotheses[2]),
+             (references[1], ""), ("", hypotheses[0])]
+
+    engine = BERTScoreEngine()
+    ours = engine.score([reference for reference, _ in pairs], [hypothesis for _, hypothesis in pairs])
+    P, R, F1 = bert_score.score([hypothesis for _, hypothesis in pairs], [reference for reference, _ in pairs],
+                                lang="en")
+    for scores, p, r, f in zip(ours, P.tolist(), R.tolist(), F1.tolist()):
+        print(f"motor: {scores['precision']:.6f} {scores['recall']:.6f} {scores['f1']:.6f} | "
+              f"bert_score: {p:.6f} {r:.6f} {f:.6f}")
+        assert abs(scores['f1'] - f) < 1e-4, "Las puntuaciones no coinciden con bert_score"
+    print(f"Paridad correcta. Caché: {engine.cache.stats()}")
@@ -0,0 +1,214 @@
+# ==========================================================
+#  Proyecto: IMPLEMENTACIÓN DE UN SISTEMA DE EVALUACIÓN DE CAPACIDADES DE GRANDES MODELOS DE LENGUAJE A TRAVÉS DE BUCLES DE RESUMEN Y EXTENSIÓN DE TEXTOS
+#  Apartado: 3. DESARROLLO DEL SISTEMA EXPERIMENTAL
+#            3.2 EVALUACIÓN DE MÉTRICAS
+#  Autor: Javier González Pérez
+#  Fecha: 18/10/2026
+#  Descripción: Backend de BERTScore para CPU con ONNX Runtime y cuantización dinámica int8. El modelo de bertscore_motor.py
+#               (roberta-large recortado a la capa 17) se exporta una vez a ONNX, sus pesos se cuantizan a int8 y las
+#               pasadas del transformer se hacen con ONNX Runtime; la tokenización, los lotes, la caché de referencias y
+#               el emparejamiento voraz son los del motor de PyTorch, así que se usa con la misma interfaz que
+#               calculate_bertscore. Las puntuaciones no son idénticas a las de fp32: el comando "validar" mide la
+#               desviación y la aceleración sobre los textos de un almacén o Excel de resultados y guarda un informe.
+#
+#  Uso:  python bertscore_onnx.py exportar [--dir modelo_bertscore_onnx]
+#        python bertscore_onnx.py validar resultados_bucle_resumen_expansion_gemini [--textos 20] [--informe validacion.xlsx]
+# ==========================================================
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import onnxruntime as ort
+import pandas as pd
+import torch
+from onnxruntime.quantization import QuantType, quantize_dynamic
+
+from bertscore_motor import BERTScoreEngine, EmbeddingCache, DEFAULT_MODEL, DEFAULT_LAYERS, load_truncated_model
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..",
+                             "3.1 Desarrollo del sistema de evaluación basado en bucles de resumen y expansión"))
+from almacen_resultados import read_table
+
+ONNX_DIR = "modelo_bertscore_onnx"
+ONNX_OPSET = 14
+
+
+# Función para obtener las rutas de los modelos ONNX (fp32 exportado e int8 cuantizado)
+def onnx_paths(onnx_dir=ONNX_DIR, model_type=DEFAULT_MODEL, num_layers=DEFAULT_LAYERS):
+    base = os.path.join(onnx_dir, f"{model_type.replace('/', '_')}-L{num_layers}")
+    return base + ".onnx", base + "-int8.onnx"
+
+
+def export_onnx_model(onnx_dir=ONNX_DIR, model_type=DEFAULT_MODEL, num_layers=DEFAULT_LAYERS):
+    """
+    Exporta el modelo recortado a ONNX y lo cuantiza con cuantización dinámica int8 (pesos en int8, activaciones
+    cuantizadas en tiempo de ejecución).
+
+    Returns:
+        str: Ruta del modelo int8.
+    """
+    fp32_path, int8_path = onnx_paths(onnx_dir, model_type, num_layers)
+    os.makedirs(onnx_dir, exist_ok=True)
+    model = load_truncated_model(model_type, num_layers)
+
+    # Envoltorio que devuelve solo los embeddings de la última capa conservada
+    class HiddenStates(torch.nn.Module):
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, input_ids, attention_mask):
+            return self.model(input_ids, attention_mask=attention_mask)[0]
+
+    dummy = torch.ones((2, 8), dtype=torch.long)
+    with torch.no_grad():
+        torch.onnx.export(HiddenStates(model), (dummy, dummy), fp32_path, opset_version=ONNX_OPSET,
+                          input_names=["input_ids", "attention_mask"], output_names=["hidden_states"],
+                          dynamic_axes={"input_ids": {0: "batch", 1: "sequence"},
+                                        "attention_mask": {0: "batch", 1: "sequence"},
+                                        "hidden_states": {0: "batch", 1: "sequence"}})
+    quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+    print(f"Modelo exportado a {fp32_path} y cuantizado a int8 en {int8_path} "
+          f"({os.path.getsize(fp32_path) / 1024 ** 2:.0f} MB → {os.path.getsize(int8_path) / 1024 ** 2:.0f} MB).")
+    return int8_path
+
+
+# Clase del motor de BERTScore con ONNX Runtime int8 en CPU
+class ONNXBERTScoreEngine(BERTScoreEngine):
+    def __init__(self, model_type=DEFAULT_MODEL, num_layers=DEFAULT_LAYERS, batch_size=64, cache=None,
+                 onnx_dir=ONNX_DIR, threads=None, **engine_kwargs):
+        """
+        Args:
+            onnx_dir (str): Directorio de los modelos ONNX; si no está el modelo int8, se exporta la primera vez.
+            threads (int): Hilos de ONNX Runtime (por defecto, todos los núcleos).
+            Resto: como BERTScoreEngine (batch_tokens, window_overlap, max_length).
+        """
+        self.onnx_dir = onnx_dir
+        self.threads = threads
+        super().__init__(model_type, num_layers, batch_size, device="cpu", cache=cache, **engine_kwargs)
+
+    def _load_model(self):
+        _, int8_path = onnx_paths(self.onnx_dir, self.model_type, self.num_layers)
+        if not os.path.exists(int8_path):
+            export_onnx_model(self.onnx_dir, self.model_type, self.num_layers)
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if self.threads:
+            options.intra_op_num_threads = self.threads
+        self.session = ort.InferenceSession(int8_path, options, providers=["CPUExecutionProvider"])
+
+    def _forward(self, input_ids, attention_mask):
+        output = self.session.run(["hidden_states"], {"input_ids": input_ids, "attention_mask": attention_mask})[0]
+        return (output / np.linalg.norm(output, axis=-1, keepdims=True)).astype(np.float32)
+
+    def _cache_key(self, text):
+        # Los embeddings int8 no son los de fp32: no deben mezclarse en una caché compartida en disco
+        return super()._cache_key(f"onnx-int8\x1f{text}")
+
+
+# Motor int8 compartido: se carga una sola vez por proceso
+_onnx_engine = None
+
+def get_onnx_engine():
+    global _onnx_engine
+    if _onnx_engine is None:
+        _onnx_engine = ONNXBERTScoreEngine()
+    return _onnx_engine
+
+# Función para calcular BertScore int8 de muchos pares (referencia, hipótesis) en lotes
+def calculate_bertscore_onnx_batch(references, hypotheses):
+    return get_onnx_engine().score(references, hypotheses)
+
+# Función para calcular las métricas con BertScore int8 (misma interfaz que calculate_bertscore)
+def calculate_bertscore_onnx(reference, hypothesis):
+    return calculate_bertscore_onnx_batch([reference], [hypothesis])[0]
+
+
+def validate(source, table=None, num_texts=20, report_path="validacion_bertscore_onnx.xlsx", onnx_dir=ONNX_DIR,
+             seed=0):
+    """
+    Compara el backend int8 con el de PyTorch fp32 sobre una muestra de textos de resultados de los bucles (las tres
+    familias de comparación de calculo_metricas.py) y guarda el informe.
+
+    Args:
+        source (str): Almacén de resultados o Excel de los bucles.
+        table (str): Tabla u hoja (por defecto, la primera).
+        num_texts (int): Textos de la muestra.
+
+    Returns:
+        pd.DataFrame: Resumen de la desviación por familia y en total.
+    """
+    df = read_table(source, table)
+    df = df.sample(min(num_texts, len(df)), random_state=seed)
+    summary_cols = [col for col in df.columns if col.startswith('summary_')]
+    text_cols = [col for col in df.columns if col.startswith('new_text_')]
+    families = [('orig_txt-summ', 'original_text', summary_cols), ('orig_txt-txts', 'original_text', text_cols),
+                ('orig_sum-summ', 'original_summary', summary_cols)]
+    pairs = [{'family': family, 'id': row['id'], 'hypothesis_col': col, 'reference': str(row[reference_col]),
+              'hypothesis': str(row[col])}
+             for family, reference_col, cols in families for _, row in df.iterrows() for col in cols if pd.notna(row[col])]
+    pairs = pd.DataFrame(pairs)
+    references, hypotheses = pairs['reference'].tolist(), pairs['hypothesis'].tolist()
+
+    timings = {}
+    for name, engine in [("fp32", BERTScoreEngine(device="cpu", cache=EmbeddingCache())),
+                         ("int8", ONNXBERTScoreEngine(onnx_dir=onnx_dir, cache=EmbeddingCache()))]:
+        start = time.perf_counter()
+        scores = engine.score(references, hypotheses)
+        timings[name] = time.perf_counter() - start
+        for metric in ("precision", "recall", "f1"):
+            pairs[f"{metric}_{name}"] = [pair_scores[metric] for pair_scores in scores]
+    pairs = pairs.drop(columns=['reference', 'hypothesis'])
+    for metric in ("precision", "recall", "f1"):
+        pairs[f"{metric}_diff"] = pairs[f"{metric}_int8"] - pairs[f"{metric}_fp32"]
+
+    def describe(group):
+        return pd.Series({
+            'pairs': len(group),
+            'f1_mean_fp32': group['f1_fp32'].mean(),
+            'f1_mean_int8': group['f1_int8'].mean(),
+            'f1_bias': group['f1_diff'].mean(),
+            'f1_mean_abs_diff': group['f1_diff'].abs().mean(),
+            'f1_max_abs_diff': group['f1_diff'].abs().max(),
+            'precision_max_abs_diff': group['precision_diff'].abs().max(),
+            'recall_max_abs_diff': group['recall_diff'].abs().max(),
+            'f1_pearson': group['f1_fp32'].corr(group['f1_int8']),
+            'f1_spearman': group['f1_fp32'].corr(group['f1_int8'], method='spearman'),
+        })
+
+    summary = pd.DataFrame({family: describe(group) for family, group in pairs.groupby('family')}).T
+    summary.loc['total'] = describe(pairs)
+    summary['seconds_fp32'] = np.nan
+    summary['seconds_int8'] = np.nan
+    summary.loc['total', ['seconds_fp32', 'seconds_int8']] = [timings['fp32'], timings['int8']]
+
+    with pd.ExcelWriter(report_path, engine='openpyxl') as writer:
+        summary.to_excel(writer, sheet_name='resumen', index_label='family')
+        pairs.to_excel(writer, sheet_name='pares', index=False)
+    print(summary.round(4).to_string())
+    print(f"{len(pairs)} pares de {len(df)} textos: fp32 {timings['fp32']:.1f} s, int8 {timings['int8']:.1f} s "
+          f"(x{timings['fp32'] / timings['int8']:.1f}). Informe guardado en {report_path}.")
+    return summary
+
+
+# Main
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backend ONNX int8 de BERTScore.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    export_parser = subparsers.add_parser("exportar", help="Exportar y cuantizar el modelo")
+    export_parser.add_argument("--dir", default=ONNX_DIR)
+    validate_parser = subparsers.add_parser("validar", help="Comparar int8 con fp32 sobre resultados de los bucles")
+    validate_parser.add_argument("source")
+    validate_parser.add_argument("--tabla", default=None)
+    validate_parser.add_argument("--textos", type=int, default=20)
+    validate_parser.add_argument("--informe", default="validacion_bertscore_onnx.xlsx")
+    validate_parser.add_argument("--dir", default=ONNX_DIR)
+    args = parser.parse_args()
+
+    if args.command == "exportar":
+        export_onnx_model(args.dir)
+    elif args.command == "validar":
+        validate(args.source, args.tabla, args.textos, args.informe, args.dir)
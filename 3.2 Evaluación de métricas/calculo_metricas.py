@@ -4,29 +4,138 @@
 #            3.2 EVALUACIÓN DE MÉTRICAS
 #  Autor: Javier González Pérez
 #  Fecha: 03/05/2025
-#  Descripción: Este script calcula métricas automáticas (ROUGE-1, BERTScore) entre textos originales, resúmenes y textos expandidos
+#  Descripción: Este script calcula métricas automáticas (ROUGE-1, ROUGE-2, ROUGE-L, ROUGE-Lsum, BERTScore) entre textos originales, resúmenes y textos expandidos
 #               leídos desde un archivo Excel, y guarda los resultados en otro archivo Excel, permitiendo el análisis comparativo de las salidas generadas.
 #
+#               El cálculo es incremental por celdas (manifiesto_metricas.py): al relanzar solo se calculan las comparaciones
+#               que faltan, y los resultados se escriben por bloques de textos.
+#
 #  Notas: La parte de tfidf en este proyecto fue descartada en este proyecto, pero se ha dejado el código para su posible uso futuro.
+#         Por defecto se calcula con un vocabulario e IDF comunes a todo el corpus (TFIDF_MODE = "corpus").
 # ==========================================================
 
+import numpy as np
 import pandas as pd
-from rouge_score import rouge_scorer
-import bert_score
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
+from scipy.sparse import vstack
 import os
+import sys
+from functools import partial
+
+# El almacén de resultados está en la carpeta 3.1 (los motores de ROUGE y BERTScore, en esta misma carpeta). torch y
+# transformers solo se importan al crear el motor de BERTScore: sin él (solo ROUGE o con el servicio de métricas) no
+# hace falta cargarlos
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..",
+                             "3.1 Desarrollo del sistema de evaluación basado en bucles de resumen y expansión"))
+from almacen_resultados import read_table, read_results, append_results, list_tables
+from rouge_motor import RougeEngine
+from ejecucion_paralela import run_sharded, create_pool
+from manifiesto_metricas import MetricManifest, MANIFEST_FILE, pending_cells, build_table, import_table
+from servicio_metricas import remote_score, service_stats
+
+# Procesos para las métricas. Las filas se reparten por id, así que todas las comparaciones de un texto (y su caché de
+# referencias) quedan en el mismo proceso
+METRIC_WORKERS = os.cpu_count() or 1  # ROUGE y TF-IDF por pares
+# BERTScore: cada proceso carga su propia copia del modelo (~1.4 GB con roberta-large) y en CPU torch ya reparte cada
+# pasada entre todos los núcleos, así que por defecto se calcula en este mismo proceso. Con más de uno, el número se
+# limita a la memoria disponible (BERT_WORKER_MEMORY por proceso); con GPU siempre es 1 (un único modelo en la GPU)
+BERT_WORKERS = 1
+BERT_WORKER_MEMORY = 3 * 1024 ** 3
+
+# Backend de BERTScore: "torch" (fp32, mismos resultados que bert_score) u "onnx-int8" (ONNX Runtime con cuantización
+# dinámica int8, para CPU; desviación frente a fp32 medida con `python bertscore_onnx.py validar`)
+BERT_BACKEND = "torch"
+
+# TF-IDF: "corpus" (vocabulario e IDF ajustados una vez sobre todos los textos) o "pares" (un vectorizador por par)
+TFIDF_MODE = "corpus"
+
+# Cálculo incremental por celdas (manifiesto_metricas.py): textos por bloque (tras cada bloque se escriben sus filas en
+# el almacén y el manifiesto) y versión de cada métrica. Cambiar la versión hace que se vuelvan a calcular sus celdas
+METRIC_CHUNK_IDS = 50
+# Textos de más de 512 tokens: ventanas solapadas con este número de tokens en común (None: truncar como bert_score)
+BERT_WINDOW_OVERLAP = 128
+
+# Servicio de métricas (servicio_metricas.py) con el modelo de BERTScore ya cargado, p. ej. 'http://127.0.0.1:8765'. Con
+# un servicio, BERTScore no carga el modelo en este proceso: los procesos de METRIC_WORKERS le envían sus pares y el
+# servicio los agrupa en microlotes. None: modelo propio
+METRICS_SERVICE_URL = None
+
+# Modelo de BERTScore y capa cuyos embeddings se usan (los de bert_score para inglés)
+BERT_MODEL = "roberta-large"
+BERT_LAYERS = 17
+
+BERT_MODEL_VERSION = (f"{BERT_MODEL}-L{BERT_LAYERS}" + ("" if BERT_BACKEND == "torch" else f"-{BERT_BACKEND}")
+                      + ("" if BERT_WINDOW_OVERLAP is None else f"-w{BERT_WINDOW_OVERLAP}"))
+METRIC_VERSIONS = {"ROUGE": "rouge1-1", "ROUGE2": "rouge2-1", "ROUGEL": "rougeL-1", "ROUGELsum": "rougeLsum-1",
+                   "BERT": f"{BERT_MODEL_VERSION}-1", "TFIDF": f"{TFIDF_MODE}-1"}
+
+# Variantes de ROUGE de la etapa de métricas (nombre de la métrica en el almacén → tipo de rouge_score). Se calculan
+# juntas a partir de la misma tokenización; en ROUGE-Lsum las frases se separan por saltos de línea
+ROUGE_METRICS = {"ROUGE": "rouge1", "ROUGE2": "rouge2", "ROUGEL": "rougeL", "ROUGELsum": "rougeLsum"}
+
+# Motor de ROUGE compartido: cada texto se tokeniza y se pasa por el stemmer una sola vez (mismos resultados que
+# rouge_scorer.RougeScorer(tipos, use_stemmer=True))
+rouge_engine = RougeEngine(list(ROUGE_METRICS.values()), use_stemmer=True)
+
+# Función para calcular Rouge-1 de muchos pares (referencia, hipótesis), agrupados por referencia
+def calculate_rouge_batch(references, hypotheses):
+    return rouge_engine.score_pairs(references, hypotheses, 'rouge1')
+
+# Función para calcular todas las variantes de ROUGE de muchos pares: [{métrica: {"precision", "recall", "f1"}}]
+def calculate_rouge_types_batch(references, hypotheses):
+    return [{metric: pair_scores[rouge_type] for metric, rouge_type in ROUGE_METRICS.items()}
+            for pair_scores in rouge_engine.score_pairs_by_type(references, hypotheses)]
 
 # Función para calcular las métricas con Rouge-1
 def calculate_rouge(reference, hypothesis):
-    scorer = rouge_scorer.RougeScorer(['rouge1'], use_stemmer=True)
-    scores = scorer.score(reference, hypothesis)
-    return {"precision": scores['rouge1'].precision, "recall": scores['rouge1'].recall, "f1": scores['rouge1'].fmeasure}
+    return calculate_rouge_batch([reference], [hypothesis])[0]
+
+# Modelo de BERTScore: se carga una sola vez por proceso y se reutiliza en todas las comparaciones. Los embeddings de
+# las referencias (texto y resumen originales) se guardan en caché y se reutilizan para todas sus hipótesis
+BERT_BATCH_SIZE = 64
+BERT_BATCH_TOKENS = 16384  # Tokens por pasada: los lotes se forman por longitud, con más filas si los textos son cortos
+BERT_CACHE_BYTES = 2 * 1024 ** 3  # Límite de la caché en memoria
+BERT_CACHE_DIR = None  # Directorio para conservar la caché entre ejecuciones (p. ej. 'cache_bertscore'); None: solo memoria
+_bert_engine = None
+
+def get_bert_engine():
+    global _bert_engine
+    if _bert_engine is None:
+        from bertscore_motor import BERTScoreEngine, EmbeddingCache
+        cache = EmbeddingCache(BERT_CACHE_BYTES, BERT_CACHE_DIR)
+        engine_class = BERTScoreEngine
+        if BERT_BACKEND == "onnx-int8":
+            # onnxruntime solo hace falta con este backend
+            from bertscore_onnx import ONNXBERTScoreEngine as engine_class
+        _bert_engine = engine_class(BERT_MODEL, BERT_LAYERS, batch_size=BERT_BATCH_SIZE, cache=cache,
+                                    batch_tokens=BERT_BATCH_TOKENS, window_overlap=BERT_WINDOW_OVERLAP)
+    return _bert_engine
+
+# Función para obtener el número de procesos de BERTScore: BERT_WORKERS, limitado por la memoria disponible
+def bert_worker_count():
+    if BERT_WORKERS <= 1:
+        return 1
+    import torch
+    if torch.cuda.is_available():
+        return 1
+    try:
+        available = os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (AttributeError, ValueError, OSError):
+        return BERT_WORKERS  # Sin sysconf (Windows) se respeta el valor configurado
+    workers = max(1, min(BERT_WORKERS, available // BERT_WORKER_MEMORY))
+    if workers < BERT_WORKERS:
+        print(f"BERTScore: {workers} procesos en lugar de {BERT_WORKERS} por la memoria disponible "
+              f"({available / 1024 ** 3:.1f} GB).")
+    return workers
+
+# Función para calcular BertScore de muchos pares (referencia, hipótesis) en lotes
+def calculate_bertscore_batch(references, hypotheses):
+    return get_bert_engine().score(references, hypotheses)
 
 # Función para calcular las métricas con BertScore
 def calculate_bertscore(reference, hypothesis):
-    P, R, F1 = bert_score.score([hypothesis], [reference], lang="en", verbose=True)
-    return {"precision": P.mean().item(), "recall": R.mean().item(), "f1": F1.mean().item()}
+    return calculate_bertscore_batch([reference], [hypothesis])[0]
 
 # Función para calcular la similitud de coseno usando TF-IDF
 def calculate_tfidf_similarity(reference, hypothesis):
@@ -51,7 +160,47 @@ def process_comparisons(df, reference_col, comparison_cols, metric_func):
         results.append(result)
     return pd.DataFrame(results)
 
-# Función para procesar las comparaciones de TF-IDF
+# Clase con el vocabulario e IDF de TF-IDF ajustados una sola vez sobre todo el corpus de textos. Las filas de la matriz
+# están normalizadas (L2), así que el coseno de cada par es el producto escalar de sus dos filas, y se calculan todos a
+# la vez con un producto fila a fila. Se llama como las demás funciones por lotes. El ajuste se hace la primera vez que
+# se usa, así que no cuesta nada si no hay celdas de TF-IDF pendientes
+class TfidfCorpusScorer:
+    def __init__(self, texts):
+        self.texts = texts
+        self.vectorizer = None
+
+    def fit(self):
+        if self.vectorizer is None:
+            corpus = pd.unique(pd.Series(list(self.texts), dtype=object).dropna().astype(str))
+            self.vectorizer = TfidfVectorizer()
+            self.matrix = self.vectorizer.fit_transform(corpus)
+            self.row_of = {text: row for row, text in enumerate(corpus)}
+            self.texts = None
+            print(f"TF-IDF: {len(corpus)} textos, vocabulario de {len(self.vectorizer.vocabulary_)} términos.")
+        return self
+
+    def _rows(self, texts):
+        # Los textos que no estaban al ajustar se vectorizan con el mismo vocabulario e IDF
+        missing = [text for text in dict.fromkeys(texts) if text not in self.row_of]
+        if missing:
+            self.matrix = vstack([self.matrix, self.vectorizer.transform(missing)]).tocsr()
+            self.row_of.update({text: len(self.row_of) + i for i, text in enumerate(missing)})
+        return [self.row_of[text] for text in texts]
+
+    def __call__(self, references, hypotheses):
+        if not references:
+            return []
+        self.fit()
+        reference_rows, hypothesis_rows = self._rows(references), self._rows(hypotheses)
+        similarities = np.asarray(self.matrix[reference_rows].multiply(self.matrix[hypothesis_rows]).sum(axis=1)).ravel()
+        return [{"tfidf_similarity": float(similarity)} for similarity in similarities]
+
+# Función para calcular la similitud TF-IDF de muchos pares, ajustando el vectorizador en cada par
+def calculate_tfidf_batch(references, hypotheses):
+    return [{"tfidf_similarity": calculate_tfidf_similarity(reference, hypothesis)}
+            for reference, hypothesis in zip(references, hypotheses)]
+
+# Función para procesar las comparaciones de TF-IDF (ajustando el vectorizador en cada par)
 def process_tfidf_comparisons(df, reference_col, comparison_cols):
     results = []
     for index, row in df.iterrows():
@@ -65,54 +214,116 @@ def process_tfidf_comparisons(df, reference_col, comparison_cols):
         results.append(result)
     return pd.DataFrame(results)
 
+# Función para devolver las puntuaciones de una métrica por lotes con el nombre de la métrica: [{métrica: valores}]
+def named_scores(metric, batch_metric_func, references, hypotheses):
+    return [{metric: scores} for scores in batch_metric_func(references, hypotheses)]
+
+# Función para puntuar celdas pendientes (filas de pending_cells) con una función por lotes que devuelve
+# [{métrica: valores}] (varias métricas calculadas juntas, como las variantes de ROUGE)
+def score_cells(cells, batch_metric_func):
+    scores = batch_metric_func(cells['reference'].tolist(), cells['hypothesis'].tolist()) if len(cells) else []
+    scored = cells[['id', 'reference_col', 'hypothesis_col']].copy()
+    scored['values'] = list(scores)
+    return scored
+
 def main():
-    # Leer el archivo Excel original
-    input_file = 'textos_gemini.xlsx'
-    output_file = 'textos_gemini_stats.xlsx'
-
-    # Leer el archivo original
-    df = pd.read_excel(input_file)
-
-    # Verificar si ya existe un archivo de salida
-    if os.path.exists(output_file):
-        # Leer el archivo existente
-        with pd.ExcelFile(output_file) as reader:
-            processed_ids = set()
-            for sheet_name in reader.sheet_names:
-                sheet_df = pd.read_excel(reader, sheet_name=sheet_name)
-                processed_ids.update(sheet_df['id'].unique())
-    else:
-        processed_ids = set()
+    # Entrada: almacén de resultados del bucle (o un archivo Excel con los textos)
+    input_file = 'resultados_bucle_resumen_expansion_gemini'
+    # Salida: almacén de métricas, con una tabla por hoja (exportable a Excel con almacen_resultados.py)
+    output_store = 'textos_gemini_stats'
 
-    # Filtrar las filas que ya se procesaron
-    df_to_process = df[~df['id'].isin(processed_ids)]
+    # Leer los textos originales y sus iteraciones
+    df = read_table(input_file)
+    df['id'] = df['id'].astype(str)
 
     # Definir las columnas de referencia y comparación
     original_text_cols = [col for col in df.columns if col.startswith('new_text_')]
     original_summary_cols = [col for col in df.columns if col.startswith('summary_')]
 
-    # Procesar comparaciones para ROUGE
-    rouge_results_a = process_comparisons(df_to_process, 'original_text', original_summary_cols, calculate_rouge)
-    rouge_results_b = process_comparisons(df_to_process, 'original_text', original_text_cols, calculate_rouge)
-    rouge_results_c = process_comparisons(df_to_process, 'original_summary', original_summary_cols, calculate_rouge)
-
-    # Procesar comparaciones para BERTScore
-    bert_results_a = process_comparisons(df_to_process, 'original_text', original_summary_cols, calculate_bertscore)
-    bert_results_b = process_comparisons(df_to_process, 'original_text', original_text_cols, calculate_bertscore)
-    bert_results_c = process_comparisons(df_to_process, 'original_summary', original_summary_cols, calculate_bertscore)
-
-    # Procesar comparaciones para TF-IDF
-    tfidf_results = process_tfidf_comparisons(df_to_process, 'original_text', original_summary_cols + original_text_cols)
-
-    # Guardar los resultados en el archivo Excel de salida
-    with pd.ExcelWriter(output_file, mode='a' if os.path.exists(output_file) else 'w') as writer:
-        rouge_results_a.to_excel(writer, sheet_name='orig_txt-summ_ROUGE_temp1.0', index=False)
-        rouge_results_b.to_excel(writer, sheet_name='orig_txt-txts_ROUGE_temp1.0', index=False)
-        rouge_results_c.to_excel(writer, sheet_name='orig_sum-summ_ROUGE_temp1.0', index=False)
-        bert_results_a.to_excel(writer, sheet_name='orig_txt-summ_BERT_temp1.0', index=False)
-        bert_results_b.to_excel(writer, sheet_name='orig_txt-txts_BERT_temp1.0', index=False)
-        bert_results_c.to_excel(writer, sheet_name='orig_sum-summ_BERT_temp1.0', index=False)
-        tfidf_results.to_excel(writer, sheet_name='orig_txt-summ_TFIDF_temp1.0', index=False)
+    # Familias de comparaciones (prefijo de la tabla, columna de referencia, columnas a comparar): texto original vs
+    # resúmenes, texto original vs textos y resumen original vs resúmenes
+    families = [('orig_txt-summ', 'original_text', original_summary_cols),
+                ('orig_txt-txts', 'original_text', original_text_cols),
+                ('orig_sum-summ', 'original_summary', original_summary_cols)]
+
+    # BERTScore: bert_worker_count() procesos con el modelo cargado (por defecto, este mismo); con el servicio de
+    # métricas, METRIC_WORKERS procesos sin modelo que le envían sus pares
+    if METRICS_SERVICE_URL:
+        service_version = service_stats(METRICS_SERVICE_URL)["versions"].get("BERT")
+        if service_version != METRIC_VERSIONS["BERT"]:
+            raise ValueError(f"El servicio de métricas calcula BERTScore con la versión {service_version} y esta etapa "
+                             f"espera {METRIC_VERSIONS['BERT']}: revisar su configuración.")
+        bert_func, bert_workers = partial(remote_score, METRICS_SERVICE_URL, "bertscore"), METRIC_WORKERS
+    else:
+        bert_func, bert_workers = calculate_bertscore_batch, bert_worker_count()
+    # TF-IDF: con vocabulario e IDF del corpus completo (leído del almacén) o por pares
+    if TFIDF_MODE == "corpus":
+        tfidf_func, tfidf_workers = TfidfCorpusScorer(
+            pd.concat([df[col] for col in ['original_text'] + original_summary_cols + original_text_cols])), 1
+    else:
+        tfidf_func, tfidf_workers = calculate_tfidf_batch, METRIC_WORKERS
+
+    # Grupos de métricas que se calculan juntas: función por lotes ([{métrica: valores}]), procesos y tablas del
+    # almacén (tabla, métrica, columna de referencia, columnas a comparar)
+    metric_groups = {
+        "ROUGE": (calculate_rouge_types_batch, METRIC_WORKERS,
+                  [(f"{prefix}_{metric}_temp1.0", metric, reference_col, comparison_cols)
+                   for metric in ROUGE_METRICS for prefix, reference_col, comparison_cols in families]),
+        "BERT": (partial(named_scores, "BERT", bert_func), bert_workers,
+                 [(f"{prefix}_BERT_temp1.0", "BERT", reference_col, comparison_cols)
+                  for prefix, reference_col, comparison_cols in families]),
+        "TFIDF": (partial(named_scores, "TFIDF", tfidf_func), tfidf_workers,
+                  [('orig_txt-summ_TFIDF_temp1.0', "TFIDF", 'original_text', original_summary_cols + original_text_cols)]),
+    }
+
+    # Manifiesto de celdas calculadas. Un almacén creado antes del manifiesto se importa una vez desde sus tablas
+    manifest = MetricManifest(os.path.join(output_store, MANIFEST_FILE))
+    if not len(manifest):
+        existing_tables = set(list_tables(output_store))
+        for _, _, tables in metric_groups.values():
+            for table, metric, reference_col, comparison_cols in tables:
+                if table in existing_tables:
+                    imported = import_table(manifest, read_results(output_store, table, include_texts=False),
+                                            reference_col, comparison_cols, metric, METRIC_VERSIONS[metric])
+                    print(f"Tabla '{table}': {imported} celdas importadas al manifiesto.")
+
+    # Pools de procesos: se crean la primera vez que un grupo los necesita y se reutilizan en todos los bloques y
+    # grupos. ROUGE, TF-IDF por pares y los clientes del servicio comparten uno sin modelo; BERTScore en varios
+    # procesos tiene el suyo, en el que cada proceso carga el modelo (y crea su caché) una sola vez al arrancar
+    pools = {}
+    try:
+        for group, (batch_metric_func, workers, tables) in metric_groups.items():
+            versions = {metric: METRIC_VERSIONS[metric] for _, metric, _, _ in tables}
+            group_families = list(dict.fromkeys((reference_col, tuple(comparison_cols))
+                                                for _, _, reference_col, comparison_cols in tables))
+            cells = pending_cells(df, group_families, versions, manifest)
+            if cells.empty:
+                print(f"{group}: no hay celdas nuevas que calcular.")
+                continue
+            pending_ids = cells['id'].unique()
+            print(f"{group}: {len(cells)} celdas pendientes en {len(pending_ids)} textos.")
+
+            initializer = get_bert_engine if group == "BERT" and bert_func is calculate_bertscore_batch else None
+            if workers > 1 and (workers, initializer) not in pools:
+                pools[(workers, initializer)] = create_pool(workers, initializer=initializer)
+            pool = pools.get((workers, initializer))
+
+            # Por bloques de textos: puntuar las celdas pendientes, reescribir en el almacén las filas completas de
+            # esos textos (celdas anteriores y nuevas) y, por último, forzar el bloque al manifiesto. Si el proceso se
+            # interrumpe antes, al relanzar solo se repite ese bloque
+            for start in range(0, len(pending_ids), METRIC_CHUNK_IDS):
+                chunk_ids = pending_ids[start:start + METRIC_CHUNK_IDS]
+                scored = run_sharded(score_cells, cells[cells['id'].isin(chunk_ids)], batch_metric_func,
+                                     workers=workers, pool=pool)
+                manifest.add_scored(scored, versions)
+                for table, metric, reference_col, comparison_cols in tables:
+                    append_results(build_table(manifest, chunk_ids, reference_col, comparison_cols, metric,
+                                               versions[metric]), output_store, table)
+                manifest.flush()
+    finally:
+        for pool in pools.values():
+            pool.shutdown()
+    manifest.close()
 
 if __name__ == "__main__":
     main()
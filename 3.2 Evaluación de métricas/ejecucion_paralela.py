@@ -0,0 +1,118 @@
+# ==========================================================
+#  Proyecto: IMPLEMENTACIÓN DE UN SISTEMA DE EVALUACIÓN DE CAPACIDADES DE GRANDES MODELOS DE LENGUAJE A TRAVÉS DE BUCLES DE RESUMEN Y EXTENSIÓN DE TEXTOS
+#  Apartado: 3. DESARROLLO DEL SISTEMA EXPERIMENTAL
+#            3.2 EVALUACIÓN DE MÉTRICAS
+#  Autor: Javier González Pérez
+#  Fecha: 18/10/2026
+#  Descripción: Ejecución de las comparaciones de calculo_metricas.py repartida entre varios procesos. Las filas se
+#               reparten por un hash estable del id (cada texto va siempre al mismo fragmento), cada proceso calcula
+#               sus fragmentos con la misma función que la ejecución secuencial y los resultados se vuelven a unir en
+#               el orden original de las filas, así que la salida es idéntica a la de un solo proceso. Se usa sobre todo
+#               para ROUGE y TF-IDF; BERTScore se calcula por defecto en un solo proceso (cada proceso cargaría su propia
+#               copia del modelo) y, si se reparte, los hilos de torch de cada proceso se ajustan al número de núcleos
+#               entre el número de procesos, para no tener más hilos que núcleos. El pool (create_pool) se crea una vez
+#               por ejecución y se reutiliza en todos los bloques, así que cada proceso carga las librerías y el modelo
+#               una sola vez.
+# ==========================================================
+
+import multiprocessing
+import os
+import sys
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+THREAD_VARIABLES = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS")
+
+
+# Función para repartir las filas en fragmentos según el id (conserva el índice original de cada fila)
+def shard_by_id(df, num_shards):
+    shard_of = df['id'].map(lambda text_id: zlib.crc32(str(text_id).encode("utf-8")) % num_shards)
+    return [df[shard_of == shard] for shard in range(num_shards) if (shard_of == shard).any()]
+
+
+# Inicialización de cada proceso: la función de inicialización del llamador (p. ej. cargar el modelo de BERTScore) y
+# los hilos de torch, si el proceso lo ha cargado
+def _init_worker(threads, initializer=None, initargs=()):
+    if initializer is not None:
+        initializer(*initargs)
+    if "torch" in sys.modules:
+        sys.modules["torch"].set_num_threads(threads)
+
+
+def create_pool(workers, torch_threads=None, initializer=None, initargs=()):
+    """
+    Crea un pool de procesos para reutilizarlo en todas las llamadas a run_sharded de una ejecución, de modo que cada
+    proceso importa las librerías y ejecuta `initializer` (p. ej. carga el modelo y crea su caché) una sola vez.
+
+    Args:
+        workers (int): Número de procesos.
+        torch_threads (int): Hilos de torch por proceso; por defecto, núcleos disponibles / procesos.
+        initializer (callable): Función de nivel de módulo que se ejecuta al arrancar cada proceso.
+
+    Returns:
+        ProcessPoolExecutor: Pool ya arrancado (cerrarlo con shutdown()).
+    """
+    threads = torch_threads or max(1, (os.cpu_count() or 1) // workers)
+    # Los procesos heredan el entorno al arrancar: así las librerías numéricas ya se cargan con ese número de hilos
+    previous = {variable: os.environ.get(variable) for variable in THREAD_VARIABLES}
+    os.environ.update({variable: str(threads) for variable in THREAD_VARIABLES})
+    try:
+        # spawn: cada proceso arranca limpio, sin heredar el estado de los hilos de torch del proceso principal
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                                   initializer=_init_worker, initargs=(threads, initializer, initargs))
+        # Mientras no hay ningún proceso libre, cada tarea arranca uno nuevo: todos se crean ahora, con este entorno
+        started = [pool.submit(os.getpid) for _ in range(workers)]
+    finally:
+        for variable, value in previous.items():
+            if value is None:
+                os.environ.pop(variable, None)
+            else:
+                os.environ[variable] = value
+    for future in started:
+        future.result()
+    pool.workers = workers
+    print(f"Pool de {workers} procesos preparado ({threads} hilos de torch por proceso).")
+    return pool
+
+
+# Función para devolver el resultado de un fragmento al índice original de sus filas
+def _with_index(result, shard):
+    if isinstance(result, (list, tuple)):
+        return [_with_index(item, shard) for item in result]
+    return result.set_axis(shard.index)
+
+
+# Función para unir los resultados de los fragmentos en el orden original
+def _merge(results):
+    if isinstance(results[0], list):
+        return [_merge([result[i] for result in results]) for i in range(len(results[0]))]
+    return pd.concat(results).sort_index().reset_index(drop=True)
+
+
+def run_sharded(func, df, *args, workers=1, torch_threads=None, pool=None):
+    """
+    Ejecuta func(fragmento, *args) sobre fragmentos de `df` en un pool de procesos y une los resultados.
+
+    Args:
+        func (callable): Función de nivel de módulo (se envía a los procesos) que recibe un DataFrame y devuelve un
+                         DataFrame con una fila por fila de entrada (p. ej. score_cells), o una lista de ellos.
+        df (pd.DataFrame): Filas a procesar, con columna 'id'.
+        workers (int): Número de procesos; con 1 (y sin pool) se ejecuta directamente en este proceso.
+        torch_threads (int): Hilos de torch por proceso; por defecto, núcleos disponibles / procesos.
+        pool (ProcessPoolExecutor): Pool de create_pool que se reutiliza; sin él se crea uno solo para esta llamada.
+
+    Returns:
+        El resultado de func sobre todas las filas, en el orden de `df`.
+    """
+    if pool is None and (workers <= 1 or len(df) < 2):
+        return func(df, *args)
+    if pool is None:
+        with create_pool(workers, torch_threads) as pool:
+            return run_sharded(func, df, *args, pool=pool)
+    shards = shard_by_id(df, pool.workers)
+    futures = [pool.submit(func, shard, *args) for shard in shards]
+    results = [_with_index(future.result(), shard) for future, shard in zip(futures, shards)]
+    print(f"{len(df)} filas procesadas en {len(shards)} procesos.")
+    return _merge(results)
@@ -0,0 +1,153 @@
+# ==========================================================
+#  Proyecto: IMPLEMENTACIÓN DE UN SISTEMA DE EVALUACIÓN DE CAPACIDADES DE GRANDES MODELOS DE LENGUAJE A TRAVÉS DE BUCLES DE RESUMEN Y EXTENSIÓN DE TEXTOS
+#  Apartado: 3. DESARROLLO DEL SISTEMA EXPERIMENTAL
+#            3.2 EVALUACIÓN DE MÉTRICAS
+#  Autor: Javier González Pérez
+#  Fecha: 18/10/2026
+#  Descripción: Manifiesto de celdas de métricas ya calculadas para calculo_metricas.py. Cada celda es una comparación
+#               (id, columna de referencia, columna de hipótesis, métrica, versión de la métrica) y se guarda con sus
+#               valores en un JSONL dentro del almacén de métricas. Las celdas se añaden por bloques y cada bloque se
+#               fuerza a disco, así que al relanzar solo se calculan las celdas que faltan (nuevas iteraciones, nuevas
+#               familias de comparación o una nueva versión de una métrica) y una interrupción pierde como mucho el
+#               bloque en curso.
+# ==========================================================
+
+import json
+import os
+
+import pandas as pd
+
+MANIFEST_FILE = "manifiesto_metricas.jsonl"
+
+
+# Clase que mantiene el registro de celdas calculadas
+class MetricManifest:
+    def __init__(self, path):
+        self.path = path
+        self.cells = self._load(path)
+        self.pending = []
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.file = open(path, "a", encoding="utf-8")
+        if self.cells:
+            print(f"Manifiesto {path}: {len(self.cells)} celdas ya calculadas.")
+
+    @staticmethod
+    def _key(text_id, reference_col, hypothesis_col, metric, version):
+        return (str(text_id), reference_col, hypothesis_col, metric, str(version))
+
+    def _load(self, path):
+        cells = {}
+        if not os.path.exists(path):
+            return cells
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # Última línea cortada por una interrupción a mitad de escritura
+                    continue
+                key = self._key(entry["id"], entry["reference"], entry["hypothesis"], entry["metric"],
+                                entry["version"])
+                cells[key] = entry["values"]
+        return cells
+
+    def __len__(self):
+        return len(self.cells)
+
+    def get(self, text_id, reference_col, hypothesis_col, metric, version):
+        return self.cells.get(self._key(text_id, reference_col, hypothesis_col, metric, version))
+
+    def add(self, text_id, reference_col, hypothesis_col, metric, version, values):
+        # La celda queda disponible en memoria y se escribe en el manifiesto con el siguiente flush
+        values = {name: float(value) for name, value in values.items()}
+        self.cells[self._key(text_id, reference_col, hypothesis_col, metric, version)] = values
+        self.pending.append({"id": str(text_id), "reference": reference_col, "hypothesis": hypothesis_col,
+                             "metric": metric, "version": str(version), "values": values})
+
+    def add_scored(self, scored, versions):
+        """
+        Añade las celdas puntuadas por score_cells (columnas 'id', 'reference_col', 'hypothesis_col' y 'values', con
+        los valores de cada métrica: {métrica: valores}).
+
+        Args:
+            versions (dict): Versión de cada métrica.
+        """
+        for text_id, reference_col, hypothesis_col, values in scored[['id', 'reference_col', 'hypothesis_col',
+                                                                       'values']].itertuples(index=False):
+            for metric, metric_values in values.items():
+                self.add(text_id, reference_col, hypothesis_col, metric, versions[metric], metric_values)
+
+    def flush(self):
+        # Escribir el bloque de celdas pendientes y forzarlo a disco
+        if not self.pending:
+            return
+        self.file.write("".join(json.dumps(entry, ensure_ascii=False) + "\n" for entry in self.pending))
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.pending = []
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+
+def pending_cells(df, families, versions, manifest):
+    """
+    Devuelve las comparaciones de `df` a las que todavía les falta alguna de las métricas en el manifiesto.
+
+    Args:
+        df (pd.DataFrame): Textos con columna 'id' y las columnas de referencia y de hipótesis.
+        families (list): [(columna de referencia, columnas a comparar), ...].
+        versions (dict): Métricas que se calculan juntas y versión de cada una.
+
+    Returns:
+        pd.DataFrame: Una fila por celda pendiente, con 'id', 'reference_col', 'hypothesis_col', 'reference' e
+                      'hypothesis', agrupadas por id.
+    """
+    cells = []
+    for _, row in df.iterrows():
+        for reference_col, comparison_cols in families:
+            for col in comparison_cols:
+                if pd.notna(row[col]) and any(manifest.get(row['id'], reference_col, col, metric, version) is None
+                                              for metric, version in versions.items()):
+                    cells.append({'id': str(row['id']), 'reference_col': reference_col, 'hypothesis_col': col,
+                                  'reference': str(row[reference_col]), 'hypothesis': str(row[col])})
+    return pd.DataFrame(cells, columns=['id', 'reference_col', 'hypothesis_col', 'reference', 'hypothesis'])
+
+
+def build_table(manifest, ids, reference_col, comparison_cols, metric, version):
+    """
+    Construye las filas de una tabla de métricas (mismo formato que process_comparisons: 'id' y una columna
+    '<columna>-<valor>' por celda) a partir de las celdas del manifiesto.
+    """
+    results = []
+    for text_id in ids:
+        result = {"id": str(text_id)}
+        for col in comparison_cols:
+            values = manifest.get(text_id, reference_col, col, metric, version)
+            if values is not None:
+                result.update({f"{col}-{name}": value for name, value in values.items()})
+        results.append(result)
+    return pd.DataFrame(results)
+
+
+def import_table(manifest, table_df, reference_col, comparison_cols, metric, version):
+    """
+    Registra en el manifiesto las celdas de una tabla de métricas ya calculada (almacenes creados antes del
+    manifiesto), para no volver a calcularlas.
+
+    Returns:
+        int: Número de celdas importadas.
+    """
+    imported = 0
+    for col in comparison_cols:
+        value_cols = [name for name in table_df.columns if name.startswith(f"{col}-")]
+        if not value_cols:
+            continue
+        for _, row in table_df[['id'] + value_cols].dropna(subset=value_cols, how='all').iterrows():
+            if manifest.get(row['id'], reference_col, col, metric, version) is None:
+                manifest.add(row['id'], reference_col, col, metric, version,
+                             {name[len(col) + 1:]: row[name] for name in value_cols})
+                imported += 1
+    manifest.flush()
+    return imported
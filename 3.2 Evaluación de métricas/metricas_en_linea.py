@@ -0,0 +1,273 @@
+# ==========================================================
+#  Proyecto: IMPLEMENTACIÓN DE UN SISTEMA DE EVALUACIÓN DE CAPACIDADES DE GRANDES MODELOS DE LENGUAJE A TRAVÉS DE BUCLES DE RESUMEN Y EXTENSIÓN DE TEXTOS
+#  Apartado: 3. DESARROLLO DEL SISTEMA EXPERIMENTAL
+#            3.2 EVALUACIÓN DE MÉTRICAS
+#  Autor: Javier González Pérez
+#  Fecha: 18/10/2026
+#  Descripción: Métricas en línea mientras el bucle sigue generando. Lee el checkpoint JSONL de los scripts de bucle
+#               (checkpoint_bucle.py), en el que cada summary_i/new_text_i se escribe en cuanto llega, y un hilo en
+#               segundo plano puntúa los pasos nuevos con las mismas funciones por lotes de calculo_metricas.py (ROUGE y
+#               BERTScore). Publica agregados acumulados por iteración (media y desviación de cada métrica y familia de
+#               comparación) en un CSV que se reescribe tras cada lote, de modo que la curva de degradación se ve
+#               durante la ejecución y el cálculo se solapa con la generación, que está limitada por la red. Con
+#               --servicio, las métricas se piden a servicio_metricas.py y el modelo de BERTScore no se carga aquí.
+#
+#  Uso:  python metricas_en_linea.py checkpoint_gemini-1.5-flash.jsonl textos_gemini.xlsx [--salida agregados.csv]
+#                                    [--sin-bertscore] [--intervalo 2] [--pasos-esperados 200]
+#                                    [--servicio http://127.0.0.1:8765]
+# ==========================================================
+
+import argparse
+import json
+import math
+import os
+import sys
+import threading
+import time
+from functools import partial
+
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..",
+                             "3.1 Desarrollo del sistema de evaluación basado en bucles de resumen y expansión"))
+from almacen_resultados import read_table
+from corpus_local import LocalCorpus, is_corpus
+from calculo_metricas import ROUGE_METRICS, calculate_rouge_types_batch, calculate_bertscore_batch
+from servicio_metricas import remote_score
+
+# Familias de comparación de cada tipo de paso: (familia, columna de referencia), con los mismos prefijos que las tablas
+# de calculo_metricas.py
+STEP_FAMILIES = {"summary": [('orig_txt-summ', 'original_text'), ('orig_sum-summ', 'original_summary')],
+                 "new_text": [('orig_txt-txts', 'original_text')]}
+MAX_RETRY_WAIT = 60.0  # Espera máxima entre reintentos cuando falla el cálculo (p. ej. el servicio no responde)
+
+
+# Clase que lee las líneas nuevas de un JSONL que otro proceso sigue escribiendo
+class JsonlTail:
+    def __init__(self, path):
+        self.path = path
+        self.offset = 0
+        self.buffer = b""
+
+    def read_new(self):
+        """
+        Devuelve las entradas completas escritas desde la última lectura (una línea sin salto final todavía se está
+        escribiendo y se deja para la siguiente).
+        """
+        if not os.path.exists(self.path):
+            return []
+        if os.path.getsize(self.path) < self.offset:
+            # El fichero se ha vuelto a crear: se lee desde el principio
+            self.offset, self.buffer = 0, b""
+        with open(self.path, "rb") as f:
+            f.seek(self.offset)
+            data = f.read()
+        self.offset += len(data)
+        *lines, self.buffer = (self.buffer + data).split(b"\n")
+        entries = []
+        for line in lines:
+            try:
+                entries.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+        return entries
+
+
+# Clase de acceso a los textos originales por id (corpus local, Excel o almacén de resultados)
+class OriginalTexts:
+    def __init__(self, source):
+        self.corpus = LocalCorpus(source) if is_corpus(source) else None
+        self.texts = {}
+        if self.corpus is None:
+            df = read_table(source)
+            self.texts = {str(row['id']): {'original_text': row['original_text'],
+                                           'original_summary': row['original_summary']}
+                          for _, row in df.iterrows()}
+
+    def get(self, text_id):
+        if self.corpus is not None and str(text_id) not in self.texts:
+            self.texts[str(text_id)] = self.corpus.get(text_id, ['original_text', 'original_summary'])
+        return self.texts.get(str(text_id))
+
+
+# Clase del consumidor en línea: hilo que lee el checkpoint, puntúa los pasos nuevos y mantiene los agregados
+class OnlineMetrics:
+    def __init__(self, checkpoint_path, source, output_path=None, use_bertscore=True, poll_interval=2.0,
+                 service_url=None):
+        """
+        Args:
+            checkpoint_path (str): Checkpoint JSONL del script de bucle (checkpoint_<hoja>.jsonl).
+            source (str): Textos originales: el mismo Excel o corpus (.arrow) que lee el bucle, o su almacén.
+            output_path (str): CSV de agregados (por defecto, <checkpoint>.metricas.csv).
+            use_bertscore (bool): Calcular también BERTScore (sin servicio, carga el modelo en este proceso).
+            poll_interval (float): Segundos de espera cuando no hay pasos nuevos.
+            service_url (str): Servicio de métricas (servicio_metricas.py) al que pedir ROUGE y BERTScore; por
+                               defecto se calculan en este proceso.
+        """
+        self.tail = JsonlTail(checkpoint_path)
+        self.originals = OriginalTexts(source)
+        self.output_path = output_path or os.path.splitext(checkpoint_path)[0] + ".metricas.csv"
+        self.use_bertscore = use_bertscore
+        self.poll_interval = poll_interval
+        self.rouge_func = partial(remote_score, service_url, "rouge") if service_url else calculate_rouge_types_batch
+        self.bert_func = partial(remote_score, service_url, "bertscore") if service_url else calculate_bertscore_batch
+        self.seen = set()
+        self.scored_steps = 0
+        self.unknown_ids = set()
+        self.pending = None  # Pasos leídos del checkpoint que todavía no se han podido puntuar
+        self.error = None  # Último error del cálculo
+        # (métrica, familia, iteración, temperatura) → [n, Σprecision, Σrecall, Σf1, Σf1²]
+        self.aggregates = {}
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def _cells(self, entries):
+        # Pares (referencia, hipótesis) de los pasos nuevos, con su clave de agregado
+        steps, keys, references, hypotheses = 0, [], [], []
+        for entry in entries:
+            step = (str(entry["id"]), int(entry["iteration"]), entry["kind"], float(entry["temperature"]))
+            if step in self.seen or entry["kind"] not in STEP_FAMILIES:
+                continue
+            originals = self.originals.get(entry["id"])
+            if originals is None:
+                if str(entry["id"]) not in self.unknown_ids:
+                    self.unknown_ids.add(str(entry["id"]))
+                    print(f"Texto {entry['id']} no encontrado en los originales; se omite.")
+                continue
+            self.seen.add(step)
+            steps += 1
+            for family, reference_col in STEP_FAMILIES[entry["kind"]]:
+                if pd.notna(originals[reference_col]):
+                    keys.append((family, step[1], step[3]))
+                    references.append(str(originals[reference_col]))
+                    hypotheses.append(str(entry["text"]))
+        return steps, keys, references, hypotheses
+
+    def _accumulate(self, metric, keys, scores):
+        with self.lock:
+            for (family, iteration, temperature), values in zip(keys, scores):
+                totals = self.aggregates.setdefault((metric, family, iteration, temperature), [0, 0.0, 0.0, 0.0, 0.0])
+                totals[0] += 1
+                totals[1] += values["precision"]
+                totals[2] += values["recall"]
+                totals[3] += values["f1"]
+                totals[4] += values["f1"] ** 2
+
+    def process_new(self):
+        """
+        Puntúa los pasos escritos en el checkpoint desde la última llamada y publica los agregados.
+
+        Returns:
+            int: Número de pasos nuevos puntuados.
+        """
+        # Los pasos leídos se conservan hasta que se puntúan todas sus métricas: si el cálculo falla, la siguiente
+        # llamada vuelve a intentarlo con los mismos pasos sin haber acumulado ninguno
+        if self.pending is None:
+            self.pending = self._cells(self.tail.read_new())
+        steps, keys, references, hypotheses = self.pending
+        if not steps:
+            self.pending = None
+            return 0
+        if keys:
+            rouge_scores = self.rouge_func(references, hypotheses)
+            bert_scores = self.bert_func(references, hypotheses) if self.use_bertscore else None
+            for metric in ROUGE_METRICS:
+                self._accumulate(metric, keys, [scores[metric] for scores in rouge_scores])
+            if bert_scores is not None:
+                self._accumulate("BERT", keys, bert_scores)
+        self.pending = None
+        self.scored_steps += steps
+        self.publish()
+        return steps
+
+    def snapshot(self):
+        """
+        Devuelve los agregados actuales: una fila por métrica, familia, iteración y temperatura.
+        """
+        with self.lock:
+            rows = []
+            for (metric, family, iteration, temperature), (n, precision, recall, f1, f1_squared) in \
+                    self.aggregates.items():
+                mean = f1 / n
+                rows.append({'metric': metric, 'family': family, 'iteration': iteration, 'temperature': temperature,
+                             'n': n, 'precision_mean': precision / n, 'recall_mean': recall / n, 'f1_mean': mean,
+                             'f1_std': math.sqrt(max(f1_squared / n - mean ** 2, 0.0))})
+        columns = ['metric', 'family', 'iteration', 'temperature', 'n', 'precision_mean', 'recall_mean', 'f1_mean',
+                   'f1_std']
+        return pd.DataFrame(rows, columns=columns).sort_values(['metric', 'family', 'temperature', 'iteration'],
+                                                               ignore_index=True)
+
+    def publish(self):
+        # Reescribir el CSV de agregados de forma atómica (quien lo lea nunca ve un fichero a medias)
+        df = self.snapshot()
+        tmp_path = self.output_path + ".tmp"
+        df.to_csv(tmp_path, index=False)
+        os.replace(tmp_path, self.output_path)
+        curve = df[(df['metric'] == 'ROUGE') & (df['family'] == 'orig_txt-txts')]
+        summary = ", ".join(f"it{row.iteration}={row.f1_mean:.3f} (n={row.n})" for row in curve.itertuples())
+        print(f"Métricas en línea: {self.scored_steps} pasos puntuados. ROUGE-1 F1 original vs textos: {summary}")
+
+    def _process_safely(self):
+        # Un error no detiene el hilo: se registra y se devuelve None para reintentar más tarde
+        try:
+            return self.process_new()
+        except Exception as e:
+            self.error = e
+            print(f"Métricas en línea: error al puntuar {self.pending[0] if self.pending else 0} pasos "
+                  f"({type(e).__name__}: {e}).")
+            return None
+
+    def _run(self):
+        failures = 0
+        while not self.stop_event.is_set():
+            scored = self._process_safely()
+            if scored is None:
+                # Espera exponencial entre reintentos mientras el fallo persista
+                failures += 1
+                wait = min(self.poll_interval * 2 ** failures, MAX_RETRY_WAIT)
+                print(f"Se reintenta en {wait:.1f} s.")
+                self.stop_event.wait(wait)
+            else:
+                failures = 0
+                if not scored:
+                    self.stop_event.wait(self.poll_interval)
+        # Última pasada para no dejar sin puntuar lo que llegó justo antes de parar
+        self._process_safely()
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name="metricas-en-linea", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+        if self.pending is not None and self.pending[0]:
+            print(f"Aviso: {self.pending[0]} pasos quedan sin puntuar; los agregados no los incluyen.")
+
+
+# Main
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Métricas en línea sobre el checkpoint de un bucle en ejecución.")
+    parser.add_argument("checkpoint")
+    parser.add_argument("source", help="Excel, corpus (.arrow) o almacén con los textos originales")
+    parser.add_argument("--salida", default=None, help="CSV de agregados (por defecto, <checkpoint>.metricas.csv)")
+    parser.add_argument("--sin-bertscore", action="store_true", help="Calcular solo ROUGE")
+    parser.add_argument("--intervalo", type=float, default=2.0, help="Segundos entre lecturas del checkpoint")
+    parser.add_argument("--pasos-esperados", type=int, default=None,
+                        help="Terminar al puntuar este número de pasos (por defecto, hasta Ctrl+C)")
+    parser.add_argument("--servicio", default=None, help="URL del servicio de métricas (servicio_metricas.py)")
+    args = parser.parse_args()
+
+    online = OnlineMetrics(args.checkpoint, args.source, args.salida, not args.sin_bertscore, args.intervalo,
+                           args.servicio).start()
+    try:
+        while args.pasos_esperados is None or online.scored_steps < args.pasos_esperados:
+            time.sleep(args.intervalo)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        online.stop()
+    print(f"Agregados guardados en {online.output_path}.")
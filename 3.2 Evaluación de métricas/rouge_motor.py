@@ -0,0 +1,315 @@
+# ==========================================================
+#  Proyecto: IMPLEMENTACIÓN DE UN SISTEMA DE EVALUACIÓN DE CAPACIDADES DE GRANDES MODELOS DE LENGUAJE A TRAVÉS DE BUCLES DE RESUMEN Y EXTENSIÓN DE TEXTOS
+#  Apartado: 3. DESARROLLO DEL SISTEMA EXPERIMENTAL
+#            3.2 EVALUACIÓN DE MÉTRICAS
+#  Autor: Javier González Pérez
+#  Fecha: 18/10/2026
+#  Descripción: Motor de ROUGE que sustituye a crear un RougeScorer en cada comparación. Cada texto distinto se
+#               tokeniza y se pasa por el stemmer de Porter una sola vez (con una tabla de raíces memorizada), y de esa
+#               misma secuencia de tokens salen todas las variantes: ROUGE-N a partir de vectores dispersos de conteos
+#               de n-gramas (muchas hipótesis frente a una misma referencia en una sola pasada vectorizada) y ROUGE-L y
+#               ROUGE-Lsum con una LCS bit-paralela (algoritmo de Hyyrö, con la secuencia de la referencia empaquetada en
+#               los bits de un entero), que cuesta una operación sobre enteros por token en lugar de una celda de la
+#               tabla de programación dinámica por par de tokens. Los resultados son idénticos a los de rouge_score
+#               (misma tokenización, mismo stemmer, misma LCS elegida en ROUGE-Lsum y mismas fórmulas).
+#
+#  Uso:  python rouge_motor.py   (compara el tiempo con rouge_score; la paridad exacta, en test_rouge_motor.py)
+# ==========================================================
+
+import re
+from collections import Counter, OrderedDict
+
+import numpy as np
+from nltk.stem import porter
+
+# Mismos patrones que rouge_score.tokenize
+NON_ALPHANUM_RE = re.compile(r"[^a-z0-9]+")
+SPACES_RE = re.compile(r"\s+")
+VALID_TOKEN_RE = re.compile(r"^[a-z0-9]+$")
+
+LCS_TYPES = ("rougeL", "rougeLsum")
+
+
+# Función para calcular la F1 igual que rouge_score.scoring.fmeasure
+def fmeasure(precision, recall):
+    if precision + recall > 0:
+        return 2 * precision * recall / (precision + recall)
+    return 0.0
+
+
+# Función para empaquetar una secuencia en máscaras de bits: para cada token, un entero con un bit a 1 en cada posición
+# en la que aparece
+def bit_masks(tokens):
+    masks = {}
+    bit = 1
+    for token in tokens:
+        masks[token] = masks.get(token, 0) | bit
+        bit <<= 1
+    return masks
+
+
+# LCS bit-paralela (Hyyrö): `state` tiene un bit por posición de la secuencia empaquetada en `masks` y, tras procesar
+# los j primeros tokens de `tokens`, sus ceros en las i primeras posiciones son la LCS de ambos prefijos
+def lcs_states(masks, length, tokens):
+    full = (1 << length) - 1
+    state = full
+    states = [state]
+    for token in tokens:
+        mask = masks.get(token)
+        if mask:
+            matched = state & mask
+            state = ((state + matched) | (state - matched)) & full
+        states.append(state)
+    return states
+
+
+# Función para obtener la longitud de la LCS entre la secuencia empaquetada y `tokens`
+def lcs_length(masks, length, tokens):
+    return length - lcs_states(masks, length, tokens)[-1].bit_count()
+
+
+# Función para obtener las posiciones de `reference` de una LCS con `candidate`, la misma que elige rouge_score.lcs_ind
+# (recorrido hacia atrás de la tabla de programación dinámica, con la tabla leída de los estados bit-paralelos)
+def lcs_indices(reference, reference_masks, candidate):
+    states = lcs_states(reference_masks, len(reference), candidate)
+    if len(reference) - states[-1].bit_count() == 0:
+        return []
+
+    def table(i, j):
+        return i - (states[j] & ((1 << i) - 1)).bit_count()
+
+    i, j = len(reference), len(candidate)
+    indices = []
+    while i > 0 and j > 0:
+        if reference[i - 1] == candidate[j - 1]:
+            indices.append(i - 1)
+            i -= 1
+            j -= 1
+        elif table(i, j - 1) > table(i - 1, j):
+            j -= 1
+        else:
+            i -= 1
+    return indices[::-1]
+
+
+# Clase del motor de ROUGE con cachés de raíces, tokens y conteos de n-gramas
+class RougeEngine:
+    def __init__(self, rouge_types=('rouge1',), use_stemmer=True, max_cached_texts=50_000):
+        """
+        Args:
+            rouge_types (tuple): Tipos de ROUGE ('rouge1', 'rouge2', ..., 'rougeL', 'rougeLsum'). En 'rougeLsum' las
+                                 frases se separan por saltos de línea (como RougeScorer con split_summaries=False).
+            use_stemmer (bool): Aplicar el stemmer de Porter (como RougeScorer(use_stemmer=True)).
+            max_cached_texts (int): Textos tokenizados que se conservan en caché (se expulsan los menos usados).
+        """
+        self.orders = {}
+        for rouge_type in rouge_types:
+            if rouge_type in LCS_TYPES:
+                continue
+            match = re.fullmatch(r"rouge(\d+)", rouge_type)
+            if not match or int(match.group(1)) < 1:
+                raise ValueError(f"Tipo de ROUGE no válido: {rouge_type}")
+            self.orders[rouge_type] = int(match.group(1))
+        self.rouge_types = tuple(rouge_types)
+        self.stemmer = porter.PorterStemmer() if use_stemmer else None
+        self.stems = {}  # palabra → raíz
+        self.token_ids = {}  # token → identificador
+        self.ngram_ids = {}  # n-grama (tupla de identificadores de token) → identificador
+        self.max_cached_texts = max_cached_texts
+        self.texts = OrderedDict()  # texto → {"tokens", "lines", "ngrams": {n: (ids ordenados, conteos)}}
+
+    def tokenize(self, text):
+        # Igual que rouge_score.tokenize.tokenize, pero cada palabra se pasa por el stemmer una sola vez
+        tokens = SPACES_RE.split(NON_ALPHANUM_RE.sub(" ", text.lower()))
+        if self.stemmer is not None:
+            stemmed = []
+            for token in tokens:
+                if len(token) > 3:
+                    stem = self.stems.get(token)
+                    if stem is None:
+                        stem = self.stems[token] = self.stemmer.stem(token)
+                    token = stem
+                stemmed.append(token)
+            tokens = stemmed
+        return [token for token in tokens if VALID_TOKEN_RE.match(token)]
+
+    def _counts(self, tokens, n):
+        # Vector disperso de conteos: identificadores de n-grama ordenados y su número de apariciones
+        if len(tokens) < n:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        ids = np.fromiter((self.ngram_ids.setdefault(tuple(tokens[i:i + n]), len(self.ngram_ids))
+                           for i in range(len(tokens) - n + 1)), dtype=np.int64, count=len(tokens) - n + 1)
+        return np.unique(ids, return_counts=True)
+
+    def vectors(self, text):
+        """
+        Devuelve la secuencia de tokens del texto (como identificadores), la de cada línea no vacía (para ROUGE-Lsum) y
+        los vectores de conteos de cada orden de n-grama, con caché por texto. Los tokens del texto completo son los de
+        sus líneas uno tras otro (un salto de línea nunca forma parte de un token), así que se tokeniza una sola vez.
+        """
+        entry = self.texts.get(text)
+        if entry is not None:
+            self.texts.move_to_end(text)
+            return entry
+        lines = [[self.token_ids.setdefault(token, len(self.token_ids)) for token in self.tokenize(line)]
+                 for line in text.split("\n") if len(line)]
+        tokens = [token for line in lines for token in line]
+        entry = {"tokens": tokens, "lines": lines,
+                 "ngrams": {n: self._counts(tokens, n) for n in set(self.orders.values())}}
+        self.texts[text] = entry
+        if len(self.texts) > self.max_cached_texts:
+            self.texts.popitem(last=False)
+        return entry
+
+    def _score_ngrams(self, reference_vectors, hypothesis_vectors, n):
+        # Todas las hipótesis a la vez: (intersección, total de la hipótesis) por hipótesis y total de la referencia
+        reference_ids, reference_counts = reference_vectors["ngrams"][n]
+        lengths = np.array([len(vectors["ngrams"][n][0]) for vectors in hypothesis_vectors])
+        all_ids = np.concatenate([vectors["ngrams"][n][0] for vectors in hypothesis_vectors] + [np.empty(0, np.int64)])
+        all_counts = np.concatenate([vectors["ngrams"][n][1] for vectors in hypothesis_vectors] + [np.empty(0, np.int64)])
+
+        # Conteo en la referencia de cada n-grama de las hipótesis (0 si no aparece) y mínimo de ambos
+        if len(reference_ids):
+            positions = np.minimum(np.searchsorted(reference_ids, all_ids), len(reference_ids) - 1)
+            reference_at = np.where(reference_ids[positions] == all_ids, reference_counts[positions], 0)
+        else:
+            reference_at = np.zeros(len(all_ids), dtype=np.int64)
+        overlap = np.minimum(all_counts, reference_at)
+
+        # Suma por hipótesis (cada hipótesis es un segmento consecutivo del vector concatenado)
+        segments = np.repeat(np.arange(len(hypothesis_vectors)), lengths)
+        intersections = np.bincount(segments, weights=overlap, minlength=len(hypothesis_vectors)).astype(np.int64)
+        prediction_totals = np.bincount(segments, weights=all_counts, minlength=len(hypothesis_vectors)).astype(np.int64)
+        target_total = max(int(reference_counts.sum()), 1)
+        scores = []
+        for intersection, prediction_total in zip(intersections.tolist(), prediction_totals.tolist()):
+            precision = intersection / max(prediction_total, 1)
+            recall = intersection / target_total
+            scores.append((precision, recall, fmeasure(precision, recall)))
+        return scores
+
+    @staticmethod
+    def _score_lcs(reference, reference_masks, hypothesis):
+        # ROUGE-L (rouge_score._score_lcs)
+        if not reference or not hypothesis:
+            return 0.0, 0.0, 0.0
+        lcs = lcs_length(reference_masks, len(reference), hypothesis)
+        precision = lcs / len(hypothesis)
+        recall = lcs / len(reference)
+        return precision, recall, fmeasure(precision, recall)
+
+    @staticmethod
+    def _score_summary_lcs(reference_lines, reference_line_masks, hypothesis_lines):
+        # ROUGE-Lsum (rouge_score._summary_level_lcs): unión de las LCS de cada frase de la referencia con todas las de
+        # la hipótesis, sin contar un token más veces de las que aparece en cada texto
+        if not reference_lines or not hypothesis_lines:
+            return 0.0, 0.0, 0.0
+        reference_total = sum(map(len, reference_lines))
+        hypothesis_total = sum(map(len, hypothesis_lines))
+        if not reference_total or not hypothesis_total:
+            return 0.0, 0.0, 0.0
+        reference_counts = Counter(token for line in reference_lines for token in line)
+        hypothesis_counts = Counter(token for line in hypothesis_lines for token in line)
+        hits = 0
+        for line, masks in zip(reference_lines, reference_line_masks):
+            union = set()
+            for hypothesis_line in hypothesis_lines:
+                union.update(lcs_indices(line, masks, hypothesis_line))
+            for token in (line[i] for i in sorted(union)):
+                if hypothesis_counts[token] > 0 and reference_counts[token] > 0:
+                    hits += 1
+                    hypothesis_counts[token] -= 1
+                    reference_counts[token] -= 1
+        precision = hits / hypothesis_total
+        recall = hits / reference_total
+        return precision, recall, fmeasure(precision, recall)
+
+    def score_many(self, reference, hypotheses, rouge_types=None):
+        """
+        Puntúa varias hipótesis frente a una misma referencia.
+
+        Args:
+            rouge_types (tuple): Tipos a calcular (por defecto, todos los del motor).
+
+        Returns:
+            list: Para cada hipótesis, {tipo de ROUGE: (precision, recall, fmeasure)}.
+        """
+        rouge_types = rouge_types or self.rouge_types
+        reference_vectors = self.vectors(reference)
+        hypothesis_vectors = [self.vectors(hypothesis) for hypothesis in hypotheses]
+        results = [{} for _ in hypotheses]
+        for rouge_type in rouge_types:
+            if rouge_type == "rougeL":
+                # La referencia se empaqueta una vez para todas sus hipótesis
+                reference_tokens = reference_vectors["tokens"]
+                masks = bit_masks(reference_tokens)
+                scores = [self._score_lcs(reference_tokens, masks, vectors["tokens"]) for vectors in hypothesis_vectors]
+            elif rouge_type == "rougeLsum":
+                reference_lines = reference_vectors["lines"]
+                line_masks = [bit_masks(line) for line in reference_lines]
+                scores = [self._score_summary_lcs(reference_lines, line_masks, vectors["lines"])
+                          for vectors in hypothesis_vectors]
+            else:
+                scores = self._score_ngrams(reference_vectors, hypothesis_vectors, self.orders[rouge_type])
+            for result, score in zip(results, scores):
+                result[rouge_type] = score
+        return results
+
+    def score_pairs_by_type(self, references, hypotheses, rouge_types=None):
+        """
+        Puntúa pares (referencia, hipótesis) agrupándolos por referencia, con todos los tipos pedidos a partir de la
+        misma tokenización.
+
+        Returns:
+            list: [{tipo de ROUGE: {"precision", "recall", "f1"}}] en el orden de los pares.
+        """
+        rouge_types = tuple(rouge_types or self.rouge_types)
+        pairs_by_reference = {}
+        for index, reference in enumerate(references):
+            pairs_by_reference.setdefault(reference, []).append(index)
+        results = [None] * len(references)
+        for reference, indices in pairs_by_reference.items():
+            for index, scores in zip(indices, self.score_many(reference, [hypotheses[i] for i in indices], rouge_types)):
+                results[index] = {rouge_type: {"precision": precision, "recall": recall, "f1": f1}
+                                  for rouge_type, (precision, recall, f1) in scores.items()}
+        return results
+
+    def score_pairs(self, references, hypotheses, rouge_type=None):
+        """
+        Puntúa pares (referencia, hipótesis) con un solo tipo, con el formato de las funciones por lotes de
+        calculo_metricas.py.
+
+        Returns:
+            list: [{"precision", "recall", "f1"}] del tipo `rouge_type` (por defecto el primero) en el orden de los pares.
+        """
+        rouge_type = rouge_type or self.rouge_types[0]
+        return [scores[rouge_type] for scores in self.score_pairs_by_type(references, hypotheses, [rouge_type])]
+
+
+# Main: tiempo del motor frente a rouge_score (la paridad exacta se comprueba en test_rouge_motor.py)
+if __name__ == "__main__":
+    import random
+    import time
+    from rouge_score import rouge_scorer
+
+    random.seed(0)
+    # Textos del tamaño de los del bucle: un original de ~700 palabras frente a 20 expansiones
+    words = ["the", "running", "runs", "ran", "caresses", "ponies", "relational", "conditional", "it's", "U.S.",
+             "2024", "Dr.", "résumé", "naïve", "e-mail", "a", "an", "of", "generously", "hopping"]
+    words += [f"word{i}" for i in range(400)]
+
+    def sentence():
+        return " ".join(random.choice(words) for _ in range(25)) + "."
+
+    reference = "\n".join(sentence() for _ in range(28))
+    hypotheses = ["\n".join(sentence() for _ in range(28)) for _ in range(20)]
+    for rouge_type in ['rouge1', 'rougeL', 'rougeLsum']:
+        start = time.perf_counter()
+        RougeEngine([rouge_type]).score_pairs([reference] * len(hypotheses), hypotheses)
+        engine_time = time.perf_counter() - start
+        start = time.perf_counter()
+        single_scorer = rouge_scorer.RougeScorer([rouge_type], use_stemmer=True)
+        for hypothesis in hypotheses:
+            single_scorer.score(reference, hypothesis)
+        print(f"{rouge_type}: motor {engine_time:.3f} s, rouge_score {time.perf_counter() - start:.3f} s "
+              f"({len(hypotheses)} pares de ~700 palabras).")
@@ -0,0 +1,303 @@
+# ==========================================================
+#  Proyecto: IMPLEMENTACIÓN DE UN SISTEMA DE EVALUACIÓN DE CAPACIDADES DE GRANDES MODELOS DE LENGUAJE A TRAVÉS DE BUCLES DE RESUMEN Y EXTENSIÓN DE TEXTOS
+#  Apartado: 3. DESARROLLO DEL SISTEMA EXPERIMENTAL
+#            3.2 EVALUACIÓN DE MÉTRICAS
+#  Autor: Javier González Pérez
+#  Fecha: 18/10/2026
+#  Descripción: Servicio local de métricas de larga duración. Carga una vez las funciones por lotes de calculo_metricas.py
+#               (el modelo de BERTScore queda en memoria con su caché de referencias) y atiende peticiones HTTP en
+#               localhost: POST /rouge, /bertscore y /tfidf con {"references": [...], "hypotheses": [...]}. Las
+#               peticiones concurrentes de cada métrica se agrupan en microlotes (hasta un número de pares o hasta un
+#               tiempo máximo de espera desde la primera), así que varios clientes pequeños comparten las pasadas del
+#               modelo. GET /stats devuelve los contadores de latencia y rendimiento. La etapa de métricas
+#               (METRICS_SERVICE_URL en calculo_metricas.py), las métricas en línea (--servicio) y los scripts de
+#               análisis usan así un único modelo ya cargado; el cliente (remote_score) solo necesita la biblioteca
+#               estándar.
+#
+#  Uso:  python servicio_metricas.py --puerto 8765 [--espera-maxima 0.02] [--lote-maximo 256] [--tfidf-corpus almacén]
+#        (cliente: remote_score("http://127.0.0.1:8765", "bertscore", referencias, hipótesis))
+# ==========================================================
+
+import argparse
+import json
+import queue
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SERVICE_URL = "http://127.0.0.1:8765"
+LATENCY_WINDOW = 10000  # Peticiones recientes con las que se calculan los percentiles de latencia
+
+
+# Clase de una petición en cola: sus pares y el resultado que espera el hilo HTTP
+class PendingRequest:
+    def __init__(self, references, hypotheses):
+        self.references = references
+        self.hypotheses = hypotheses
+        self.arrival = time.perf_counter()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+# Clase que agrupa las peticiones concurrentes de una métrica en microlotes y los puntúa en un hilo propio
+class MicroBatcher:
+    def __init__(self, name, batch_metric_func, max_batch=256, max_wait=0.02):
+        """
+        Args:
+            name (str): Nombre de la métrica (para los contadores).
+            batch_metric_func (callable): Función por lotes (referencias, hipótesis) → [puntuaciones].
+            max_batch (int): Pares a partir de los cuales el microlote se puntúa sin esperar más peticiones.
+            max_wait (float): Segundos máximos que espera la primera petición de un microlote a que lleguen otras.
+        """
+        self.name = name
+        self.batch_metric_func = batch_metric_func
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.counters = {"requests": 0, "pairs": 0, "batches": 0, "errors": 0, "busy_seconds": 0.0}
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.waits = deque(maxlen=LATENCY_WINDOW)
+        self.thread = threading.Thread(target=self._run, name=f"microlotes-{name}", daemon=True)
+        self.thread.start()
+
+    def submit(self, references, hypotheses):
+        """
+        Encola los pares y espera a que se puntúe el microlote en el que entran.
+
+        Returns:
+            list: Puntuaciones de los pares, en el mismo orden.
+        """
+        request = PendingRequest(references, hypotheses)
+        self.queue.put(request)
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.result
+
+    def _collect(self):
+        # La primera petición abre el microlote; se añaden las que llegan hasta el plazo o hasta llenar el lote
+        batch = [self.queue.get()]
+        pairs = len(batch[0].references)
+        deadline = batch[0].arrival + self.max_wait
+        while pairs < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                request = self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait()
+            except queue.Empty:
+                break
+            batch.append(request)
+            pairs += len(request.references)
+        return batch
+
+    def _score_alone(self, request):
+        try:
+            request.result = list(self.batch_metric_func(request.references, request.hypotheses))
+        except Exception as e:
+            request.error = e
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            references = [reference for request in batch for reference in request.references]
+            hypotheses = [hypothesis for request in batch for hypothesis in request.hypotheses]
+            start = time.perf_counter()
+            try:
+                scores = self.batch_metric_func(references, hypotheses)
+                offset = 0
+                for request in batch:
+                    request.result = list(scores[offset:offset + len(request.references)])
+                    offset += len(request.references)
+            except Exception as e:
+                # Si falla el microlote, cada petición se puntúa por separado para que el error llegue solo a la
+                # que lo provoca y no a las que compartían lote con ella
+                if len(batch) == 1:
+                    batch[0].error = e
+                else:
+                    for request in batch:
+                        self._score_alone(request)
+            end = time.perf_counter()
+            errors = sum(request.error is not None for request in batch)
+
+            with self.lock:
+                self.counters["requests"] += len(batch)
+                self.counters["pairs"] += len(references)
+                self.counters["batches"] += 1
+                self.counters["errors"] += errors
+                self.counters["busy_seconds"] += end - start
+                self.latencies.extend(end - request.arrival for request in batch)
+                self.waits.extend(start - request.arrival for request in batch)
+            for request in batch:
+                request.done.set()
+
+    def stats(self, uptime):
+        with self.lock:
+            counters = dict(self.counters)
+            latencies, waits = sorted(self.latencies), sorted(self.waits)
+
+        def percentile(values, q):
+            return values[min(int(q * len(values)), len(values) - 1)] if values else None
+
+        counters.update({
+            "mean_batch_pairs": counters["pairs"] / counters["batches"] if counters["batches"] else None,
+            "latency_p50": percentile(latencies, 0.50),
+            "latency_p95": percentile(latencies, 0.95),
+            "latency_max": latencies[-1] if latencies else None,
+            "queue_wait_p50": percentile(waits, 0.50),
+            "queue_wait_p95": percentile(waits, 0.95),
+            "pairs_per_second": counters["pairs"] / uptime if uptime else None,
+            "pairs_per_busy_second": counters["pairs"] / counters["busy_seconds"] if counters["busy_seconds"] else None,
+            "utilization": counters["busy_seconds"] / uptime if uptime else None,
+        })
+        return counters
+
+
+# Función para crear las funciones por lotes del servicio (importa calculo_metricas: torch, sklearn y el modelo)
+def load_metric_functions(tfidf_source=None):
+    """
+    Args:
+        tfidf_source (str): Almacén o Excel de resultados de los bucles con el que ajustar el vocabulario e IDF de
+                            TF-IDF (como TFIDF_MODE = "corpus"); por defecto, un vectorizador por par.
+
+    Returns:
+        tuple: ({métrica: función por lotes}, versiones de las métricas).
+    """
+    import pandas as pd
+    from calculo_metricas import (METRIC_VERSIONS, TfidfCorpusScorer, calculate_rouge_types_batch,
+                                  calculate_tfidf_batch, get_bert_engine, read_table)
+
+    tfidf_func, versions = calculate_tfidf_batch, dict(METRIC_VERSIONS, TFIDF="pares-1")
+    if tfidf_source is not None:
+        df = read_table(tfidf_source)
+        columns = ['original_text'] + [col for col in df.columns if col.startswith(('summary_', 'new_text_'))]
+        tfidf_func, versions["TFIDF"] = TfidfCorpusScorer(pd.concat([df[col] for col in columns])).fit(), "corpus-1"
+    engine = get_bert_engine()
+    return {"rouge": calculate_rouge_types_batch, "bertscore": engine.score, "tfidf": tfidf_func}, versions
+
+
+# Manejador HTTP del servicio
+class MetricsHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass  # Sin una línea de log por petición
+
+    def _send(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/stats":
+            uptime = time.perf_counter() - self.server.started
+            self._send(200, {"uptime": uptime, "versions": self.server.versions,
+                             "metrics": {name: batcher.stats(uptime) for name, batcher in self.server.batchers.items()}})
+        else:
+            self._send(404, {"error": {"message": f"Ruta desconocida: {self.path}"}})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            request = json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError:
+            self._send(400, {"error": {"message": "JSON no válido"}})
+            return
+        batcher = self.server.batchers.get(self.path.strip("/"))
+        if batcher is None:
+            self._send(404, {"error": {"message": f"Ruta desconocida: {self.path}"}})
+            return
+        references, hypotheses = request.get("references"), request.get("hypotheses")
+        if not isinstance(references, list) or not isinstance(hypotheses, list) or len(references) != len(hypotheses):
+            self._send(400, {"error": {"message": "Se esperan dos listas 'references' e 'hypotheses' de igual longitud"}})
+            return
+        if not references:
+            self._send(200, {"scores": []})
+            return
+        try:
+            scores = batcher.submit([str(text) for text in references], [str(text) for text in hypotheses])
+        except Exception as e:
+            self._send(500, {"error": {"message": f"{type(e).__name__}: {e}"}})
+            return
+        self._send(200, {"scores": scores})
+
+
+# Función para crear el servidor HTTP con un microlote por métrica
+def create_service(host, port, metric_functions, versions=None, max_batch=256, max_wait=0.02):
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    server.batchers = {name: MicroBatcher(name, func, max_batch, max_wait) for name, func in metric_functions.items()}
+    server.versions = versions or {}
+    server.started = time.perf_counter()
+    server.url = f"http://{host}:{server.server_address[1]}"
+    return server
+
+
+# Función para arrancar el servicio en un hilo (para usarlo desde un script o un notebook)
+def start_service(host="127.0.0.1", port=0, metric_functions=None, versions=None, max_batch=256, max_wait=0.02,
+                  tfidf_source=None):
+    if metric_functions is None:
+        metric_functions, versions = load_metric_functions(tfidf_source)
+    server = create_service(host, port, metric_functions, versions, max_batch, max_wait)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+# Función para hacer una petición JSON al servicio
+def _request(url, path, payload=None, timeout=600):
+    data = None if payload is None else json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    request = urllib.request.Request(url.rstrip("/") + path, data=data, headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        try:
+            message = json.loads(e.read())["error"]["message"]
+        except (ValueError, KeyError, TypeError):
+            message = str(e)
+        raise RuntimeError(f"Servicio de métricas ({url}{path}): {message}") from None
+
+
+# Función para puntuar muchos pares (referencia, hipótesis) en el servicio. Misma interfaz que las funciones por lotes
+# de calculo_metricas.py (con functools.partial(remote_score, url, métrica)), y se puede enviar a otros procesos
+def remote_score(url, metric, references, hypotheses):
+    if not len(references):
+        return []
+    return _request(url, f"/{metric}", {"references": list(references), "hypotheses": list(hypotheses)})["scores"]
+
+
+# Función para leer los contadores y las versiones de las métricas del servicio
+def service_stats(url=SERVICE_URL):
+    return _request(url, "/stats", timeout=10)
+
+
+# Main
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servicio local de métricas (ROUGE, BERTScore y TF-IDF) con microlotes.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--puerto", type=int, default=8765)
+    parser.add_argument("--lote-maximo", type=int, default=256, help="Pares por microlote")
+    parser.add_argument("--espera-maxima", type=float, default=0.02,
+                        help="Segundos que espera una petición a que se le unan otras")
+    parser.add_argument("--tfidf-corpus", default=None,
+                        help="Almacén o Excel con el que ajustar TF-IDF (por defecto, un vectorizador por par)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    metric_functions, versions = load_metric_functions(args.tfidf_corpus)
+    print(f"Métricas cargadas en {time.perf_counter() - start:.1f} s.")
+    server = create_service(args.host, args.puerto, metric_functions, versions, args.lote_maximo, args.espera_maxima)
+    print(f"Servicio de métricas escuchando en {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        uptime = time.perf_counter() - server.started
+        stats = {name: batcher.stats(uptime) for name, batcher in server.batchers.items()}
+        print(f"Servicio detenido. Estadísticas: {json.dumps(stats, indent=2)}")
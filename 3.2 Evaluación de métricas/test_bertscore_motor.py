@@ -0,0 +1,176 @@
+# ==========================================================
+#  Proyecto: IMPLEMENTACIÓN DE UN SISTEMA DE EVALUACIÓN DE CAPACIDADES DE GRANDES MODELOS DE LENGUAJE A TRAVÉS DE BUCLES DE RESUMEN Y EXTENSIÓN DE TEXTOS
+#  Apartado: 3. DESARROLLO DEL SISTEMA EXPERIMENTAL
+#            3.2 EVALUACIÓN DE MÉTRICAS
+#  Autor: Javier González Pérez
+#  Fecha: 18/10/2026
+#  Descripción: Pruebas de bertscore_motor.py sin descargar el modelo: un tokenizador de palabras y un _forward
+#               determinista (un vector one-hot por token) sustituyen al transformer, de modo que las puntuaciones
+#               esperadas se pueden calcular a mano. La paridad con bert_score sobre el modelo real sigue en
+#               `python bertscore_motor.py`.
+#
+#  Uso:  python -m pytest test_bertscore_motor.py
+# ==========================================================
+
+import numpy as np
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("transformers")
+
+import bertscore_motor
+from bertscore_motor import BERTScoreEngine, EmbeddingCache
+
+DIMENSION = 64
+CLS_ID, PAD_ID, SEP_ID = 0, 1, 2
+
+
+# Clase de tokenizador de prueba: una palabra, un token, con <s> y </s> como el de roberta
+class WordTokenizer:
+    cls_token_id, pad_token_id, sep_token_id = CLS_ID, PAD_ID, SEP_ID
+    model_max_length = 512
+
+    def __init__(self):
+        self.vocabulary = {}
+
+    def encode(self, text, add_special_tokens=True, add_prefix_space=True, max_length=None, truncation=False):
+        ids = [self.vocabulary.setdefault(word, 3 + len(self.vocabulary)) for word in text.split()]
+        if truncation:
+            ids = ids[:max_length - 2]
+        return [CLS_ID] + ids + [SEP_ID]
+
+
+# Clase del motor de prueba: sin modelo, cada token se codifica como un vector one-hot de su id
+class OneHotEngine(BERTScoreEngine):
+    def __init__(self, **kwargs):
+        self.forward_rows = 0
+        super().__init__(device="cpu", **kwargs)
+
+    def _load_model(self):
+        self.model = None
+
+    def _forward(self, input_ids, attention_mask):
+        self.forward_rows += len(input_ids)
+        return np.eye(DIMENSION, dtype=np.float32)[input_ids % DIMENSION]
+
+
+@pytest.fixture(autouse=True)
+def word_tokenizer(monkeypatch):
+    tokenizer = WordTokenizer()
+    monkeypatch.setattr(bertscore_motor, "AutoTokenizer", type("Auto", (), {"from_pretrained": lambda name: tokenizer}))
+    return tokenizer
+
+
+# Función para calcular la puntuación esperada con embeddings one-hot: un token vale 1 si aparece en el otro texto
+def expected_scores(reference, hypothesis):
+    reference_words, hypothesis_words = reference.split(), hypothesis.split()
+    precision = sum(word in reference_words for word in hypothesis_words) / len(hypothesis_words)
+    recall = sum(word in hypothesis_words for word in reference_words) / len(reference_words)
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall > 0 else 0.0
+    return {"precision": precision, "recall": recall, "f1": f1}
+
+
+def assert_scores_close(actual, expected):
+    for scores, reference_scores in zip(actual, expected):
+        assert scores == pytest.approx(reference_scores)
+
+
+def test_score_groups_pairs_by_reference():
+    references = ["the cat sat", "dogs bark loudly", "the cat sat", "dogs bark loudly", "the cat sat"]
+    hypotheses = ["the cat", "dogs sleep", "a cat sat down", "bark", "sat the cat"]
+    engine = OneHotEngine(cache=EmbeddingCache())
+    results = engine.score(references, hypotheses)
+    assert_scores_close(results, [expected_scores(r, h) for r, h in zip(references, hypotheses)])
+    # Cada referencia distinta se codifica una vez: 2 referencias + 5 hipótesis pasan por el modelo
+    assert engine.cache.stats()["misses"] == 2
+    assert engine.forward_rows == 2 + len(hypotheses)
+
+
+@pytest.mark.parametrize("batch_size", [1, 2, 64])
+def test_score_keeps_pair_order_across_reference_blocks(batch_size):
+    references = [f"word{i % 3} common text" for i in range(9)]
+    hypotheses = [f"common word{i % 4}" for i in range(9)]
+    engine = OneHotEngine(cache=EmbeddingCache(), batch_size=batch_size)
+    assert_scores_close(engine.score(references, hypotheses),
+                        [expected_scores(r, h) for r, h in zip(references, hypotheses)])
+
+
+def test_reference_embeddings_come_from_the_cache():
+    engine = OneHotEngine(cache=EmbeddingCache())
+    engine.score(["the cat sat"], ["the cat"])
+    rows = engine.forward_rows
+    assert_scores_close(engine.score(["the cat sat"], ["cat sat"]), [expected_scores("the cat sat", "cat sat")])
+    assert engine.forward_rows == rows + 1
+    assert engine.cache.stats()["hits"] == 1
+
+
+@pytest.mark.parametrize("reference, hypothesis", [("the cat sat", ""), ("", "the cat"), ("", ""), ("  ", "cat")])
+def test_empty_texts_score_zero(reference, hypothesis):
+    engine = OneHotEngine(cache=EmbeddingCache())
+    assert engine.score([reference], [hypothesis]) == [{"precision": 0.0, "recall": 0.0, "f1": 0.0}]
+
+
+def test_greedy_match_with_zero_weights():
+    embeddings = np.eye(3, dtype=np.float32)
+    text, empty = (embeddings, np.array([0.0, 1.0, 0.0], dtype=np.float32)), (embeddings, np.zeros(3, np.float32))
+    zero = {"precision": 0.0, "recall": 0.0, "f1": 0.0}
+    assert bertscore_motor.greedy_match(text, empty) == zero
+    assert bertscore_motor.greedy_match(empty, text) == zero
+    assert bertscore_motor.greedy_match(text, text) == {"precision": 1.0, "recall": 1.0, "f1": 1.0}
+
+
+# Ventanas con max_length=10 (8 tokens de contenido) y 4 de solapamiento: empiezan cada 4 tokens
+def test_windows_overlap_and_keep_special_tokens():
+    engine = OneHotEngine(max_length=10, window_overlap=4)
+    token_ids = [CLS_ID] + list(range(100, 120)) + [SEP_ID]
+    windows = engine._windows(token_ids)
+    assert [start for start, _ in windows] == [0, 4, 8, 12]
+    for start, sequence in windows:
+        assert sequence == [CLS_ID] + token_ids[1 + start:1 + start + 8] + [SEP_ID]
+    assert engine._windows(token_ids[:10]) == [(0, token_ids[:10])]
+
+
+def test_windows_cover_a_tail_shorter_than_the_step():
+    engine = OneHotEngine(max_length=10, window_overlap=4)
+    token_ids = [CLS_ID] + list(range(100, 121)) + [SEP_ID]
+    windows = engine._windows(token_ids)
+    assert [start for start, _ in windows] == [0, 4, 8, 12, 16]
+    assert windows[-1][1][-2] == token_ids[-2]
+
+
+def test_stitch_takes_each_token_from_its_most_centered_window():
+    # Fila de cada token: (id, inicio de la ventana de la que sale)
+    engine = OneHotEngine(max_length=10, window_overlap=4)
+    token_ids = [CLS_ID] + list(range(100, 120)) + [SEP_ID]
+    windows = [(start, np.array([[token, start] for token in sequence], dtype=np.float32))
+               for start, sequence in engine._windows(token_ids)]
+    stitched = engine._stitch(windows)
+    assert stitched[:, 0].tolist() == token_ids
+    # Los 4 tokens solapados entre dos ventanas se reparten por la mitad
+    assert stitched[:, 1].tolist() == [0] + [0] * 6 + [4] * 4 + [8] * 4 + [12] * 6 + [12]
+
+
+def test_long_texts_are_encoded_with_all_their_tokens():
+    engine = OneHotEngine(max_length=10, window_overlap=4)
+    words = [f"w{i}" for i in range(30)]
+    (embeddings, weights), = engine.encode([" ".join(words)])
+    assert len(embeddings) == len(weights) == len(words) + 2
+    assert weights.sum() == len(words)
+    reference, hypothesis = " ".join(words), " ".join(words[-5:] + ["other"])
+    assert_scores_close(engine.score([reference], [hypothesis]), [expected_scores(reference, hypothesis)])
+
+
+def test_window_overlap_must_leave_room_for_content():
+    with pytest.raises(ValueError):
+        OneHotEngine(max_length=10, window_overlap=8)
+
+
+def test_texts_over_512_tokens_keep_every_token_with_the_default_length():
+    engine = OneHotEngine(window_overlap=128)
+    words = [f"w{i}" for i in range(1200)]
+    token_ids = engine._tokenize(" ".join(words))
+    windows = engine._windows(token_ids)
+    assert len(windows) > 1 and all(len(sequence) <= 512 for _, sequence in windows)
+    (embeddings, weights), = engine.encode([" ".join(words)])
+    assert len(embeddings) == len(token_ids) == len(words) + 2
+    assert (embeddings.argmax(axis=1) == np.array(token_ids) % DIMENSION).all()
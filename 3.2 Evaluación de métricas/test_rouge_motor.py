@@ -0,0 +1,119 @@
+# ==========================================================
+#  Proyecto: IMPLEMENTACIÓN DE UN SISTEMA DE EVALUACIÓN DE CAPACIDADES DE GRANDES MODELOS DE LENGUAJE A TRAVÉS DE BUCLES DE RESUMEN Y EXTENSIÓN DE TEXTOS
+#  Apartado: 3. DESARROLLO DEL SISTEMA EXPERIMENTAL
+#            3.2 EVALUACIÓN DE MÉTRICAS
+#  Autor: Javier González Pérez
+#  Fecha: 18/10/2026
+#  Descripción: Pruebas de paridad exacta de rouge_motor.py con rouge_score: cada campo (precision, recall, f1) de
+#               RougeEngine.score_pairs_by_type debe ser idéntico al de rouge_scorer.RougeScorer, en casos límite y
+#               en un corpus aleatorio con tokens que el tokenizador y el stemmer tratan de forma especial. La LCS
+#               bit-paralela de ROUGE-L/Lsum se compara además con la tabla de programación dinámica de rouge_score.
+#
+#  Uso:  python -m pytest test_rouge_motor.py
+# ==========================================================
+
+import random
+
+import pytest
+
+from rouge_motor import RougeEngine, bit_masks, lcs_indices, lcs_length
+
+rouge_scorer = pytest.importorskip("rouge_score.rouge_scorer")
+
+ROUGE_TYPES = ['rouge1', 'rouge2', 'rouge3', 'rougeL', 'rougeLsum']
+VOCABULARY = ["the", "running", "runs", "ran", "caresses", "ponies", "relational", "conditional", "it's",
+              "U.S.", "2024", "Dr.", "résumé", "naïve", "e-mail", "a", "an", "of", "generously", "hopping",
+              "!", "...", "$1,000", "COVID-19", "Ünïcödé", "İstanbul", "don't", "x", "yes", "national",
+              "\n", "\n", "\n\n"]
+
+EDGE_CASES = [("", ""), ("", "the cat"), ("the cat", ""), ("!!!", "..."), ("a b c", "a b c"), ("ran", "running"),
+              ("the cat\n\nsat on\nthe mat", "the mat\nthe cat sat"), ("!!!\n...", "the\n")]
+
+
+# Función para generar el corpus aleatorio: pares sueltos y referencias compartidas por varias hipótesis (caché)
+def random_cases(seed=0):
+    rng = random.Random(seed)
+
+    def random_text(max_words):
+        return " ".join(rng.choice(VOCABULARY) for _ in range(rng.randint(0, max_words)))
+
+    cases = [(random_text(80), random_text(40)) for _ in range(300)]
+    for reference in [random_text(120) for _ in range(10)]:
+        cases.extend((reference, random_text(60)) for _ in range(20))
+    return cases
+
+
+# Función para comparar campo a campo el motor con rouge_score en una lista de pares
+def assert_parity(cases, rouge_types=ROUGE_TYPES):
+    scorer = rouge_scorer.RougeScorer(rouge_types, use_stemmer=True)
+    engine = RougeEngine(rouge_types, use_stemmer=True)
+    ours = engine.score_pairs_by_type([reference for reference, _ in cases], [hypothesis for _, hypothesis in cases])
+    mismatches = []
+    for (reference, hypothesis), pair_scores in zip(cases, ours):
+        expected = scorer.score(reference, hypothesis)
+        for rouge_type in rouge_types:
+            scores = pair_scores[rouge_type]
+            for field, value in zip(("precision", "recall", "f1"), expected[rouge_type]):
+                if scores[field] != value:
+                    mismatches.append((rouge_type, field, reference, hypothesis, scores[field], value))
+    assert not mismatches, f"{len(mismatches)} diferencias con rouge_score, la primera: {mismatches[0]}"
+
+
+@pytest.mark.parametrize("reference, hypothesis", EDGE_CASES)
+def test_edge_cases_match_rouge_score(reference, hypothesis):
+    assert_parity([(reference, hypothesis)])
+
+
+def test_random_corpus_matches_rouge_score():
+    assert_parity(random_cases())
+
+
+def test_score_pairs_matches_score_pairs_by_type():
+    cases = random_cases(seed=1)[:50]
+    references, hypotheses = [reference for reference, _ in cases], [hypothesis for _, hypothesis in cases]
+    engine = RougeEngine(ROUGE_TYPES)
+    by_type = engine.score_pairs_by_type(references, hypotheses)
+    for rouge_type in ROUGE_TYPES:
+        assert engine.score_pairs(references, hypotheses, rouge_type) == [scores[rouge_type] for scores in by_type]
+
+
+# LCS bit-paralela: longitud y posiciones elegidas frente a la tabla de rouge_score, con secuencias de más de 64 tokens
+# (el estado ocupa varias palabras de máquina) y con muchos tokens repetidos (varias LCS posibles)
+LCS_SEQUENCES = [([], ["a"]), (["a"], []), (["a", "a", "a"], ["a"]), (["a", "b", "a", "b"], ["b", "a", "b", "a"]),
+                 (["x"] * 70, ["x"] * 65), ([f"w{i % 7}" for i in range(130)], [f"w{i % 5}" for i in range(90)])]
+
+
+@pytest.mark.parametrize("reference, candidate", LCS_SEQUENCES)
+def test_lcs_matches_dynamic_programming_table(reference, candidate):
+    masks = bit_masks(reference)
+    table = rouge_scorer._lcs_table(reference, candidate)
+    assert lcs_length(masks, len(reference), candidate) == table[-1][-1]
+    assert lcs_indices(reference, masks, candidate) == rouge_scorer._backtrack_norec(table, reference, candidate)
+
+
+def test_lcs_on_random_long_sequences():
+    rng = random.Random(2)
+    for _ in range(200):
+        reference = [rng.choice("abcde") for _ in range(rng.randint(60, 200))]
+        candidate = [rng.choice("abcdef") for _ in range(rng.randint(0, 150))]
+        masks = bit_masks(reference)
+        table = rouge_scorer._lcs_table(reference, candidate)
+        assert lcs_length(masks, len(reference), candidate) == table[-1][-1]
+        assert lcs_indices(reference, masks, candidate) == rouge_scorer._backtrack_norec(table, reference, candidate)
+
+
+LONG_REFERENCE = " ".join(f"word{i % 9} the cat" for i in range(40))  # 120 tokens con muchas repeticiones
+LCS_CASES = [
+    ("\n\nthe cat sat\n\n", "the cat\n\n\nsat"),  # líneas vacías y separadores \n\n
+    ("\n", "the cat"),
+    ("the cat\n\n", "\n\n"),
+    ("the the the cat\nthe cat the", "the cat cat\nthe the"),  # tokens repetidos entre líneas
+    ("a a a a\na a", "a\na a a a a a a"),
+    (LONG_REFERENCE, " ".join(f"the word{i % 4} cat" for i in range(30))),  # referencia de más de 64 tokens
+    (LONG_REFERENCE.replace(" the cat", " the cat\n", 20), "word1 the cat word2\n\nthe word3 cat " * 12),
+]
+
+
+@pytest.mark.parametrize("reference, hypothesis", LCS_CASES)
+def test_lcs_types_match_rouge_score(reference, hypothesis):
+    assert_parity([(reference, hypothesis), (hypothesis, reference)], ['rougeL', 'rougeLsum'])
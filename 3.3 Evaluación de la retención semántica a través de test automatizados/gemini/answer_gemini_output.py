@@ -10,6 +10,7 @@
 #  control de cuota de peticiones, manejo de errores y cálculo del porcentaje de respuestas aleatorias.
 # ==========================================================
 import os
+import sys
 import time
 import json
 import re
@@ -17,6 +18,12 @@ import random
 import google.generativeai as genai
 from google.api_core.exceptions import ResourceExhausted
 
+# Limitador de tasa y caché de respuestas compartidos con los bucles del apartado 3.1
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..",
+                             "3.1 Desarrollo del sistema de evaluación basado en bucles de resumen y expansión"))
+from limitador_tasa import RateLimiter, estimate_call_tokens
+from cache_llm import ResponseCache, cached_call
+
 # 1. Configura tu API Key de Google AI Studio
 genai.configure(api_key="")  # 🔒 Sustituye con tu clave real
 
@@ -25,10 +32,18 @@ input_file = "answer_input_gemini.jsonl"
 output_file = "answer_gemini_output_.jsonl"
 
 # 3. Modelo a usar
-model = genai.GenerativeModel("gemini-1.5-flash")
+model_name = "gemini-1.5-flash"
+model = genai.GenerativeModel(model_name)
 
-# 4. Límite de solicitudes por minuto
+# 4. Límites de frecuencia
 REQUESTS_PER_MINUTE = 60
+TOKENS_PER_MINUTE = 1_000_000
+REQUESTS_PER_DAY = 1_500
+rate_limiter = RateLimiter(REQUESTS_PER_MINUTE, TOKENS_PER_MINUTE, REQUESTS_PER_DAY)
+
+# Caché de respuestas (opcional): con RESPONSE_CACHE_PATH = "cache_llm.sqlite" no se repiten preguntas ya respondidas
+RESPONSE_CACHE_PATH = None
+response_cache = ResponseCache(RESPONSE_CACHE_PATH) if RESPONSE_CACHE_PATH else None
 
 # 5. Cargar IDs ya procesados
 def load_processed_ids(path):
@@ -58,8 +73,6 @@ def extract_letter(response, options=["A", "B", "C", "D"], random_counter=None):
 # 7. Ejecutar las peticiones
 def run_benchmark(input_path, output_path):
     processed_ids = load_processed_ids(output_path)
-    requests_made = 0
-    start_time = time.time()
     total_questions = 0
     random_counter = {"count": 0}  # Contador de respuestas aleatorias
 
@@ -90,9 +103,12 @@ def run_benchmark(input_path, output_path):
                     f"Answer with only the letter of the correct option (A, B, C, or D)."
                 )
 
-                # Llamada a Gemini
-                response = model.generate_content(prompt)
-                answer_raw = response.text.strip()
+                # Llamada a Gemini (la respuesta es una sola letra)
+                def request():
+                    rate_limiter.acquire(estimate_call_tokens(prompt, 1))
+                    return model.generate_content(prompt).text
+
+                answer_raw = cached_call(response_cache, "gemini", model_name, prompt, None, request).strip()
                 answer = extract_letter(answer_raw, random_counter=random_counter)
 
                 # Guardar resultado
@@ -109,21 +125,14 @@ def run_benchmark(input_path, output_path):
                 print(f"Error con {custom_id}: {e}")
                 outfile.write(json.dumps({"custom_id": custom_id, "answer": "ERROR", "error_detail": str(e)}, ensure_ascii=False) + "\n")
 
-            # Control de RPM
-            requests_made += 1
-            if requests_made >= REQUESTS_PER_MINUTE:
-                elapsed = time.time() - start_time
-                if elapsed < 60:
-                    time.sleep(60 - elapsed)
-                requests_made = 0
-                start_time = time.time()
-
     # Calcular porcentaje de respuestas aleatorias
     random_percentage = (random_counter["count"] / total_questions) * 100 if total_questions > 0 else 0
     print(f"\nPorcentaje de respuestas aleatorias: {random_percentage:.2f}%")
 
 # 8. Ejecutar
 if __name__ == "__main__":
+    # Cuota diaria compartida con el resto de scripts de Gemini lanzados desde el mismo directorio y entre ejecuciones
+    rate_limiter.persist_daily(f"cuota_diaria_{model_name}.json")
     try:
         run_benchmark(input_file, output_file)
         print(f"\nProceso completado. Respuestas guardadas en: {output_file}")
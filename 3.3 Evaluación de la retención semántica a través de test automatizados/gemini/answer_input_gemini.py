@@ -10,16 +10,23 @@
 #  respuesta y un identificador único, todo en formato compatible con la API de Gemini.
 #
 # ==========================================================
+import os
+import sys
 import pandas as pd
 import json
 
+# El almacén de resultados está en la carpeta 3.1
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..",
+                             "3.1 Desarrollo del sistema de evaluación basado en bucles de resumen y expansión"))
+from almacen_resultados import read_table
+
 # Archivos de entrada/salida
-texts_file = "textos_gemini.xlsx"  # Archivo Excel con los textos
+texts_file = "resultados_bucle_resumen_expansion_gemini"  # Almacén de resultados del bucle (o archivo Excel con los textos)
 questions_file = "preguntas_gemini.xlsx"  # Archivo Excel con las preguntas
 output_file = "answer_input_gemini.jsonl"  # Archivo JSONL de salida
 
-# Leer los textos desde el archivo Excel
-texts_df = pd.read_excel(texts_file)
+# Leer los textos desde el almacén de resultados (o desde el archivo Excel)
+texts_df = read_table(texts_file)
 
 # Leer las preguntas desde el archivo Excel
 questions_df = pd.read_excel(questions_file)
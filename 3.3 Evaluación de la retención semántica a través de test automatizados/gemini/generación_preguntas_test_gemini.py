@@ -9,12 +9,20 @@
 # ==========================================================
 
 import os
+import sys
 import time
 import json
 import pandas as pd
 import google.generativeai as genai
 from google.api_core.exceptions import ResourceExhausted
 
+# Limitador de tasa, caché de respuestas y corpus local compartidos con los bucles del apartado 3.1
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..",
+                             "3.1 Desarrollo del sistema de evaluación basado en bucles de resumen y expansión"))
+from limitador_tasa import RateLimiter, estimate_call_tokens
+from cache_llm import ResponseCache, cached_call
+from corpus_local import LocalCorpus, is_corpus
+
 # Configura tu API Key de Google AI Studio
 genai.configure(api_key="")  # Sustituye por tu API KEY real
 
@@ -27,6 +35,14 @@ output_file = "output_test_questions_gemini.jsonl"
 start_row = 0  # Cambiado a 0 para no omitir filas importantes
 limit = 300
 REQUESTS_PER_MINUTE = 15
+TOKENS_PER_MINUTE = 1_000_000
+REQUESTS_PER_DAY = 1_500
+QUESTIONS_OUTPUT_WORDS = 600  # Longitud aproximada de las 10 preguntas con sus opciones
+rate_limiter = RateLimiter(REQUESTS_PER_MINUTE, TOKENS_PER_MINUTE, REQUESTS_PER_DAY)
+
+# Caché de respuestas (opcional): con RESPONSE_CACHE_PATH = "cache_llm.sqlite" no se regeneran preguntas ya pedidas
+RESPONSE_CACHE_PATH = None
+response_cache = ResponseCache(RESPONSE_CACHE_PATH) if RESPONSE_CACHE_PATH else None
 
 # Cargar IDs ya procesados
 def load_processed_ids(output_file):
@@ -43,6 +59,9 @@ def load_processed_ids(output_file):
 
 # Leer los textos desde Excel
 def read_texts(filename, start_row, limit):
+    if is_corpus(filename):
+        # Corpus local (corpus_local.py): solo se leen las filas necesarias
+        return LocalCorpus(filename).texts(start_row, limit, columns=['id', 'original_text'])
     df = pd.read_excel(filename, skiprows=start_row)  # Ajustado para no omitir encabezados
     texts = []
     for _, row in df.iterrows():
@@ -67,8 +86,12 @@ def generate_questions(text):
         "    **Correct Answer: X**\n\n"
         f"{text}"
     )
-    response = model.generate_content(prompt)
-    return response.text
+
+    def request():
+        rate_limiter.acquire(estimate_call_tokens(prompt, QUESTIONS_OUTPUT_WORDS))
+        return model.generate_content(prompt).text
+
+    return cached_call(response_cache, "gemini", model_name, prompt, None, request)
 
 # Reestructurar preguntas para garantizar formato consistente
 def reformat_questions(output):
@@ -98,15 +121,14 @@ def append_result(entry, filename):
 
 # MAIN
 if __name__ == "__main__":
+    # Cuota diaria compartida con el resto de scripts de Gemini lanzados desde el mismo directorio y entre ejecuciones
+    rate_limiter.persist_daily(f"cuota_diaria_{model_name}.json")
     texts = read_texts(input_file, start_row, limit)
     print(f"Textos cargados: {len(texts)}")
 
     processed_ids = load_processed_ids(output_file)
     print(f"Textos ya procesados: {len(processed_ids)}")
 
-    requests_made = 0
-    start_time = time.time()
-
     for idx, item in enumerate(texts):
         text_id = item['id']
         if text_id in processed_ids:
@@ -129,15 +151,4 @@ if __name__ == "__main__":
         result = {"id": text_id, "questions_output": reformatted_output}
         append_result(result, output_file)
 
-        # Control de tasa
-        requests_made += 1
-        if requests_made >= REQUESTS_PER_MINUTE:
-            elapsed = time.time() - start_time
-            if elapsed < 60:
-                wait = 60 - elapsed
-                print(f"Esperando {wait:.2f} segundos por límite de RPM...")
-                time.sleep(wait)
-            requests_made = 0
-            start_time = time.time()
-
     print(f"Proceso completado. Resultados guardados en {output_file}")
@@ -11,17 +11,24 @@
 # ==========================================================
 
 import json
+import os
+import sys
 import pandas as pd
 
-# Ruta del archivo Excel con las preguntas generadas y el archivo de iteraciones para chat-gpt4
+# El almacén de resultados está en la carpeta 3.1
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..",
+                             "3.1 Desarrollo del sistema de evaluación basado en bucles de resumen y expansión"))
+from almacen_resultados import read_table
+
+# Ruta del archivo Excel con las preguntas generadas y el almacén de iteraciones para chat-gpt4
 questions_file = "preguntas_gtp4.xlsx"  # Archivo con las preguntas generadas
-iterations_file = "resultados_bucle_resumen_expansion_gpt4.xlsx"  # Archivo con las iteraciones para chat-gpt4
+iterations_file = "resultados_bucle_resumen_expansion_gpt4"  # Almacén con las iteraciones para chat-gpt4 (o archivo Excel)
 
 # Leer las preguntas desde el archivo Excel
 questions_df = pd.read_excel(questions_file)
 
-# Leer las iteraciones desde el archivo Excel específico para chat-gpt4
-texts_df = pd.read_excel(iterations_file)
+# Leer las iteraciones desde el almacén de resultados de chat-gpt4
+texts_df = read_table(iterations_file)
 
 # Asegúrate de que las columnas necesarias existan en ambos archivos Excel
 required_question_columns = [
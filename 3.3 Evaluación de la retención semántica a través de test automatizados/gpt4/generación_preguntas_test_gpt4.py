@@ -9,15 +9,25 @@
 # ==========================================================
 
 
+import os
+import sys
 import pandas as pd
 import json
 
+# Corpus local compartido con los bucles del apartado 3.1
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..",
+                             "3.1 Desarrollo del sistema de evaluación basado en bucles de resumen y expansión"))
+from corpus_local import LocalCorpus, is_corpus
+
 # Ruta del archivo de entrada y salida
-input_file = "textos_gemini.xlsx"  # Archivo con los textos originales de CNN
+input_file = "textos_gemini.xlsx"  # Archivo con los textos originales de CNN (Excel o corpus local .arrow)
 output_file = " batch_input_test_questions_gpt4.jsonl"  # Archivo de salida en formato JSONL
 
-# Leer los textos originales desde el archivo Excel
-df = pd.read_excel(input_file)
+# Leer los textos originales desde el archivo Excel (o desde el corpus local si el fichero es .arrow)
+if is_corpus(input_file):
+    df = LocalCorpus(input_file).slice(columns=['id', 'original_text']).to_pandas()
+else:
+    df = pd.read_excel(input_file)
 
 # Asegúrate de que la columna con los textos se llama 'original_text'
 if 'original_text' not in df.columns:
@@ -13,8 +13,14 @@
 import pandas as pd
 import matplotlib.pyplot as plt
 import os
+import sys
 import seaborn as sns
 
+# El almacén de resultados está en la carpeta 3.1
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..",
+                             "3.1 Desarrollo del sistema de evaluación basado en bucles de resumen y expansión"))
+from almacen_resultados import read_table
+
 # Configuración de estilo para las gráficas
 sns.set_theme(style="whitegrid")  # Configura el estilo directamente con Seaborn
 sns.set_palette("colorblind")  # Paleta de colores accesible
@@ -127,10 +133,10 @@ def plot_model_comparison_bar_chart(data, models, iterations, metric, output_dir
 
 # Main
 if __name__ == "__main__":
-    # Lista de archivos y nombres de modelos
+    # Lista de almacenes de métricas (o archivos Excel con las mismas hojas) y nombres de modelos
     files = [
-        ('textos_gpt4_stats.xlsx', 'GPT-4 Mini'),
-        ('textos_gemini_stats.xlsx', 'gemini-1.5-flash')  # Añade el archivo del segundo modelo
+        ('textos_gpt4_stats', 'GPT-4 Mini'),
+        ('textos_gemini_stats', 'gemini-1.5-flash')  # Añade el almacén del segundo modelo
     ]
 
     # Hojas y prefijos de métricas
@@ -153,7 +159,7 @@ if __name__ == "__main__":
         for sheet_name, metric_prefix in sheets_and_prefixes:
             print(f"Procesando {sheet_name} para {model_name}...")
             try:
-                df = pd.read_excel(file_path, sheet_name=sheet_name)
+                df = read_table(file_path, sheet_name)
                 transformed_data = transform_data_for_iterations(df, metric_prefix=metric_prefix)
 
                 if transformed_data.empty: